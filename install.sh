@@ -94,6 +94,21 @@ Terminal=false
 StartupWMClass=$APP_WM_CLASS
 EOL
 
+BIN_DIR="$HOME/.local/bin"
+mkdir -p "$BIN_DIR"
+cat > "$BIN_DIR/fogstripper-cli" << EOL
+#!/bin/bash
+export PYTHONPATH=$APP_DIR
+exec $PYTHON_EXEC -m src.cli "\$@"
+EOL
+chmod +x "$BIN_DIR/fogstripper-cli"
+cat > "$BIN_DIR/fogstripper-server" << EOL
+#!/bin/bash
+export PYTHONPATH=$APP_DIR
+exec $PYTHON_EXEC -m src.server "\$@"
+EOL
+chmod +x "$BIN_DIR/fogstripper-server"
+
 update-desktop-database -q "$DESKTOP_INSTALL_DIR"
 gtk-update-icon-cache -q -f -t "$HOME/.local/share/icons/hicolor"
 
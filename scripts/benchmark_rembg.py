@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Compara a latencia por imagem do rembg avulso (um processo por imagem) com o worker persistente
+e mede quadros/s da inferencia em lote para varios tamanhos de lote."""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT: str = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from src.core.worker_client import PersistentWorker  # noqa: E402
+
+REMBG_SCRIPT: str = os.path.join(PROJECT_ROOT, "src", "workers", "worker_rembg.py")
+
+
+def make_inputs(directory: str, count: int, size: int) -> list[str]:
+    paths: list[str] = []
+    for i in range(count):
+        img = Image.new("RGB", (size, size), (40 + i * 7 % 200, 120, 200))
+        draw = ImageDraw.Draw(img)
+        draw.ellipse((size // 4, size // 4, size * 3 // 4, size * 3 // 4), fill=(230, 60, 30))
+        path = os.path.join(directory, f"input_{i:03d}.png")
+        img.save(path)
+        paths.append(path)
+    return paths
+
+
+def bench_oneshot(python: str, inputs: list[str], out_dir: str, model: str) -> list[float]:
+    timings: list[float] = []
+    for i, path in enumerate(inputs):
+        start = time.perf_counter()
+        subprocess.run(
+            [python, REMBG_SCRIPT, "--input", path, "--output", os.path.join(out_dir, f"a_{i}.png"), "--model", model],
+            check=True,
+            capture_output=True,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_persistent(python: str, inputs: list[str], out_dir: str, model: str) -> list[float]:
+    worker = PersistentWorker(python, REMBG_SCRIPT)
+    timings: list[float] = []
+    try:
+        for i, path in enumerate(inputs):
+            start = time.perf_counter()
+            worker.request("remove", input=path, output=os.path.join(out_dir, f"p_{i}.png"), model=model, potencia=75)
+            timings.append(time.perf_counter() - start)
+    finally:
+        worker.close()
+    return timings
+
+
+def bench_batches(python: str, inputs: list[str], out_dir: str, model: str, sizes: list[int]) -> None:
+    worker = PersistentWorker(python, REMBG_SCRIPT)
+    try:
+        worker.request("remove", input=inputs[0], output=os.path.join(out_dir, "warmup.png"), model=model)
+        for size in sizes:
+            start = time.perf_counter()
+            for i in range(0, len(inputs), size):
+                chunk = inputs[i : i + size]
+                outputs = [os.path.join(out_dir, f"b{size}_{i + j}.png") for j in range(len(chunk))]
+                worker.request("remove_batch", inputs=chunk, outputs=outputs, model=model, potencia=75)
+            elapsed = time.perf_counter() - start
+            print(f"lote={size:<3} {len(inputs) / elapsed:7.2f} quadros/s")
+    finally:
+        worker.close()
+
+
+def report(label: str, timings: list[float]) -> None:
+    total = sum(timings)
+    first = timings[0]
+    steady = sum(timings[1:]) / max(1, len(timings) - 1)
+    print(f"{label:<12} total={total:7.2f}s  primeira={first:6.2f}s  media_seguintes={steady:6.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--model", default="u2netp")
+    parser.add_argument("--python", default=sys.executable)
+    parser.add_argument("--batch-sizes", default="1,2,4,8", help="Tamanhos de lote separados por virgula.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="fogstripper_bench_") as tmp:
+        inputs = make_inputs(tmp, args.count, args.size)
+        print(f"{args.count} imagens {args.size}x{args.size}, modelo {args.model}")
+        report("avulso", bench_oneshot(args.python, inputs, tmp, args.model))
+        report("persistente", bench_persistent(args.python, inputs, tmp, args.model))
+        sizes = [int(size) for size in args.batch_sizes.split(",") if size.strip()]
+        bench_batches(args.python, inputs, tmp, args.model, sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Compara, por fator de upscale, o comportamento antigo (RealESRGAN_x4plus seguido de reducao)
+com o modelo nativo do fator e com o preset rapido: tempo medio por imagem e pico de RSS do worker."""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT: str = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from src.core.worker_client import PersistentWorker  # noqa: E402
+from src.workers.upscale_models import DEFAULT_UPSCALE_MODEL, select_model  # noqa: E402
+
+UPSCALE_SCRIPT: str = os.path.join(PROJECT_ROOT, "src", "workers", "worker_upscale.py")
+
+
+def make_input(directory: str, width: int, height: int) -> str:
+    # Quadro todo opaco, para a rede rodar na imagem inteira e o upscale por conteudo nao mascarar a diferenca.
+    img = Image.radial_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for i in range(0, width, 24):
+        draw.line((i, 0, width - i, height), fill=(230, 60 + i % 150, 30), width=3)
+    path = os.path.join(directory, "input.png")
+    img.save(path)
+    return path
+
+
+def peak_rss_bytes(pid: int) -> int | None:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def bench(
+    python: str, model: str, factor: int, path: str, out_dir: str, tile: int, runs: int
+) -> tuple[float, int | None]:
+    # Um worker novo por configuracao: o pico de RSS de um modelo nao contamina o do outro.
+    worker = PersistentWorker(python, UPSCALE_SCRIPT, idle_timeout=0)
+    output = os.path.join(out_dir, f"{model}_{factor}.png")
+    try:
+        worker.request("upscale", input=path, output=output, tile=tile, outscale=factor, model=model)
+        start = time.perf_counter()
+        for _ in range(runs):
+            worker.request("upscale", input=path, output=output, tile=tile, outscale=factor, model=model)
+        elapsed = (time.perf_counter() - start) / runs
+        peak = peak_rss_bytes(worker.process.pid) if worker.process else None
+    finally:
+        worker.close()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", default="640x480", help="Tamanho da imagem de teste (LxA).")
+    parser.add_argument("--factors", default="2,3,4")
+    parser.add_argument("--tile", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--python", default=sys.executable)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    factors = [int(f) for f in args.factors.split(",") if f.strip()]
+    with tempfile.TemporaryDirectory(prefix="fogstripper_bench_") as tmp:
+        path = make_input(tmp, width, height)
+        print(f"Imagem {width}x{height}, bloco {args.tile}, {args.runs} execucoes por configuracao")
+        for factor in factors:
+            configs = {
+                "x4+reducao": DEFAULT_UPSCALE_MODEL,
+                "nativo": select_model(factor, "quality").name,
+                "rapido": select_model(factor, "fast").name,
+            }
+            baseline: float | None = None
+            for label, model in configs.items():
+                elapsed, peak = bench(args.python, model, factor, path, tmp, args.tile, args.runs)
+                baseline = baseline or elapsed
+                memory = f"{peak / 1024**2:7.0f} MB" if peak else "      n/d"
+                print(f"{factor}x {label:<11} {model:<22} {elapsed:7.2f}s  {baseline / elapsed:5.2f}x  pico {memory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -107,7 +107,7 @@ done
 echo ""
 
 echo ">> Verificando imports principais..."
-if python -c "from src.core.processor import ProcessThread" 2>/dev/null; then
+if python -c "from src.core.process_thread import ProcessThread" 2>/dev/null; then
     check_pass "src.core.processor"
 else
     check_fail "Falha ao importar src.core.processor"
@@ -0,0 +1,428 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from src.core.admission import admit, upscale_models_dir
+from src.core.config_loader import get_setting
+from src.core.constants import ALL_EXTENSIONS, MODEL_DESCRIPTIONS, VIDEO_EXTENSIONS
+from src.core.dedup import dedup_enabled, find_duplicates, materialize_duplicate
+from src.core.job_queue import DONE, JobQueue, QueuedJob, default_queue_path
+from src.core.logger_config import setup_logging
+from src.core.onnx_export import export_onnx_upscale
+from src.core.processor import ImageProcessor, warm_up_workers
+from src.core.stage_cache import StageCache, get_mask_cache, get_stage_cache
+from src.core.tile_calibration import (
+    DEFAULT_CALIBRATION_SIZE,
+    DEFAULT_CALIBRATION_TILES,
+    DEFAULT_TILE,
+    calibrate,
+    calibration_models,
+    parse_tile,
+    save_profile,
+)
+from src.core.watcher import FolderWatcher, WatchService, default_poll_interval, default_settle_seconds
+from src.core.worker_client import keep_workers_warm, shutdown_workers
+from src.workers.upscale_models import AUTO_PRESET, DEFAULT_UPSCALE_MODEL, UPSCALE_MODELS, model_choices
+
+# Interface de linha de comando: o mesmo pipeline do ProcessThread, mas sobre o ImageProcessor,
+# que nao importa o PyQt6. Logs vao para o stderr; o stdout recebe apenas o resumo em JSON.
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS: tuple[str, ...] = ("png", "webp", "svg", "gif", "webm")
+# Formatos que so existem como video: imagens estaticas nao tem como ser gravadas neles.
+ANIMATION_ONLY_FORMATS: tuple[str, ...] = ("webm",)
+
+
+def collect_inputs(patterns: list[str], output_dir: str | None = None) -> list[tuple[str, str | None]]:
+    # Cada entrada volta com seu diretorio de saida; arquivos achados dentro de uma pasta
+    # mantem a mesma subpasta relativa no --output-dir.
+    found: dict[str, str | None] = {}
+
+    def add(path: str, root: str | None = None) -> None:
+        if not path.lower().endswith(ALL_EXTENSIONS):
+            return
+        path = os.path.abspath(path)
+        target: str | None = output_dir
+        if output_dir and root:
+            target = os.path.normpath(os.path.join(output_dir, os.path.relpath(os.path.dirname(path), root)))
+        found.setdefault(path, target)
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            root: str = os.path.abspath(pattern)
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    add(os.path.join(dirpath, name), root)
+        elif os.path.isfile(pattern):
+            add(pattern)
+        else:
+            matches: list[str] = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                logger.warning(f"Nenhum arquivo encontrado para: {pattern}")
+            for match in matches:
+                if os.path.isfile(match):
+                    add(match)
+    return list(found.items())
+
+
+def build_post_processing_opts(args: argparse.Namespace) -> dict[str, Any]:
+    background_type: str | None = None
+    background_data: str | None = None
+    if args.background_image:
+        background_type, background_data = "image", os.path.abspath(args.background_image)
+    elif args.background_color:
+        background_type, background_data = "color", args.background_color
+    return {
+        "enabled": bool(args.shadow or background_type),
+        "upscale_factor": args.upscale,
+        "upscale_model": args.upscale_model,
+        "crop_option": "trim" if args.trim else "original",
+        "fill_holes": args.fill_holes,
+        "shadow_enabled": args.shadow,
+        "shadow_blur": args.shadow_blur,
+        "shadow_opacity": args.shadow_opacity,
+        "background_type": background_type,
+        "background_data": background_data,
+        "background_resize_mode": args.background_resize_mode,
+    }
+
+
+def build_parser(parser_class: type[argparse.ArgumentParser] = argparse.ArgumentParser) -> argparse.ArgumentParser:
+    # O servidor HTTP reaproveita estas opcoes com uma subclasse que levanta erro em vez de sair.
+    parser = parser_class(
+        prog="fogstripper-cli",
+        description="Remove o fundo de imagens e animacoes sem abrir a interface grafica.",
+    )
+    parser.add_argument("inputs", nargs="*", help="Arquivos, pastas (recursivo) ou padroes glob.")
+    parser.add_argument("-o", "--output-dir", help="Pasta de saida. Sem ela, o resultado fica ao lado da entrada.")
+    parser.add_argument("-m", "--model", default="u2net", choices=list(MODEL_DESCRIPTIONS))
+    parser.add_argument(
+        "-f", "--format", default="png", choices=OUTPUT_FORMATS, help="Formato de saida; webm so para animacoes."
+    )
+    parser.add_argument("-p", "--potencia", type=int, default=75, help="Potencia da borda (0-100).")
+    parser.add_argument(
+        "--tile",
+        type=parse_tile,
+        default=DEFAULT_TILE,
+        help="Tamanho do bloco do upscale, ou 'auto' (perfil calibrado).",
+    )
+    parser.add_argument("--upscale", type=int, default=0, choices=(0, 2, 3, 4))
+    parser.add_argument(
+        "--upscale-model",
+        choices=model_choices(),
+        help="Modelo do upscale: auto (nativo do fator), fast (rede compacta) ou um nome (padrao: UPSCALE_MODEL).",
+    )
+    parser.add_argument("--trim", action="store_true", help="Recorta a imagem ao conteudo.")
+    parser.add_argument("--fill-holes", action="store_true", help="Preenche buracos internos do recorte.")
+    parser.add_argument("--shadow", action="store_true", help="Aplica sombra projetada.")
+    parser.add_argument("--shadow-blur", type=int, default=15)
+    parser.add_argument("--shadow-opacity", type=int, default=70)
+    background = parser.add_mutually_exclusive_group()
+    background.add_argument("--background-color", help="Cor de fundo, ex.: #ffffff.")
+    background.add_argument("--background-image", help="Imagem de fundo.")
+    parser.add_argument("--background-resize-mode", default="fit-bg-to-fg", choices=("fit-bg-to-fg", "fit-fg-to-bg"))
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Arquivos processados em paralelo.")
+    parser.add_argument("--queue", help="Banco SQLite da fila de jobs (padrao: JOB_QUEUE_PATH).")
+    parser.add_argument("--resume", action="store_true", help="Retoma os jobs inacabados da fila.")
+    parser.add_argument("--force", action="store_true", help="Refaz arquivos ja concluidos.")
+    parser.add_argument("--no-dedup", action="store_true", help="Processa arquivos de conteudo repetido um a um.")
+    parser.add_argument("--watch", metavar="PASTA", help="Monitora a pasta e processa cada arquivo novo (requer -o).")
+    parser.add_argument(
+        "--settle", type=float, help="Segundos sem mudanca antes de um arquivo monitorado ser processado."
+    )
+    parser.add_argument("--interval", type=float, help="Intervalo entre varreduras da pasta monitorada.")
+    parser.add_argument(
+        "--calibrate-tiles",
+        nargs="?",
+        const=",".join(map(str, DEFAULT_CALIBRATION_TILES)),
+        metavar="TAMANHOS",
+        help="Mede os tamanhos de bloco (ex.: 256,512) nesta maquina e grava o perfil do bloco 'auto' "
+        "dos modelos de --upscale-model.",
+    )
+    parser.add_argument(
+        "--calibrate-size",
+        default="x".join(map(str, DEFAULT_CALIBRATION_SIZE)),
+        metavar="LxA",
+        help="Imagem sintetica da calibracao.",
+    )
+    parser.add_argument(
+        "--export-onnx-upscale",
+        nargs="?",
+        const=DEFAULT_UPSCALE_MODEL,
+        choices=list(UPSCALE_MODELS),
+        metavar="MODELO",
+        help="Exporta o modelo de upscale para ONNX (UPSCALE_BACKEND=onnx) e confere a paridade com o torch.",
+    )
+    parser.add_argument("--parity-images", nargs="+", metavar="IMAGEM", help="Imagens extras da conferencia.")
+    return parser
+
+
+def processor_options(args: argparse.Namespace, output_dir: str | None) -> dict[str, Any]:
+    # Argumentos do ImageProcessor alem da entrada; e tambem o que a fila guarda de cada job.
+    return {
+        "model_name": args.model,
+        "output_format": args.format,
+        "potencia": args.potencia,
+        "tile_size": args.tile,
+        "post_processing_opts": build_post_processing_opts(args),
+        "output_dir": output_dir,
+    }
+
+
+def output_format_error(input_path: str, output_format: str) -> str | None:
+    output_format = output_format.lstrip(".")
+    if output_format in ANIMATION_ONLY_FORMATS and not input_path.lower().endswith(VIDEO_EXTENSIONS):
+        return f"o formato {output_format} so vale para animacoes; use png, webp, svg ou gif para imagens"
+    return None
+
+
+def process_file(job: QueuedJob, queue: JobQueue) -> dict[str, Any]:
+    result: dict[str, Any] = {"input": job.input_path, "status": "ok", "output": None, "error": None}
+    if job.state == DONE:
+        result.update(status="skipped", output=job.output_path, seconds=0.0, stats={})
+        return result
+    error: str | None = output_format_error(job.input_path, job.options["output_format"])
+    if error:
+        logger.error(f"{job.input_path}: {error}")
+        result.update(status="error", error=error, seconds=0.0, stats={})
+        queue.mark_failed(job.id, error)
+        return result
+
+    proc = ImageProcessor(input_path=job.input_path, **job.options)
+    with admit(proc):
+        queue.mark_running(job.id)
+        start: float = time.perf_counter()
+        try:
+            result["output"] = proc.process()
+            queue.mark_done(job.id, result["output"])
+        except Exception as e:
+            logger.error(f"Falha ao processar {job.input_path}: {e}", exc_info=True)
+            result["status"], result["error"] = "error", str(e)
+            queue.mark_failed(job.id, str(e))
+        result["seconds"] = round(time.perf_counter() - start, 3)
+    result["stats"] = proc.stats
+    return result
+
+
+def find_duplicate_jobs(jobs: list[QueuedJob]) -> dict[int, list[QueuedJob]]:
+    # So jobs com as mesmas opcoes (a pasta de saida a parte) compartilham o resultado.
+    groups: dict[str, list[QueuedJob]] = {}
+    for job in jobs:
+        if job.state != DONE:
+            options: dict[str, Any] = {key: value for key, value in job.options.items() if key != "output_dir"}
+            groups.setdefault(json.dumps(options, sort_keys=True), []).append(job)
+    duplicates: dict[int, list[QueuedJob]] = {}
+    for group in groups.values():
+        by_path: dict[str, QueuedJob] = {job.input_path: job for job in group}
+        for primary, copies in find_duplicates(list(by_path)).items():
+            duplicates[by_path[primary].id] = [by_path[copy] for copy in copies]
+    return duplicates
+
+
+def copy_result(job: QueuedJob, primary: dict[str, Any], queue: JobQueue) -> dict[str, Any]:
+    result: dict[str, Any] = {
+        "input": job.input_path,
+        "status": "duplicate",
+        "output": None,
+        "error": None,
+        "duplicate_of": primary["input"],
+        "seconds": 0.0,
+        "stats": {},
+    }
+    start: float = time.perf_counter()
+    try:
+        if primary["status"] == "error":
+            raise RuntimeError(primary["error"])
+        result["output"] = materialize_duplicate(primary["output"], job.input_path, job.options.get("output_dir"))
+        queue.mark_done(job.id, result["output"])
+    except Exception as e:
+        logger.error(f"Falha ao processar {job.input_path}: {e}")
+        result["status"], result["error"] = "error", str(e)
+        queue.mark_failed(job.id, str(e))
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def watch_job(path: str, root: str, args: argparse.Namespace, queue: JobQueue) -> QueuedJob:
+    # Mesma estrutura de subpastas do modo em lote. Um arquivo reescrito depois de processado
+    # (saida mais velha que a entrada) volta a ser processado.
+    target: str = os.path.normpath(os.path.join(args.output_dir, os.path.relpath(os.path.dirname(path), root)))
+    options: dict[str, Any] = processor_options(args, target)
+    job: QueuedJob = queue.enqueue([path], options, force=args.force)[0]
+    if job.state == DONE and job.output_path and os.path.getmtime(job.output_path) < os.path.getmtime(path):
+        job = queue.enqueue([path], options, force=True)[0]
+    return job
+
+
+def run_watch(args: argparse.Namespace, queue: JobQueue, stop: threading.Event) -> None:
+    # Modo continuo: cada arquivo que assenta na pasta vira um job na fila e uma linha JSON no
+    # stdout. Os workers ficam quentes entre uma chegada e outra, sem idle timeout.
+    root: str = os.path.abspath(args.watch)
+    output_dir: str = os.path.abspath(args.output_dir)
+    keep_workers_warm()
+    warm_up_workers(args.model, max(1, args.jobs), upscale=bool(args.upscale))
+    write_lock: threading.Lock = threading.Lock()
+
+    def handle(path: str) -> None:
+        result: dict[str, Any] = process_file(watch_job(path, root, args, queue), queue)
+        with write_lock:
+            sys.stdout.write(json.dumps(result, default=str) + "\n")
+            sys.stdout.flush()
+
+    watcher = FolderWatcher(
+        root,
+        args.settle if args.settle is not None else default_settle_seconds(),
+        exclude=(output_dir,),
+    )
+    interval: float = args.interval if args.interval is not None else default_poll_interval()
+    WatchService(watcher, handle, max(1, args.jobs), interval).run(stop)
+
+
+def watch_main(args: argparse.Namespace, parser: argparse.ArgumentParser) -> int:
+    if not args.output_dir:
+        parser.error("--watch requer --output-dir")
+    if os.path.abspath(args.output_dir) == os.path.abspath(args.watch):
+        parser.error("a pasta de saida precisa ser diferente da pasta monitorada")
+    if not os.path.isdir(args.watch):
+        parser.error(f"pasta nao encontrada: {args.watch}")
+    setup_logging(stream=sys.stderr)
+
+    stop: threading.Event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    queue = JobQueue(args.queue or default_queue_path())
+    try:
+        run_watch(args, queue, stop)
+    except KeyboardInterrupt:
+        stop.set()
+    finally:
+        shutdown_workers()
+        queue.close()
+    return 0
+
+
+def calibrate_main(args: argparse.Namespace, parser: argparse.ArgumentParser) -> int:
+    try:
+        tiles: tuple[int, ...] = tuple(int(tile) for tile in args.calibrate_tiles.split(","))
+        width, height = (int(value) for value in args.calibrate_size.lower().split("x"))
+    except ValueError:
+        parser.error("use --calibrate-tiles 256,512 e --calibrate-size 768x512")
+    setup_logging(stream=sys.stderr)
+    # Sem --upscale-model, calibra os modelos que o UPSCALE_MODEL configurado pode escolher.
+    choice: str = args.upscale_model or get_setting("UPSCALE_MODEL", AUTO_PRESET)
+    profiles: list[dict[str, Any]] = []
+    for model in calibration_models(choice):
+        try:
+            profile: dict[str, Any] = calibrate(
+                tiles, (width, height), model=model.name, models_dir=upscale_models_dir()
+            )
+        except RuntimeError as e:
+            logger.error(f"Falha na calibracao: {e}")
+            return 1
+        logger.info(f"Perfil de blocos de {model.name} gravado em {save_profile(profile)}.")
+        profiles.append(profile)
+    json.dump(profiles, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+def export_onnx_main(args: argparse.Namespace) -> int:
+    setup_logging(stream=sys.stderr)
+    try:
+        report: dict[str, Any] = export_onnx_upscale(args.export_onnx_upscale, args.parity_images)
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    if not report.get("ok"):
+        logger.error(f"Sem paridade com o torch (tolerancia {report.get('tolerance')}); o ONNX foi descartado.")
+        return 1
+    logger.info(f"Modelo ONNX gravado em {report['path']}. Use UPSCALE_BACKEND=onnx no config.json.")
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser: argparse.ArgumentParser = build_parser()
+    args: argparse.Namespace = parser.parse_args(argv)
+    if args.calibrate_tiles:
+        return calibrate_main(args, parser)
+    if args.export_onnx_upscale:
+        return export_onnx_main(args)
+    if args.watch:
+        return watch_main(args, parser)
+    if not args.inputs and not args.resume:
+        parser.error("informe ao menos uma entrada, --resume, --watch ou --calibrate-tiles")
+    setup_logging(stream=sys.stderr)
+
+    queue = JobQueue(args.queue or default_queue_path())
+    jobs: list[QueuedJob] = queue.unfinished() if args.resume else []
+    output_dir: str | None = os.path.abspath(args.output_dir) if args.output_dir else None
+    by_output_dir: dict[str | None, list[str]] = {}
+    for path, target in collect_inputs(args.inputs, output_dir):
+        by_output_dir.setdefault(target, []).append(path)
+    for target, paths in by_output_dir.items():
+        jobs.extend(queue.enqueue(paths, processor_options(args, target), force=args.force))
+    jobs = list({job.id: job for job in jobs}.values())
+
+    jobs_count: int = max(1, args.jobs)
+    skipped: int = sum(1 for job in jobs if job.state == DONE)
+    logger.info(
+        f"Processando {len(jobs) - skipped} arquivo(s) com ate {jobs_count} job(s) simultaneo(s); "
+        f"{skipped} ja concluido(s)."
+    )
+
+    start: float = time.perf_counter()
+    duplicates: dict[int, list[QueuedJob]] = {}
+    if dedup_enabled() and not args.no_dedup:
+        duplicates = find_duplicate_jobs(jobs)
+    copies: dict[int, int] = {copy.id: primary for primary, group in duplicates.items() for copy in group}
+    if copies:
+        logger.info(f"{len(copies)} arquivo(s) duplicado(s) serao copiados do original, sem reprocessar.")
+
+    to_process: list[QueuedJob] = [job for job in jobs if job.id not in copies]
+    try:
+        with ThreadPoolExecutor(max_workers=jobs_count, thread_name_prefix="fogstripper-cli") as pool:
+            processed: dict[int, dict[str, Any]] = {
+                job.id: result
+                for job, result in zip(
+                    to_process, pool.map(lambda job: process_file(job, queue), to_process), strict=True
+                )
+            }
+        results: list[dict[str, Any]] = [
+            copy_result(job, processed[copies[job.id]], queue) if job.id in copies else processed[job.id]
+            for job in jobs
+        ]
+    finally:
+        shutdown_workers()
+        queue.close()
+
+    failed: int = sum(1 for result in results if result["status"] == "error")
+    summary: dict[str, Any] = {
+        "total": len(results),
+        "succeeded": sum(1 for result in results if result["status"] == "ok"),
+        "skipped": skipped,
+        "duplicates": sum(1 for result in results if result["status"] == "duplicate"),
+        "failed": failed,
+        "seconds": round(time.perf_counter() - start, 3),
+        "files": results,
+    }
+    for name, cache in (("stage_cache", get_stage_cache()), ("mask_cache", get_mask_cache())):
+        if cache is not None:
+            summary[name] = cache.stats()
+    json.dump(summary, sys.stdout, indent=2, default=str)
+    sys.stdout.write("\n")
+    return 1 if failed or not (results or args.resume) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any
+
+from PIL import Image, UnidentifiedImageError
+
+from src.core.animation import REMBG_FRAME_BYTES, FrameSource
+from src.core.config_loader import APP_DIR, get_setting
+from src.core.tile_calibration import resolve_tile_size
+from src.utils.memory import MemoryBudget, RssSampler, RssWindow, available_memory_bytes, estimate_peak_bytes
+from src.workers.upscale_models import AUTO_PRESET, UpscaleModel, select_model
+
+if TYPE_CHECKING:
+    # So para anotacoes: o processor usa upscale_tile_size deste modulo.
+    from src.core.processor import ImageProcessor
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Com MEMORY_BUDGET_MB em "auto", os jobs simultaneos dividem esta fracao da memoria livre
+# medida na primeira admissao.
+AUTO_BUDGET_FRACTION: float = 0.7
+DEFAULT_INFERENCE_BYTES: int = 500 * 1024**2
+
+
+def media_dimensions(path: str) -> tuple[int, int, int]:
+    # Largura, altura e numero de quadros, lidos do cabecalho sempre que possivel.
+    try:
+        with Image.open(path) as img:
+            return img.width, img.height, getattr(img, "n_frames", 1)
+    except UnidentifiedImageError:
+        pass
+    with FrameSource(path) as source:
+        size = source.meta.get("size") or next(iter(source)).shape[1::-1]
+        return int(size[0]), int(size[1]), source.estimated_frame_count or 1
+
+
+def estimate_job_memory(proc: "ImageProcessor", input_path: str | None = None) -> int:
+    # `input_path` permite estimar varios arquivos com as opcoes de um mesmo processador (PipelinedBatch).
+    input_path = input_path or proc.input_path
+    opts: dict[str, Any] = proc.post_processing_opts
+    try:
+        width, height, frames = media_dimensions(input_path)
+    except Exception as e:
+        # Sem dimensoes o job entra com a estimativa minima; se o arquivo for ilegivel, ele
+        # falha logo no inicio de qualquer forma.
+        logger.warning(f"Falha ao ler as dimensoes de {input_path} para estimar memoria: {e}")
+        width, height, frames = 0, 0, 1
+    factor: int = int(opts.get("upscale_factor", 0) or 0)
+    model: UpscaleModel = upscale_model_for(opts)
+    return estimate_peak_bytes(
+        width,
+        height,
+        upscale_factor=factor,
+        tile_size=upscale_tile_size(proc.tile_size, width, height, factor, model) if factor else proc.tile_size,
+        frames=frames,
+        inference_bytes=REMBG_FRAME_BYTES.get(proc.model_name, DEFAULT_INFERENCE_BYTES),
+        model_scale=model.scale,
+        tile_bytes_per_pixel=model.tile_bytes_per_pixel,
+        upscale_processes=upscale_processes(),
+    )
+
+
+def memory_budget_bytes() -> int | None:
+    setting = get_setting("MEMORY_BUDGET_MB", "auto")
+    if str(setting).lower() == "auto":
+        available: int | None = available_memory_bytes()
+        return int(available * AUTO_BUDGET_FRACTION) if available else None
+    budget_mb: float = float(setting)
+    return int(budget_mb * 1024**2) if budget_mb > 0 else None
+
+
+def upscale_model_for(opts: dict[str, Any], factor: int | None = None) -> UpscaleModel:
+    # O modelo do upscale sai do fator: "upscale_model" nas opcoes (CLI, servidor) ou
+    # UPSCALE_MODEL na configuracao, com "auto", um preset ("quality", "fast") ou um nome.
+    choice: str = opts.get("upscale_model") or get_setting("UPSCALE_MODEL", AUTO_PRESET)
+    factor = int(opts.get("upscale_factor", 0) or 0) if factor is None else factor
+    return select_model(factor, choice)
+
+
+def upscale_models_dir() -> str:
+    return os.path.expanduser(get_setting("UPSCALE_MODELS_DIR", os.path.join(APP_DIR, "models", "upscale")))
+
+
+def upscale_backend() -> str:
+    return str(get_setting("UPSCALE_BACKEND", "torch")).lower()
+
+
+def upscale_processes() -> int:
+    # Processos que dividem os blocos do upscale em CPU; 1 mantem o enhance em um processo so.
+    # O worker ONNX nao abre o pool (o onnxruntime ja paraleliza cada bloco), entao nem a
+    # estimativa nem a requisicao contam processos extras.
+    if upscale_backend() == "onnx":
+        return 1
+    return max(1, int(get_setting("UPSCALE_PROCESSES", 1)))
+
+
+def upscale_tile_size(tile_size: int, width: int, height: int, factor: int, model: UpscaleModel) -> int:
+    # Resolve o bloco "auto" contra o mesmo limite usado na admissao dos jobs, pelo perfil do
+    # modelo que vai rodar.
+    budget: MemoryBudget | None = get_memory_budget()
+    limit: int | None = budget.limit_bytes if budget else available_memory_bytes()
+    return resolve_tile_size(tile_size, width, height, factor, limit, model)
+
+
+_budget: MemoryBudget | None = None
+_budget_resolved: bool = False
+_budget_lock: threading.Lock = threading.Lock()
+# Uma thread de amostragem para todos os jobs do processo.
+_rss_sampler: RssSampler = RssSampler()
+
+
+def get_memory_budget() -> MemoryBudget | None:
+    # Um orcamento unico por processo: GUI, CLI, --watch e servidor disputam a mesma memoria.
+    global _budget, _budget_resolved
+    with _budget_lock:
+        if not _budget_resolved:
+            limit: int | None = memory_budget_bytes()
+            _budget = MemoryBudget(limit) if limit else None
+            _budget_resolved = True
+            if _budget:
+                logger.info(f"Orcamento de memoria dos jobs: {limit / 1024**2:.0f} MB.")
+        return _budget
+
+
+class MemoryTicket:
+    # Reserva de um job admitido. Na liberacao, registra a estimativa ao lado do crescimento do
+    # RSS (processo + workers) desde a admissao, para calibrar o modelo de memoria.
+    def __init__(self, budget: MemoryBudget | None, label: str, estimate: int) -> None:
+        self.budget: MemoryBudget | None = budget
+        self.label: str = label
+        self.estimate: int = estimate
+        self.window: RssWindow | None = _rss_sampler.open()
+        self._released: bool = False
+
+    def release(self) -> int | None:
+        if self._released:
+            return self.window.growth_bytes if self.window else None
+        self._released = True
+        growth: int | None = _rss_sampler.close(self.window)
+        if self.budget is not None:
+            self.budget.release(self.estimate)
+        measured: str = "indisponivel"
+        if self.window is not None and growth is not None:
+            measured = f"{growth / 1024**2:.0f} MB sobre a base de {self.window.baseline / 1024**2:.0f} MB"
+            if self.window.concurrent > 1:
+                measured += f", com ate {self.window.concurrent} jobs simultaneos"
+        logger.info(
+            f"Memoria de {os.path.basename(self.label)}: estimativa {self.estimate / 1024**2:.0f} MB, "
+            f"crescimento do RSS medido {measured}."
+        )
+        return growth
+
+    def __enter__(self) -> "MemoryTicket":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.release()
+
+
+def try_admit(proc: "ImageProcessor", estimate: int | None = None) -> MemoryTicket | None:
+    # Versao sem bloqueio, para o BatchScheduler na thread da interface.
+    estimate = estimate_job_memory(proc) if estimate is None else estimate
+    budget: MemoryBudget | None = get_memory_budget()
+    if budget is not None and not budget.try_reserve(estimate):
+        return None
+    return MemoryTicket(budget, proc.input_path, estimate)
+
+
+def admit(proc: "ImageProcessor", input_path: str | None = None) -> MemoryTicket:
+    # Espera ate o job caber no orcamento; usado pelas threads da CLI, do --watch, do servidor e
+    # pela alimentacao do PipelinedBatch.
+    input_path = input_path or proc.input_path
+    estimate: int = estimate_job_memory(proc, input_path)
+    budget: MemoryBudget | None = get_memory_budget()
+    if budget is not None and not budget.try_reserve(estimate):
+        logger.info(
+            f"{os.path.basename(input_path)} aguarda memoria: estimativa {estimate / 1024**2:.0f} MB, "
+            f"{budget.used_bytes / 1024**2:.0f}/{budget.limit_bytes / 1024**2:.0f} MB em uso."
+        )
+        budget.reserve(estimate)
+    return MemoryTicket(budget, input_path, estimate)
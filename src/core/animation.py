@@ -0,0 +1,446 @@
+import itertools
+import logging
+import math
+import os
+import shutil
+import sys
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+import cv2
+import imageio.v2 as imageio
+import numpy as np
+from numpy.typing import NDArray
+from PIL import Image
+
+from src.utils import svg_utils
+from src.utils.image_processing import INTERMEDIATE_PNG_COMPRESSION
+from src.utils.memory import available_memory_bytes
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class FrameSource:
+    def __init__(self, path: str, start: int = 0, stop: int | None = None) -> None:
+        self.path: str = path
+        self.start: int = start
+        self.stop: int | None = stop
+        self.reader = imageio.get_reader(path)
+        self.meta: dict[str, Any] = self.reader.get_meta_data()
+
+    @property
+    def fps(self) -> float:
+        return self.meta.get("fps") or (1000 / (self.meta.get("duration") or 100))
+
+    @property
+    def frame_count(self) -> int | None:
+        try:
+            count = len(self.reader)
+        except (TypeError, ValueError):
+            return None
+        if not count or math.isinf(count) or count >= sys.maxsize:
+            return None
+        return int(count)
+
+    @property
+    def estimated_frame_count(self) -> int | None:
+        # Videos do ffmpeg nao informam o total exato sem decodificar tudo; duracao x fps basta
+        # para dividir o trabalho.
+        if self.frame_count is not None:
+            return self.frame_count
+        duration: float | None = self.meta.get("duration")
+        if duration and self.meta.get("fps") and not math.isinf(duration):
+            return max(1, round(duration * self.meta["fps"]))
+        return None
+
+    def __iter__(self) -> Iterator[NDArray[np.uint8]]:
+        # Decodifica desde o inicio e descarta os quadros anteriores ao segmento. A busca do
+        # ffmpeg e por tempo (indice / fps) e, em codecs com quadros P/B ou taxa variavel, pode
+        # cair num quadro vizinho e duplicar ou perder quadros na juncao dos segmentos.
+        for frame in itertools.islice(self.reader, self.start, self.stop):
+            yield np.asarray(frame)
+
+    def close(self) -> None:
+        self.reader.close()
+
+    def __enter__(self) -> "FrameSource":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class FrameSink:
+    def append(self, frame: NDArray[np.uint8]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> str:
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        pass
+
+
+class FrameDirectorySink(FrameSink):
+    def __init__(self, output_dir: str, output_format: str, temp_dir: str, first_index: int = 0) -> None:
+        self.output_dir: str = output_dir
+        self.output_format: str = output_format
+        self.temp_dir: str = temp_dir
+        self.index: int = first_index
+        os.makedirs(output_dir, exist_ok=True)
+
+    def append(self, frame: NDArray[np.uint8]) -> None:
+        base: str = os.path.join(self.output_dir, f"frame_{self.index:04d}")
+        self.index += 1
+
+        if self.output_format == ".svg":
+            raster: str = os.path.join(self.temp_dir, "svg_frame.png")
+            Image.fromarray(frame).save(raster, compress_level=INTERMEDIATE_PNG_COMPRESSION)
+            if svg_utils.raster_to_svg(raster, f"{base}.svg"):
+                return
+            logger.warning(f"SVG falhou no quadro {self.index - 1}, salvando como PNG.")
+            shutil.move(raster, f"{base}.png")
+            return
+
+        Image.fromarray(frame).save(f"{base}{self.output_format}")
+
+    def close(self) -> str:
+        return self.output_dir
+
+
+class VideoSink(FrameSink):
+    def __init__(self, output_path: str, fps: float) -> None:
+        self.output_path: str = output_path
+        self.writer = imageio.get_writer(output_path, fps=fps, codec="libvpx-vp9", pixelformat="yuva420p", quality=8)
+
+    def append(self, frame: NDArray[np.uint8]) -> None:
+        self.writer.append_data(frame)
+
+    def close(self) -> str:
+        self.writer.close()
+        return self.output_path
+
+    def abort(self) -> None:
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class PillowAnimationSink(FrameSink):
+    # GIF/WEBP animados: o Pillow so codifica no fechamento, entao os quadros ficam em disco
+    # ate la e sao relidos um a um durante a codificacao, em vez de acumulados em memoria.
+    def __init__(self, output_path: str, fps: float, spill_dir: str) -> None:
+        self.output_path: str = output_path
+        self.duration: float = 1000 / fps
+        self.spill_dir: str = spill_dir
+        self.paths: list[str] = []
+        os.makedirs(spill_dir, exist_ok=True)
+
+    def append(self, frame: NDArray[np.uint8]) -> None:
+        path: str = os.path.join(self.spill_dir, f"frame_{len(self.paths):06d}.png")
+        Image.fromarray(frame).save(path, compress_level=INTERMEDIATE_PNG_COMPRESSION)
+        self.paths.append(path)
+
+    def _iter_rest(self) -> Iterator[Image.Image]:
+        for path in self.paths[1:]:
+            with Image.open(path) as img:
+                img.load()
+                yield img
+
+    def close(self) -> str:
+        if not self.paths:
+            raise RuntimeError("Nenhum quadro processado.")
+        with Image.open(self.paths[0]) as first:
+            first.save(
+                self.output_path,
+                save_all=True,
+                append_images=self._iter_rest(),
+                duration=self.duration,
+                loop=0,
+                disposal=2,
+            )
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+        return self.output_path
+
+    def abort(self) -> None:
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+def open_frame_sink(output_format: str, final_output_path: str, fps: float, temp_dir: str) -> FrameSink:
+    if output_format in (".png", ".svg"):
+        return FrameDirectorySink(os.path.splitext(final_output_path)[0], output_format, temp_dir)
+    if final_output_path.lower().endswith(".webm"):
+        return VideoSink(final_output_path, fps)
+    return PillowAnimationSink(final_output_path, fps, os.path.join(temp_dir, "encoded_frames"))
+
+
+T = TypeVar("T")
+
+# Memoria aproximada por quadro em uma inferencia em lote (ativacoes do ONNX em float32).
+REMBG_FRAME_BYTES: dict[str, int] = {
+    "u2net": 350 * 1024**2,
+    "u2netp": 120 * 1024**2,
+    "isnet-general-use": 1500 * 1024**2,
+}
+MAX_AUTO_BATCH: int = 8
+
+
+def default_rembg_workers() -> int:
+    return max(1, (os.cpu_count() or 1) // 4)
+
+
+def resolve_batch_size(setting: Any, model: str, workers: int) -> int:
+    if str(setting).lower() != "auto":
+        return max(1, int(setting))
+    if model not in REMBG_FRAME_BYTES:
+        return 1
+
+    available: int | None = available_memory_bytes()
+    if available is None:
+        return 1
+    # Metade da memoria livre dividida entre os workers que inferem ao mesmo tempo.
+    budget: float = available * 0.5 / max(1, workers)
+    size: int = max(1, min(MAX_AUTO_BATCH, int(budget // REMBG_FRAME_BYTES[model])))
+    logger.info(f"Lote automatico do rembg: {size} quadro(s) por inferencia ({model}, {workers} worker(s)).")
+    return size
+
+
+def _iter_batches(items: Iterable[T], batch_size: int) -> Iterator[tuple[int, list[T]]]:
+    batch: list[T] = []
+    start: int = 0
+    for index, item in enumerate(items):
+        if not batch:
+            start = index
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield start, batch
+            batch = []
+    if batch:
+        yield start, batch
+
+
+def iter_processed_frames(
+    items: Iterable[T],
+    process: Callable[[int, list[T]], list[NDArray[np.uint8]]],
+    workers: int = 1,
+    on_complete: Callable[[int], None] | None = None,
+    max_pending: int | None = None,
+    batch_size: int = 1,
+) -> Iterator[NDArray[np.uint8]]:
+    batches: Iterator[tuple[int, list[T]]] = _iter_batches(items, max(1, batch_size))
+    completed: int = 0
+
+    if workers <= 1:
+        for start, batch in batches:
+            results: list[NDArray[np.uint8]] = process(start, batch)
+            completed += len(results)
+            if on_complete:
+                on_complete(completed)
+            yield from results
+        return
+
+    # Janela limitada de lotes em voo; os resultados que chegam fora de ordem esperam
+    # no buffer de remontagem ate que o proximo lote (pela ordem de envio) fique pronto.
+    limit: int = max_pending or workers * 2
+    pending: dict[Future, int] = {}
+    ready: dict[int, list[NDArray[np.uint8]]] = {}
+    submitted: int = 0
+    next_batch: int = 0
+    exhausted: bool = False
+
+    pool: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fogstripper-frame")
+    try:
+        while True:
+            while not exhausted and len(pending) + len(ready) < limit:
+                try:
+                    start, batch = next(batches)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[pool.submit(process, start, batch)] = submitted
+                submitted += 1
+
+            if not pending and not ready:
+                break
+
+            if pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    results = future.result()
+                    ready[pending.pop(future)] = results
+                    completed += len(results)
+                    if on_complete:
+                        on_complete(completed)
+
+            while next_batch in ready:
+                yield from ready.pop(next_batch)
+                next_batch += 1
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+@dataclass
+class FrameGroup:
+    # Quadro-chave seguido dos quadros quase identicos que reaproveitam sua mascara.
+    index: int
+    frames: list[NDArray[np.uint8]] = field(default_factory=list)
+    # Fluxo optico de cada quadro apos o chave ate o anterior; vazio = mascara copiada.
+    flows: list[NDArray[np.float32]] = field(default_factory=list)
+
+    @property
+    def keyframe(self) -> NDArray[np.uint8]:
+        return self.frames[0]
+
+
+class FrameSimilarityGate:
+    # A miniatura acompanha o quadro: celulas de CELL_PIXELS px, ate MAX_THUMBNAIL_SIDE celulas no
+    # lado maior. Uma miniatura fixa pequena dilui um objeto pequeno em movimento em celulas enormes
+    # nos quadros grandes, e o quadro reaproveitaria uma mascara desatualizada.
+    CELL_PIXELS: int = 8
+    MAX_THUMBNAIL_SIDE: int = 160
+
+    def __init__(self, tolerance: float) -> None:
+        self.tolerance: float = tolerance
+        self.inferred: int = 0
+        self.skipped: int = 0
+        self._key_signature: NDArray[np.float32] | None = None
+
+    def signature(self, frame: NDArray[np.uint8]) -> NDArray[np.float32]:
+        gray: NDArray[np.uint8]
+        if frame.ndim == 2:
+            gray = frame
+        else:
+            gray = cv2.cvtColor(np.ascontiguousarray(frame[:, :, :3]), cv2.COLOR_RGB2GRAY)
+        return cv2.resize(gray, self.thumbnail_size(gray), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def thumbnail_size(self, gray: NDArray[np.uint8]) -> tuple[int, int]:
+        height, width = gray.shape[:2]
+        cell: float = max(self.CELL_PIXELS, max(width, height) / self.MAX_THUMBNAIL_SIDE)
+        return max(1, round(width / cell)), max(1, round(height / cell))
+
+    def reuses_mask(self, frame: NDArray[np.uint8], force_keyframe: bool = False) -> bool:
+        # Compara com o ultimo quadro-chave (e nao com o anterior) para nao acumular deriva;
+        # o maximo por celula da miniatura ainda detecta objetos pequenos se movendo.
+        signature: NDArray[np.float32] = self.signature(frame)
+        key: NDArray[np.float32] | None = self._key_signature
+        if not force_keyframe and key is not None and signature.shape == key.shape:
+            if float(np.max(np.abs(signature - key))) <= self.tolerance:
+                self.skipped += 1
+                return True
+        self._key_signature = signature
+        self.inferred += 1
+        return False
+
+
+def group_similar_frames(
+    frames: Iterable[NDArray[np.uint8]], gate: FrameSimilarityGate | None, max_group: int = 32
+) -> Iterator[FrameGroup]:
+    group: FrameGroup | None = None
+    for index, frame in enumerate(frames):
+        if gate is None:
+            yield FrameGroup(index, [frame])
+            continue
+        # Grupos limitados para que um trecho estatico longo nao segure o fluxo de saida.
+        full: bool = group is None or len(group.frames) >= max_group
+        if gate.reuses_mask(frame, force_keyframe=full) and group is not None:
+            group.frames.append(frame)
+            continue
+        if group is not None:
+            yield group
+        group = FrameGroup(index, [frame])
+    if group is not None:
+        yield group
+
+
+class FlowKeyframeGate:
+    # O fluxo e calculado em escala reduzida: basta para mover a mascara e custa
+    # uma fracao da inferencia.
+    FLOW_WIDTH: int = 320
+
+    def __init__(self, interval: int, max_error: float) -> None:
+        self.interval: int = max(1, interval)
+        self.max_error: float = max_error
+        self.inferred: int = 0
+        self.propagated: int = 0
+        self.rekeyed: int = 0
+        self._previous: NDArray[np.uint8] | None = None
+
+    def _small_gray(self, frame: NDArray[np.uint8]) -> NDArray[np.uint8]:
+        gray: NDArray[np.uint8] = (
+            frame if frame.ndim == 2 else cv2.cvtColor(np.ascontiguousarray(frame[:, :, :3]), cv2.COLOR_RGB2GRAY)
+        )
+        height, width = gray.shape
+        if width <= self.FLOW_WIDTH:
+            return gray
+        size: tuple[int, int] = (self.FLOW_WIDTH, max(1, round(height * self.FLOW_WIDTH / width)))
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+    def flow_from_previous(self, frame: NDArray[np.uint8], force_keyframe: bool = False) -> NDArray[np.float32] | None:
+        # Retorna o fluxo (quadro atual -> anterior) quando a mascara pode ser propagada, ou None
+        # quando o quadro deve passar pela inferencia. O erro fotometrico do quadro anterior
+        # deformado pelo fluxo mede o quanto a propagacao se afastou; acima do limite
+        # (oclusao, corte de cena) o quadro vira um novo quadro-chave.
+        current: NDArray[np.uint8] = self._small_gray(frame)
+        previous: NDArray[np.uint8] | None = self._previous
+        self._previous = current
+        if not force_keyframe and previous is not None and previous.shape == current.shape:
+            flow: NDArray[np.float32] = cv2.calcOpticalFlowFarneback(current, previous, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+            warped: NDArray[np.uint8] = _remap(previous, flow)
+            error: float = float(np.mean(cv2.absdiff(warped, current)))
+            if error <= self.max_error:
+                self.propagated += 1
+                return flow
+            self.rekeyed += 1
+        self.inferred += 1
+        return None
+
+
+def _remap(image: NDArray[Any], flow: NDArray[np.float32]) -> NDArray[Any]:
+    height, width = flow.shape[:2]
+    grid_x, grid_y = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+    return cv2.remap(
+        image, grid_x + flow[:, :, 0], grid_y + flow[:, :, 1], cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
+    )
+
+
+def group_frames_by_flow(frames: Iterable[NDArray[np.uint8]], gate: FlowKeyframeGate) -> Iterator[FrameGroup]:
+    group: FrameGroup | None = None
+    for index, frame in enumerate(frames):
+        full: bool = group is None or len(group.frames) >= gate.interval
+        flow: NDArray[np.float32] | None = gate.flow_from_previous(frame, force_keyframe=full)
+        if flow is not None and group is not None:
+            group.frames.append(frame)
+            group.flows.append(flow)
+            continue
+        if group is not None:
+            yield group
+        group = FrameGroup(index, [frame])
+    if group is not None:
+        yield group
+
+
+def propagate_alpha(alpha: NDArray[np.uint8], flow: NDArray[np.float32]) -> NDArray[np.uint8]:
+    height, width = alpha.shape
+    flow_height, flow_width = flow.shape[:2]
+    if (flow_height, flow_width) != (height, width):
+        flow = cv2.resize(flow, (width, height), interpolation=cv2.INTER_LINEAR)
+        flow[:, :, 0] *= width / flow_width
+        flow[:, :, 1] *= height / flow_height
+    return _remap(alpha, flow)
+
+
+def with_alpha(frame: NDArray[np.uint8], alpha: NDArray[np.uint8]) -> NDArray[np.uint8]:
+    rgba: NDArray[np.uint8] = np.empty((*frame.shape[:2], 4), dtype=np.uint8)
+    rgba[:, :, :3] = frame[:, :, :3] if frame.ndim == 3 else frame[:, :, None]
+    rgba[:, :, 3] = alpha
+    return rgba
+
+
+def composite_on_transparent(image: Image.Image) -> NDArray[np.uint8]:
+    rgba: Image.Image = image.convert("RGBA")
+    canvas: Image.Image = Image.new("RGBA", rgba.size, (0, 0, 0, 0))
+    canvas.paste(rgba, (0, 0), rgba)
+    return np.array(canvas)
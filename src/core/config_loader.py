@@ -30,4 +30,8 @@ def load_paths() -> None:
         PATHS = {}
 
 
+def get_setting(key: str, default: Any = None) -> Any:
+    return PATHS.get(key, default)
+
+
 load_paths()
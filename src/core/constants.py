@@ -15,3 +15,10 @@ VIDEO_EXTENSIONS: tuple[str, ...] = (
 IMAGE_EXTENSIONS: tuple[str, ...] = (".png", ".jpg", ".jpeg", ".webp")
 
 ALL_EXTENSIONS: tuple[str, ...] = IMAGE_EXTENSIONS + VIDEO_EXTENSIONS
+
+MODEL_DESCRIPTIONS: dict[str, str] = {
+    "u2netp": "Versao 'light' do u2net. Mais rapido, menos detalhe.",
+    "u2net": "Modelo de uso geral, bom equilibrio entre velocidade e precisao.",
+    "u2net_human_seg": "Alta precisao, especializado para recortar pessoas.",
+    "isnet-general-use": "Moderno e porem pesado, mas com a melhor precisao para objetos.",
+}
@@ -0,0 +1,93 @@
+import logging
+import os
+import shutil
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.config_loader import get_setting
+from src.core.processor import backup_input, final_output_path_for, restore_backup
+from src.core.stage_cache import file_digest
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+def default_hash_workers() -> int:
+    # O hash e limitado pelo disco; o hashlib solta o GIL em blocos grandes, entao threads bastam.
+    return max(1, int(get_setting("HASH_WORKERS", min(8, (os.cpu_count() or 1) * 2))))
+
+
+def _safe_digest(path: str) -> str | None:
+    try:
+        return file_digest(path)
+    except OSError as e:
+        logger.warning(f"Falha ao ler {path} para deduplicacao: {e}")
+        return None
+
+
+def find_duplicates(paths: list[str], workers: int | None = None) -> dict[str, list[str]]:
+    # Devolve {primeira ocorrencia: [copias]} para cada conteudo repetido. Arquivos com tamanho
+    # unico nao podem ter copias e nem sao lidos; so os tamanhos repetidos vao para o hash.
+    by_size: defaultdict[int, list[str]] = defaultdict(list)
+    for path in dict.fromkeys(paths):
+        try:
+            by_size[os.path.getsize(path)].append(path)
+        except OSError:
+            continue
+    candidates: list[str] = [path for group in by_size.values() if len(group) > 1 for path in group]
+    if not candidates:
+        return {}
+
+    with ThreadPoolExecutor(
+        max_workers=workers or default_hash_workers(), thread_name_prefix="fogstripper-hash"
+    ) as pool:
+        digests: dict[str, str | None] = dict(zip(candidates, pool.map(_safe_digest, candidates), strict=True))
+
+    first: dict[str, str] = {}
+    duplicates: dict[str, list[str]] = {}
+    for path in paths:
+        digest: str | None = digests.get(path)
+        if digest is None:
+            continue
+        if digest in first:
+            duplicates.setdefault(first[digest], []).append(path)
+        else:
+            first[digest] = path
+    return duplicates
+
+
+def dedup_enabled() -> bool:
+    return bool(get_setting("DEDUP_INPUTS", True))
+
+
+def materialize_duplicate(output_path: str, duplicate_input: str, output_dir: str | None = None) -> str:
+    # A saida de uma copia e a do original com o nome da copia: hardlink quando o sistema de
+    # arquivos permite, copia caso contrario. Sem pasta de saida, a copia ganha o mesmo .bak.
+    is_dir: bool = os.path.isdir(output_path)
+    ext: str = "" if is_dir else os.path.splitext(output_path)[1]
+    target: str = final_output_path_for(duplicate_input, ext, output_dir)
+    if os.path.abspath(target) == os.path.abspath(output_path):
+        return target
+    backup_path: str | None = None
+    try:
+        if output_dir:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+        else:
+            _, backup_path = backup_input(duplicate_input)
+        if is_dir:
+            shutil.copytree(output_path, target, copy_function=_link_or_copy, dirs_exist_ok=True)
+        else:
+            if os.path.lexists(target):
+                os.remove(target)
+            _link_or_copy(output_path, target)
+    except OSError:
+        restore_backup(duplicate_input, backup_path)
+        raise
+    return target
+
+
+def _link_or_copy(src: str, dst: str) -> str:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
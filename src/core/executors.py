@@ -0,0 +1,99 @@
+import logging
+import os
+import threading
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from PIL import Image
+
+from src.core.config_loader import PATHS, get_setting
+from src.workers.worker_background import apply_background
+from src.workers.worker_effects import apply_shadow
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+StageFunction = Callable[..., Image.Image]
+
+STAGE_FUNCTIONS: dict[str, StageFunction] = {
+    "effects": apply_shadow,
+    "background": apply_background,
+}
+
+STAGE_SCRIPTS: dict[str, str] = {
+    "effects": "EFFECTS_SCRIPT",
+    "background": "BACKGROUND_SCRIPT",
+}
+
+EXECUTOR_CHOICES: tuple[str, ...] = ("inprocess", "subprocess")
+DEFAULT_EXECUTOR: str = "inprocess"
+
+
+class StageExecutor:
+    name: str = ""
+
+    def run(self, stage: str, image: Image.Image, params: dict[str, Any]) -> Image.Image:
+        raise NotImplementedError
+
+
+class InProcessExecutor(StageExecutor):
+    name = "inprocess"
+
+    _pool: ThreadPoolExecutor | None = None
+    _pool_lock: threading.Lock = threading.Lock()
+
+    @classmethod
+    def _get_pool(cls) -> ThreadPoolExecutor:
+        with cls._pool_lock:
+            if cls._pool is None:
+                workers: int = int(get_setting("STAGE_THREADS", os.cpu_count() or 1))
+                cls._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="fogstripper-stage")
+            return cls._pool
+
+    def run(self, stage: str, image: Image.Image, params: dict[str, Any]) -> Image.Image:
+        stage_fn: StageFunction = STAGE_FUNCTIONS[stage]
+        clean_params: dict[str, Any] = {k: v for k, v in params.items() if v is not None}
+        return self._get_pool().submit(stage_fn, image, **clean_params).result()
+
+
+class SubprocessExecutor(StageExecutor):
+    name = "subprocess"
+
+    def __init__(self, run_command: Callable[[list[str | None]], bool], temp_dir: str) -> None:
+        self.run_command: Callable[[list[str | None]], bool] = run_command
+        self.temp_dir: str = temp_dir
+
+    def run(self, stage: str, image: Image.Image, params: dict[str, Any]) -> Image.Image:
+        token: str = uuid.uuid4().hex[:8]
+        input_path: str = os.path.join(self.temp_dir, f"{stage}_{token}_in.png")
+        output_path: str = os.path.join(self.temp_dir, f"{stage}_{token}_out.png")
+        image.save(input_path)
+
+        cmd: list[str | None] = [
+            PATHS.get("PYTHON_REMBG"),
+            PATHS.get(STAGE_SCRIPTS[stage]),
+            "--input",
+            input_path,
+            "--output",
+            output_path,
+        ]
+        for key, value in params.items():
+            if value is not None:
+                cmd.extend([f"--{key.replace('_', '-')}", str(value)])
+
+        if not self.run_command(cmd):
+            raise RuntimeError(f"Worker do estagio '{stage}' falhou.")
+
+        with Image.open(output_path) as result:
+            return result.convert("RGBA")
+
+
+def get_stage_executor(run_command: Callable[[list[str | None]], bool], temp_dir: str) -> StageExecutor:
+    choice: str = str(get_setting("STAGE_EXECUTOR", DEFAULT_EXECUTOR)).lower()
+    if choice not in EXECUTOR_CHOICES:
+        logger.warning(f"STAGE_EXECUTOR invalido '{choice}', usando '{DEFAULT_EXECUTOR}'.")
+        choice = DEFAULT_EXECUTOR
+    if choice == "subprocess":
+        return SubprocessExecutor(run_command, temp_dir)
+    return InProcessExecutor()
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from src.core.config_loader import APP_DIR, get_setting
+from src.core.processor import backup_path_for, restore_backup
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+PENDING: str = "pending"
+RUNNING: str = "running"
+DONE: str = "done"
+FAILED: str = "failed"
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    input_path TEXT NOT NULL,
+    options_key TEXT NOT NULL,
+    options TEXT NOT NULL,
+    state TEXT NOT NULL,
+    output_path TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    input_size INTEGER,
+    input_mtime_ns INTEGER,
+    UNIQUE (input_path, options_key)
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+"""
+# Colunas que filas criadas por versoes anteriores nao tem.
+MIGRATIONS: dict[str, str] = {
+    "input_size": "ALTER TABLE jobs ADD COLUMN input_size INTEGER",
+    "input_mtime_ns": "ALTER TABLE jobs ADD COLUMN input_mtime_ns INTEGER",
+}
+
+
+def default_queue_path() -> str:
+    return os.path.expanduser(get_setting("JOB_QUEUE_PATH", os.path.join(APP_DIR, "jobs.sqlite3")))
+
+
+def input_signature(path: str) -> tuple[int, int] | None:
+    # Tamanho e mtime, como o watcher: uma entrada editada no lugar muda pelo menos um dos dois.
+    try:
+        st: os.stat_result = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def options_key(options: dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(options, sort_keys=True).encode()).hexdigest()
+
+
+@dataclass
+class QueuedJob:
+    id: int
+    input_path: str
+    options: dict[str, Any]
+    state: str
+    output_path: str | None = None
+    error: str | None = None
+
+
+class JobQueue:
+    # Fila persistente em SQLite: cada arquivo tem uma linha por combinacao de opcoes, e toda
+    # mudanca de estado e gravada na hora. Um lote interrompido e retomado a partir daqui, e
+    # arquivos ja concluidos (com a saida ainda em disco) nao sao refeitos.
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock: threading.Lock = threading.Lock()
+        # Os sinais dos jobs chegam de threads diferentes; o lock serializa o acesso a conexao.
+        self._conn: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns: set[str] = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, sql in MIGRATIONS.items():
+            if column not in columns:
+                self._conn.execute(sql)
+        self.recover()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def recover(self) -> int:
+        # Jobs em "running" sao de uma execucao que morreu no meio: a entrada pode ter ficado
+        # so no .bak, entao o backup volta ao lugar antes de o job retornar para a fila. Sem pasta
+        # de saida e com a mesma extensao, a saida ja pode ter sido gravada sobre a entrada; o
+        # .bak e o original e tambem vence nesse caso.
+        with self._lock, self._conn:
+            rows: list[tuple[int, str]] = self._conn.execute(
+                "SELECT id, input_path FROM jobs WHERE state = ?", (RUNNING,)
+            ).fetchall()
+            for _, input_path in rows:
+                restore_backup(input_path, backup_path_for(input_path))
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, updated_at = ? WHERE state = ?", (PENDING, time.time(), RUNNING)
+            )
+        if rows:
+            logger.warning(f"{len(rows)} job(s) interrompido(s) voltaram para a fila.")
+        return len(rows)
+
+    def enqueue(self, paths: Iterable[str], options: dict[str, Any], force: bool = False) -> list[QueuedJob]:
+        key: str = options_key(options)
+        blob: str = json.dumps(options, sort_keys=True)
+        now: float = time.time()
+        ordered: list[str] = list(dict.fromkeys(os.path.abspath(path) for path in paths))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (input_path, options_key, options, state, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(path, key, blob, PENDING, now) for path in ordered],
+            )
+            # Uma consulta por chave de opcoes em vez de um IN com dezenas de milhares de caminhos.
+            rows: dict[str, tuple[int, str, str | None, int | None, int | None]] = {
+                path: (job_id, state, output_path, size, mtime_ns)
+                for job_id, path, state, output_path, size, mtime_ns in self._conn.execute(
+                    "SELECT id, input_path, state, output_path, input_size, input_mtime_ns FROM jobs "
+                    "WHERE options_key = ?",
+                    (key,),
+                )
+            }
+            jobs: list[QueuedJob] = []
+            requeue: list[tuple[float, int]] = []
+            signatures: list[tuple[int | None, int | None, int]] = []
+            for path in ordered:
+                job_id, state, output_path, size, mtime_ns = rows[path]
+                signature: tuple[int, int] | None = input_signature(path)
+                # A saida so vale para a entrada que a gerou: editada depois, o job volta para a
+                # fila. Linhas antigas, sem assinatura, seguem valendo enquanto a saida existir.
+                unchanged: bool = size is None or signature is None or signature == (size, mtime_ns)
+                if state == DONE and not force and unchanged and output_path and os.path.exists(output_path):
+                    jobs.append(QueuedJob(job_id, path, options, DONE, output_path))
+                    continue
+                if state != PENDING:
+                    requeue.append((now, job_id))
+                signatures.append((*(signature or (None, None)), job_id))
+                jobs.append(QueuedJob(job_id, path, options, PENDING))
+            self._conn.executemany(
+                f"UPDATE jobs SET state = '{PENDING}', output_path = NULL, error = NULL, updated_at = ? WHERE id = ?",
+                requeue,
+            )
+            # A assinatura gravada e a da entrada que o job vai processar.
+            self._conn.executemany("UPDATE jobs SET input_size = ?, input_mtime_ns = ? WHERE id = ?", signatures)
+        return jobs
+
+    def unfinished(self) -> list[QueuedJob]:
+        with self._lock:
+            rows: list[tuple[int, str, str]] = self._conn.execute(
+                "SELECT id, input_path, options FROM jobs WHERE state IN (?, ?) ORDER BY id", (PENDING, RUNNING)
+            ).fetchall()
+        return [QueuedJob(job_id, path, json.loads(options), PENDING) for job_id, path, options in rows]
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows: list[tuple[str, int]] = self._conn.execute(
+                "SELECT state, COUNT(*) FROM jobs GROUP BY state"
+            ).fetchall()
+        return dict(rows)
+
+    def _update(self, job_id: int, sql: str, *params: Any) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {sql}, updated_at = ? WHERE id = ?", (*params, time.time(), job_id))
+
+    def mark_running(self, job_id: int) -> None:
+        self._update(job_id, "state = ?, attempts = attempts + 1", RUNNING)
+
+    def mark_done(self, job_id: int, output_path: str) -> None:
+        self._update(job_id, "state = ?, output_path = ?, error = NULL", DONE, output_path)
+        # Sem pasta de saida e com a mesma extensao, a saida substitui a entrada: a assinatura
+        # passa a ser a do arquivo gravado, senao o proximo enqueue o refaria.
+        with self._lock:
+            row: tuple[str] | None = self._conn.execute(
+                "SELECT input_path FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row and os.path.abspath(output_path) == row[0]:
+            signature: tuple[int, int] | None = input_signature(output_path)
+            if signature:
+                self._update(job_id, "input_size = ?, input_mtime_ns = ?", *signature)
+
+    def mark_failed(self, job_id: int, error: str) -> None:
+        self._update(job_id, "state = ?, error = ?", FAILED, error)
+
+    def discard_unfinished(self) -> int:
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM jobs WHERE state IN (?, ?)", (PENDING, RUNNING)).rowcount
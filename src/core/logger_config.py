@@ -1,6 +1,7 @@
 import logging
 import os
 import sys
+from typing import TextIO
 
 LOG_DIR: str = os.path.expanduser("~/.local/share/fogstripper")
 LOG_FILE: str = os.path.join(LOG_DIR, "app.log")
@@ -10,7 +11,7 @@ def get_log_path() -> str:
     return LOG_FILE
 
 
-def setup_logging() -> None:
+def setup_logging(stream: TextIO = sys.stdout) -> None:
     os.makedirs(LOG_DIR, exist_ok=True)
 
     if os.path.exists(LOG_FILE) and os.path.getsize(LOG_FILE) > 1 * 1024 * 1024:
@@ -22,7 +23,7 @@ def setup_logging() -> None:
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s - %(levelname)s - [%(module)s:%(lineno)d] - %(message)s",
-        handlers=[logging.FileHandler(LOG_FILE), logging.StreamHandler(sys.stdout)],
+        handlers=[logging.FileHandler(LOG_FILE), logging.StreamHandler(stream)],
         force=True,
     )
     logging.info("=" * 50)
@@ -0,0 +1,44 @@
+import json
+import logging
+import os
+import subprocess
+from typing import Any
+
+from src.core.admission import upscale_backend, upscale_models_dir
+from src.core.config_loader import PATHS
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+ONNX_UPSCALE_SCRIPT: str = "worker_upscale_onnx.py"
+EXPORT_TIMEOUT: float = 1800
+
+
+def upscale_script() -> str | None:
+    # O backend ONNX e um worker irmao do worker_upscale.py que nao importa torch; o config.json
+    # continua apontando so para o UPSCALE_SCRIPT.
+    script: str | None = PATHS.get("UPSCALE_SCRIPT")
+    if script and upscale_backend() == "onnx":
+        return os.path.join(os.path.dirname(script), ONNX_UPSCALE_SCRIPT)
+    return script
+
+
+def export_onnx_upscale(model: str, images: list[str] | None = None, tolerance: int | None = None) -> dict[str, Any]:
+    # A exportacao precisa do torch: roda no worker_upscale.py, que grava o .onnx na pasta de
+    # modelos e devolve o relatorio de paridade na ultima linha do stdout.
+    python: str | None = PATHS.get("PYTHON_UPSCALE")
+    script: str | None = PATHS.get("UPSCALE_SCRIPT")
+    if not (python and script):
+        raise RuntimeError("PYTHON_UPSCALE/UPSCALE_SCRIPT nao configurados.")
+    cmd: list[str] = [python, script, "--export-onnx", "--model", model, "--models-dir", upscale_models_dir()]
+    if images:
+        cmd += ["--parity-images", *images]
+    if tolerance is not None:
+        cmd += ["--tolerance", str(tolerance)]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=EXPORT_TIMEOUT)
+    except (subprocess.TimeoutExpired, OSError) as e:
+        raise RuntimeError(f"Exportacao ONNX de {model} falhou: {e}") from e
+    lines: list[str] = result.stdout.strip().splitlines()
+    if not lines:
+        raise RuntimeError(f"Exportacao ONNX de {model} falhou: {result.stderr.strip()[-2000:]}")
+    return json.loads(lines[-1])
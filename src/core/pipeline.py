@@ -0,0 +1,128 @@
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Any, Generic, TypeVar
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_DONE: object = object()
+
+
+@dataclass
+class Stage(Generic[T]):
+    name: str
+    fn: Callable[[T], None]
+    workers: int = 1
+    busy_seconds: float = 0.0
+    items: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+@dataclass
+class _Item(Generic[T]):
+    value: T
+    error: Exception | None = None
+
+
+class StagePipeline(Generic[T]):
+    # Cada estagio tem suas threads e uma fila limitada na entrada: enquanto o arquivo N esta
+    # no upscale, o N+1 ja passa pelo rembg e o N-1 e gravado. A fila limitada segura a leitura
+    # de novos arquivos quando o estagio mais lento fica para tras.
+    def __init__(self, stages: list[Stage[T]], queue_size: int = 2) -> None:
+        self.stages: list[Stage[T]] = stages
+        self.queue_size: int = max(1, queue_size)
+        self.elapsed: float = 0.0
+        self._cancelled: threading.Event = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def _work(
+        self,
+        stage: Stage[T],
+        inbox: "queue.Queue[Any]",
+        outbox: "queue.Queue[Any] | None",
+        on_stage_done: Callable[[T, str], None] | None,
+        on_item_done: Callable[[T, Exception | None], None],
+    ) -> None:
+        while True:
+            item: Any = inbox.get()
+            if item is _DONE:
+                inbox.put(_DONE)
+                return
+            # Um item com erro atravessa os estagios restantes sem executa-los.
+            if item.error is None and not self._cancelled.is_set():
+                start: float = time.perf_counter()
+                try:
+                    stage.fn(item.value)
+                except Exception as e:
+                    item.error = e
+                busy: float = time.perf_counter() - start
+                with stage._lock:
+                    stage.busy_seconds += busy
+                    stage.items += 1
+                if on_stage_done and item.error is None:
+                    on_stage_done(item.value, stage.name)
+            elif item.error is None:
+                item.error = RuntimeError("Processamento cancelado.")
+            if outbox is None:
+                on_item_done(item.value, item.error)
+            else:
+                outbox.put(item)
+
+    def run(
+        self,
+        items: Iterable[T],
+        on_item_done: Callable[[T, Exception | None], None],
+        on_stage_done: Callable[[T, str], None] | None = None,
+    ) -> None:
+        queues: list[queue.Queue[Any]] = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        groups: list[list[threading.Thread]] = []
+        for i, stage in enumerate(self.stages):
+            outbox: queue.Queue[Any] | None = queues[i + 1] if i + 1 < len(self.stages) else None
+            threads: list[threading.Thread] = [
+                threading.Thread(
+                    target=self._work,
+                    args=(stage, queues[i], outbox, on_stage_done, on_item_done),
+                    name=f"fogstripper-{stage.name}-{n}",
+                    daemon=True,
+                )
+                for n in range(max(1, stage.workers))
+            ]
+            groups.append(threads)
+
+        start: float = time.perf_counter()
+        for threads in groups:
+            for thread in threads:
+                thread.start()
+        try:
+            for value in items:
+                queues[0].put(_Item(value))
+        finally:
+            # O fim se propaga estagio a estagio: so depois que todas as threads de um estagio
+            # terminam o proximo recebe o marcador, entao nenhum item fica para tras. Roda mesmo
+            # se `items` levantar, para os itens ja enviados terminarem e as threads sairem.
+            for i, threads in enumerate(groups):
+                queues[i].put(_DONE)
+                for thread in threads:
+                    thread.join()
+            self.elapsed = time.perf_counter() - start
+
+    def utilization(self) -> dict[str, float]:
+        if self.elapsed <= 0:
+            return {stage.name: 0.0 for stage in self.stages}
+        return {stage.name: stage.busy_seconds / (self.elapsed * max(1, stage.workers)) for stage in self.stages}
+
+    def report(self) -> str:
+        usage: dict[str, float] = self.utilization()
+        parts: list[str] = [
+            f"{stage.name}={usage[stage.name]:.0%} ({stage.items} item(ns), {stage.workers} thread(s))"
+            for stage in self.stages
+        ]
+        bottleneck: str = max(usage, key=lambda name: usage[name]) if usage else "-"
+        return f"Utilizacao por estagio em {self.elapsed:.1f}s: {', '.join(parts)}; gargalo: {bottleneck}."
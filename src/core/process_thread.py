@@ -0,0 +1,35 @@
+from typing import Any
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from src.core.processor import ImageProcessor
+
+
+class ProcessThread(QThread, ImageProcessor):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(str)
+    error = pyqtSignal(str)
+
+    def __init__(
+        self,
+        input_path: str,
+        model_name: str,
+        output_format: str,
+        potencia: int,
+        tile_size: int,
+        post_processing_opts: dict[str, Any],
+        output_dir: str | None = None,
+    ) -> None:
+        # Heranca cooperativa do PyQt: o QThread repassa os argumentos nomeados ao ImageProcessor.
+        super().__init__(
+            input_path=input_path,
+            model_name=model_name,
+            output_format=output_format,
+            potencia=potencia,
+            tile_size=tile_size,
+            post_processing_opts=post_processing_opts,
+            output_dir=output_dir,
+        )
+
+    def run(self) -> None:
+        ImageProcessor.run(self)
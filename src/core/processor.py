@@ -4,25 +4,147 @@ import re
 import shutil
 import subprocess
 import tempfile
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
 from typing import Any
 
-import imageio.v2 as imageio
 import numpy as np
+from numpy.typing import NDArray
 from PIL import Image
-from PyQt6.QtCore import QThread, pyqtSignal
 
-from src.core.config_loader import PATHS
+from src.core.admission import upscale_model_for, upscale_models_dir, upscale_processes, upscale_tile_size
+from src.core.animation import (
+    FlowKeyframeGate,
+    FrameGroup,
+    FrameSimilarityGate,
+    FrameSink,
+    FrameSource,
+    composite_on_transparent,
+    default_rembg_workers,
+    group_frames_by_flow,
+    group_similar_frames,
+    iter_processed_frames,
+    open_frame_sink,
+    propagate_alpha,
+    resolve_batch_size,
+    with_alpha,
+)
+from src.core.config_loader import PATHS, get_setting
 from src.core.constants import VIDEO_EXTENSIONS
+from src.core.executors import StageExecutor, get_stage_executor
+from src.core.onnx_export import upscale_script
+from src.core.segments import SegmentRunner, concat_segments, split_segments
+from src.core.stage_cache import StageCache, file_digest, get_mask_cache, get_stage_cache, stage_key
+from src.core.worker_client import WorkerError, get_worker_pool
 from src.utils import svg_utils
-from src.utils.image_processing import fill_internal_holes, remove_external_noise, trim_to_content
+from src.utils.image_processing import (
+    INTERMEDIATE_PNG_COMPRESSION,
+    fill_internal_holes_array,
+    load_rgba,
+    remove_external_noise_array,
+    save_rgba,
+    trim_to_content_array,
+)
 
 logger: logging.Logger = logging.getLogger(__name__)
 
 
-class ProcessThread(QThread):
-    progress = pyqtSignal(int)
-    finished = pyqtSignal(str)
-    error = pyqtSignal(str)
+def final_output_path_for(input_path: str, output_format: str, output_dir: str | None = None) -> str:
+    base, _ = os.path.splitext(input_path)
+    clean_base: str = re.sub(r"\.bak$", "", base)
+    if output_dir:
+        clean_base = os.path.join(output_dir, os.path.basename(clean_base))
+    return f"{clean_base}{output_format}"
+
+
+def worker_script(script_key: str) -> str | None:
+    # O upscale pode trocar de worker conforme o UPSCALE_BACKEND; os demais vem direto do config.json.
+    return upscale_script() if script_key == "UPSCALE_SCRIPT" else PATHS.get(script_key)
+
+
+def warm_up_workers(model_name: str, rembg_workers: int, upscale: bool = False) -> None:
+    # Sobe os workers persistentes e carrega o modelo do rembg antes da primeira entrada.
+    if not get_setting("PERSISTENT_WORKERS", True):
+        return
+    pools: list[tuple[str, str, int, dict[str, Any]]] = [
+        ("PYTHON_REMBG", "REMBG_SCRIPT", rembg_workers, {"op": "warm", "model": model_name})
+    ]
+    if upscale:
+        pools.append(("PYTHON_UPSCALE", "UPSCALE_SCRIPT", 1, {"op": "ping"}))
+    for python_key, script_key, size, request in pools:
+        python: str | None = PATHS.get(python_key)
+        script: str | None = worker_script(script_key)
+        if not (python and script):
+            continue
+        try:
+            get_worker_pool(python, script, size).warm(**request)
+        except WorkerError as e:
+            logger.warning(f"Falha ao aquecer worker {os.path.basename(script)}: {e}")
+
+
+def backup_path_for(input_path: str) -> str:
+    base, ext = os.path.splitext(input_path)
+    return f"{base}.bak{ext}"
+
+
+def backup_input(input_path: str) -> tuple[str, str | None]:
+    base, _ = os.path.splitext(input_path)
+    if re.search(r"\.bak$", base):
+        return input_path, None
+    backup_path: str = backup_path_for(input_path)
+    shutil.move(input_path, backup_path)
+    logger.info(f"Backup criado: {backup_path}")
+    return backup_path, backup_path
+
+
+def restore_backup(input_path: str, backup_path: str | None) -> None:
+    if backup_path and os.path.exists(backup_path):
+        shutil.move(backup_path, input_path)
+        logger.warning(f"Backup restaurado: {input_path}")
+
+
+@dataclass
+class StaticJob:
+    input_path: str
+    final_output_path: str
+    work_dir: str
+    image: NDArray[np.uint8] | None = None
+    output_path: str = ""
+    source_path: str = ""
+    backup_path: str | None = None
+    input_digest: str = ""
+    cache_keys: dict[str, str] | None = None
+    cached_stages: list[str] = field(default_factory=list)
+
+
+class _BoundSignal:
+    def __init__(self) -> None:
+        self.slots: list[Callable[..., Any]] = []
+
+    def connect(self, slot: Callable[..., Any]) -> None:
+        self.slots.append(slot)
+
+    def emit(self, *args: Any) -> None:
+        for slot in list(self.slots):
+            slot(*args)
+
+
+class Signal:
+    # Mesmo connect/emit do pyqtSignal, sem Qt: o ImageProcessor roda na CLI e nos processos
+    # de segmento sem importar o PyQt6. O ProcessThread sobrescreve com pyqtSignal de verdade.
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.attr: str = f"_{name}_signal"
+
+    def __get__(self, obj: Any, owner: type | None = None) -> Any:
+        if obj is None:
+            return self
+        return obj.__dict__.setdefault(self.attr, _BoundSignal())
+
+
+class ImageProcessor:
+    progress = Signal()
+    finished = Signal()
+    error = Signal()
 
     def __init__(
         self,
@@ -32,16 +154,19 @@ class ProcessThread(QThread):
         potencia: int,
         tile_size: int,
         post_processing_opts: dict[str, Any],
+        output_dir: str | None = None,
     ) -> None:
-        super().__init__()
         self.input_path: str = input_path
         self.model_name: str = model_name
         self.output_format: str = output_format if output_format.startswith(".") else f".{output_format}"
         self.potencia: int = potencia
         self.tile_size: int = tile_size
         self.post_processing_opts: dict[str, Any] = post_processing_opts
+        self.output_dir: str | None = output_dir
         self.temp_dir: str = tempfile.mkdtemp(prefix="fogstripper_")
         self.is_animated: bool = self.input_path.lower().endswith(VIDEO_EXTENSIONS)
+        self.rembg_workers: int = max(1, int(get_setting("REMBG_WORKERS", default_rembg_workers())))
+        self.stats: dict[str, Any] = {}
 
     def run_command(self, command: list[str | None]) -> bool:
         cmd: list[str] = [c for c in command if c is not None]
@@ -68,47 +193,72 @@ class ProcessThread(QThread):
         shutil.rmtree(self.temp_dir, ignore_errors=True)
         logger.info(f"Diretorio temporario {self.temp_dir} limpo.")
 
-    def run(self) -> None:
-        final_path: str = ""
-        original_backup_path: str | None = None
+    def final_output_path(self) -> str:
+        return final_output_path_for(self.input_path, self.output_format, self.output_dir)
 
-        base, _ = os.path.splitext(self.input_path)
-        clean_base: str = re.sub(r"\.bak$", "", base)
-        final_output_path: str = f"{clean_base}{self.output_format}"
+    def process(self) -> str:
+        original_backup_path: str | None = None
+        final_output_path: str = self.final_output_path()
 
         try:
             if not PATHS:
                 raise RuntimeError("Arquivo de configuracao (config.json) nao foi carregado.")
 
-            input_is_original: bool = not re.search(r"\.bak$", base)
-            if input_is_original:
-                original_backup_path = f"{clean_base}.bak{os.path.splitext(self.input_path)[1]}"
-                shutil.move(self.input_path, original_backup_path)
-                logger.info(f"Backup criado: {original_backup_path}")
-                processing_file: str = original_backup_path
+            # Com diretorio de saida a entrada nunca e tocada, a menos que a saida caia sobre ela.
+            if self.output_dir and os.path.abspath(final_output_path) != os.path.abspath(self.input_path):
+                os.makedirs(self.output_dir, exist_ok=True)
+                processing_file: str = self.input_path
             else:
-                processing_file = self.input_path
+                processing_file, original_backup_path = backup_input(self.input_path)
 
             if self.is_animated:
-                final_path = self._process_animation(processing_file, final_output_path)
+                final_path: str = self._process_animation(processing_file, final_output_path)
             else:
                 final_path = self._process_static_image(processing_file, final_output_path)
 
-            if final_path and (os.path.exists(final_path) or os.path.isdir(final_path)):
-                self.finished.emit(final_path)
-            else:
+            if not (final_path and (os.path.exists(final_path) or os.path.isdir(final_path))):
                 raise RuntimeError("Artefato final nao gerado.")
+            return final_path
 
+        except Exception:
+            restore_backup(self.input_path, original_backup_path)
+            raise
+        finally:
+            self.cleanup()
+
+    def run(self) -> None:
+        try:
+            final_path: str = self.process()
         except Exception as e:
             logger.error(f"Erro no orquestrador: {e}", exc_info=True)
-            if original_backup_path and os.path.exists(original_backup_path):
-                shutil.move(original_backup_path, self.input_path)
-                logger.warning(f"Backup restaurado: {self.input_path}")
             self.error.emit(str(e))
-        finally:
-            self.cleanup()
+            return
+        self.finished.emit(final_path)
+
+    def _run_persistent(self, python_key: str, script_key: str, op: str, pool_size: int = 1, **params: Any) -> bool:
+        python: str | None = PATHS.get(python_key)
+        script: str | None = worker_script(script_key)
+        if not (get_setting("PERSISTENT_WORKERS", True) and python and script):
+            return False
+        try:
+            get_worker_pool(python, script, pool_size).request(op, **params)
+            return True
+        except WorkerError as e:
+            logger.warning(f"Worker persistente falhou ({e}); usando execucao avulsa.")
+            return False
 
     def _run_rembg(self, input_path: str, output_path: str) -> bool:
+        if self._run_persistent(
+            "PYTHON_REMBG",
+            "REMBG_SCRIPT",
+            "remove",
+            pool_size=self.rembg_workers,
+            input=input_path,
+            output=output_path,
+            model=self.model_name,
+            potencia=self.potencia,
+        ):
+            return True
         cmd: list[str | None] = [
             PATHS.get("PYTHON_REMBG"),
             PATHS.get("REMBG_SCRIPT"),
@@ -123,153 +273,363 @@ class ProcessThread(QThread):
         ]
         return self.run_command(cmd)
 
-    def _run_upscale(self, input_path: str, output_path: str, factor: int) -> bool:
+    def _run_upscale(self, input_path: str, output_path: str, factor: int, tile: int | None = None) -> bool:
+        tile = self.tile_size if tile is None else tile
+        model: str = upscale_model_for(self.post_processing_opts, factor).name
+        models_dir: str = upscale_models_dir()
+        processes: int = upscale_processes()
+        if self._run_persistent(
+            "PYTHON_UPSCALE",
+            "UPSCALE_SCRIPT",
+            "upscale",
+            input=input_path,
+            output=output_path,
+            tile=tile,
+            outscale=factor,
+            model=model,
+            models_dir=models_dir,
+            processes=processes,
+        ):
+            return True
         cmd: list[str | None] = [
             PATHS.get("PYTHON_UPSCALE"),
-            PATHS.get("UPSCALE_SCRIPT"),
+            upscale_script(),
             "--input",
             input_path,
             "--output",
             output_path,
             "--tile",
-            str(self.tile_size),
+            str(tile),
             "--outscale",
             str(factor),
+            "--model",
+            model,
+            "--models-dir",
+            models_dir,
+            "--processes",
+            str(processes),
         ]
         return self.run_command(cmd)
 
-    def _run_effects(self, input_path: str, output_path: str) -> bool:
+    def _effects_params(self) -> dict[str, Any]:
         opacity_0_255: int = int((self.post_processing_opts.get("shadow_opacity", 70) / 100) * 255)
-        cmd: list[str | None] = [
-            PATHS.get("PYTHON_REMBG"),
-            PATHS.get("EFFECTS_SCRIPT"),
-            "--input",
-            input_path,
-            "--output",
-            output_path,
-            "--blur-radius",
-            str(self.post_processing_opts.get("shadow_blur", 15)),
-            "--opacity",
-            str(opacity_0_255),
+        return {
+            "blur_radius": self.post_processing_opts.get("shadow_blur", 15),
+            "opacity": opacity_0_255,
+        }
+
+    def _background_params(self) -> dict[str, Any]:
+        return {
+            "bg_type": self.post_processing_opts.get("background_type"),
+            "bg_data": self.post_processing_opts.get("background_data"),
+            "resize_mode": self.post_processing_opts.get("background_resize_mode"),
+        }
+
+    def create_static_job(self, input_path: str, final_output_path: str, work_dir: str | None = None) -> StaticJob:
+        return StaticJob(input_path, final_output_path, work_dir or self.temp_dir)
+
+    def static_stages(self) -> list[tuple[str, Callable[[StaticJob], None]]]:
+        # Estagios do pipeline estatico na ordem; os opcionais so entram quando habilitados, para
+        # que o modo em lote (src/core/pipeline.py) nao reserve threads para estagios vazios.
+        stages: list[tuple[str, Callable[[StaticJob], None]]] = [
+            ("rembg", self._stage_rembg),
+            ("cleanup", self._stage_cleanup),
         ]
-        return self.run_command(cmd)
-
-    def _run_background(self, input_path: str, output_path: str) -> bool:
-        cmd: list[str | None] = [
-            PATHS.get("PYTHON_REMBG"),
-            PATHS.get("BACKGROUND_SCRIPT"),
-            "--input",
-            input_path,
-            "--output",
-            output_path,
-            "--bg-type",
-            self.post_processing_opts.get("background_type"),
-            "--bg-data",
-            self.post_processing_opts.get("background_data"),
-            "--resize-mode",
-            self.post_processing_opts.get("background_resize_mode"),
-        ]
-        return self.run_command(cmd)
-
-    def _process_static_image(self, current_path: str, final_output_path: str) -> str:
-        step_path: str = current_path
-
-        self.progress.emit(10)
-        rembg_output: str = os.path.join(self.temp_dir, "1_rembg.png")
-        if not self._run_rembg(step_path, rembg_output):
+        if self.post_processing_opts.get("upscale_factor", 0) > 0:
+            stages.append(("upscale", self._stage_upscale))
+        if self.post_processing_opts.get("enabled"):
+            if self.post_processing_opts.get("shadow_enabled"):
+                stages.append(("effects", self._stage_effects))
+            if self.post_processing_opts.get("background_type") and self.post_processing_opts.get("background_data"):
+                stages.append(("background", self._stage_background))
+        stages.append(("save", self._stage_save))
+        cache: StageCache | None = get_stage_cache()
+        if cache is None:
+            return stages
+        names: list[str] = [name for name, _ in stages if name != "save"]
+        return [(name, self._cached_stage(cache, names, name, fn) if name != "save" else fn) for name, fn in stages]
+
+    def _stage_params(self, name: str) -> dict[str, Any]:
+        opts: dict[str, Any] = self.post_processing_opts
+        if name == "rembg":
+            return {"model": self.model_name, "potencia": self.potencia}
+        if name == "cleanup":
+            return {"fill_holes": bool(opts.get("fill_holes")), "crop_option": opts.get("crop_option")}
+        if name == "upscale":
+            return {
+                "tile": self.tile_size,
+                "factor": opts.get("upscale_factor"),
+                "model": upscale_model_for(opts).name,
+            }
+        if name == "effects":
+            return self._effects_params()
+        params: dict[str, Any] = self._background_params()
+        if params["bg_type"] == "image" and params["bg_data"] and os.path.isfile(params["bg_data"]):
+            params["bg_digest"] = file_digest(params["bg_data"])
+        return params
+
+    def _resume_from_cache(self, cache: StageCache, names: list[str], job: StaticJob) -> None:
+        parent: str = self._input_digest(job)
+        job.cache_keys = {}
+        for name in names:
+            parent = job.cache_keys[name] = stage_key(parent, name, self._stage_params(name))
+        # Retoma do estagio mais profundo em cache; os anteriores a ele nem precisam rodar.
+        for depth in range(len(names) - 1, -1, -1):
+            image: NDArray[np.uint8] | None = cache.get(job.cache_keys[names[depth]])
+            if image is not None:
+                job.image = image
+                job.cached_stages = names[: depth + 1]
+                logger.info(f"Cache de estagios: {os.path.basename(job.input_path)} retomado apos '{names[depth]}'.")
+                return
+
+    def _cached_stage(
+        self, cache: StageCache, names: list[str], name: str, fn: Callable[[StaticJob], None]
+    ) -> Callable[[StaticJob], None]:
+        def run(job: StaticJob) -> None:
+            if job.cache_keys is None:
+                self._resume_from_cache(cache, names, job)
+            if name in job.cached_stages:
+                cache.record(name, hit=True)
+                return
+            cache.record(name, hit=False)
+            fn(job)
+            cache.put(job.cache_keys[name], job.image)
+
+        return run
+
+    def _input_digest(self, job: StaticJob) -> str:
+        if not job.input_digest:
+            job.input_digest = file_digest(job.input_path)
+        return job.input_digest
+
+    def _stage_rembg(self, job: StaticJob) -> None:
+        masks: StageCache | None = get_mask_cache()
+        mask_key: str = ""
+        if masks is not None:
+            mask_key = stage_key(self._input_digest(job), "mask", {"model": self.model_name, "potencia": self.potencia})
+            mask: NDArray[np.uint8] | None = masks.get(mask_key)
+            if mask is not None:
+                original: NDArray[np.uint8] = load_rgba(job.input_path, oriented=True)
+                if original.shape[:2] == mask.shape:
+                    masks.record("mask", hit=True)
+                    job.image = with_alpha(original, mask)
+                    return
+            masks.record("mask", hit=False)
+
+        rembg_output: str = os.path.join(job.work_dir, "1_rembg.png")
+        if not self._run_rembg(job.input_path, rembg_output):
             raise RuntimeError("Falha na remocao de fundo.")
-        step_path = rembg_output
-        self.progress.emit(30)
+        job.image = load_rgba(rembg_output)
+        if masks is not None:
+            masks.put(mask_key, np.ascontiguousarray(job.image[:, :, 3]))
 
+    def _stage_cleanup(self, job: StaticJob) -> None:
         if self.post_processing_opts.get("fill_holes"):
-            fill_internal_holes(step_path, current_path)
+            job.image = fill_internal_holes_array(job.image, load_rgba(job.input_path))
         else:
-            remove_external_noise(step_path)
+            job.image = remove_external_noise_array(job.image)
 
         if self.post_processing_opts.get("crop_option") == "trim":
-            trim_to_content(step_path)
+            trimmed: NDArray[np.uint8] | None = trim_to_content_array(job.image)
+            if trimmed is not None:
+                job.image = trimmed
+
+    def _stage_upscale(self, job: StaticJob) -> None:
+        upscale_input: str = os.path.join(job.work_dir, "2_cleaned.png")
+        upscale_output: str = os.path.join(job.work_dir, "2_upscaled.png")
+        save_rgba(job.image, upscale_input, intermediate=True)
+        factor: int = self.post_processing_opts["upscale_factor"]
+        height, width = job.image.shape[:2]
+        tile: int = upscale_tile_size(
+            self.tile_size, width, height, factor, upscale_model_for(self.post_processing_opts, factor)
+        )
+        if tile != self.tile_size:
+            logger.info(f"Bloco automatico para {width}x{height} ({factor}x): {tile}.")
+        if not self._run_upscale(upscale_input, upscale_output, factor, tile):
+            raise RuntimeError("Falha no upscale.")
+        job.image = load_rgba(upscale_output)
+
+    def _stage_effects(self, job: StaticJob) -> None:
+        executor: StageExecutor = get_stage_executor(self.run_command, job.work_dir)
+        try:
+            image: Image.Image = executor.run("effects", Image.fromarray(job.image, "RGBA"), self._effects_params())
+        except Exception as e:
+            raise RuntimeError(f"Falha ao aplicar sombra: {e}") from e
+        job.image = np.asarray(image.convert("RGBA"))
 
-        upscale_factor: int = self.post_processing_opts.get("upscale_factor", 0)
-        if upscale_factor > 0:
-            upscale_output: str = os.path.join(self.temp_dir, "2_upscaled.png")
-            if not self._run_upscale(step_path, upscale_output, upscale_factor):
-                raise RuntimeError("Falha no upscale.")
-            step_path = upscale_output
-        self.progress.emit(50)
+    def _stage_background(self, job: StaticJob) -> None:
+        executor: StageExecutor = get_stage_executor(self.run_command, job.work_dir)
+        try:
+            image: Image.Image = executor.run(
+                "background", Image.fromarray(job.image, "RGBA"), self._background_params()
+            )
+        except Exception as e:
+            raise RuntimeError(f"Falha ao aplicar fundo: {e}") from e
+        job.image = np.asarray(image.convert("RGBA"))
 
-        if self.post_processing_opts.get("enabled"):
-            if self.post_processing_opts.get("shadow_enabled"):
-                shadow_output: str = os.path.join(self.temp_dir, "3_shadow.png")
-                if not self._run_effects(step_path, shadow_output):
-                    raise RuntimeError("Falha ao aplicar sombra.")
-                step_path = shadow_output
-            self.progress.emit(70)
-
-            bg_type = self.post_processing_opts.get("background_type")
-            bg_data = self.post_processing_opts.get("background_data")
-            if bg_type and bg_data:
-                bg_output: str = os.path.join(self.temp_dir, f"4_background{self.output_format}")
-                if not self._run_background(step_path, bg_output):
-                    raise RuntimeError("Falha ao aplicar fundo.")
-                step_path = bg_output
-            self.progress.emit(90)
+    def _stage_save(self, job: StaticJob) -> None:
+        job.output_path = self._save_output(job.image, job.final_output_path, job.work_dir)
 
+    def _process_static_image(self, current_path: str, final_output_path: str) -> str:
+        self.progress.emit(10)
+        job: StaticJob = self.create_static_job(current_path, final_output_path)
+        stages: list[tuple[str, Callable[[StaticJob], None]]] = self.static_stages()
+        for i, (_, stage) in enumerate(stages, start=1):
+            stage(job)
+            self.progress.emit(10 + int(i / len(stages) * 90))
+        if job.cached_stages:
+            self.stats["cached_stages"] = job.cached_stages
+        return job.output_path
+
+    def _save_output(self, image: NDArray[np.uint8], final_output_path: str, work_dir: str) -> str:
         if self.output_format == ".svg":
-            if svg_utils.raster_to_svg(step_path, final_output_path):
-                self.progress.emit(100)
+            svg_source: str = os.path.join(work_dir, "5_vector_source.png")
+            save_rgba(image, svg_source, intermediate=True)
+            if svg_utils.raster_to_svg(svg_source, final_output_path):
                 return final_output_path
-            else:
-                logger.warning("SVG falhou, salvando como PNG.")
-                final_output_path = os.path.splitext(final_output_path)[0] + ".png"
+            logger.warning("SVG falhou, salvando como PNG.")
+            final_output_path = os.path.splitext(final_output_path)[0] + ".png"
 
-        shutil.move(step_path, final_output_path)
-        self.progress.emit(100)
+        save_rgba(image, final_output_path)
         return final_output_path
 
-    def _process_animation(self, current_path: str, final_output_path: str) -> str:
-        logger.info("Processando animacao...")
-
-        reader = imageio.get_reader(current_path)
+    def _run_rembg_batch(self, input_paths: list[str], output_paths: list[str]) -> bool:
+        if len(input_paths) > 1 and self._run_persistent(
+            "PYTHON_REMBG",
+            "REMBG_SCRIPT",
+            "remove_batch",
+            pool_size=self.rembg_workers,
+            inputs=input_paths,
+            outputs=output_paths,
+            model=self.model_name,
+            potencia=self.potencia,
+        ):
+            return True
+        return all(self._run_rembg(src, dst) for src, dst in zip(input_paths, output_paths, strict=True))
+
+    def _remove_frames_background(self, start: int, frames: list[NDArray[np.uint8]]) -> list[NDArray[np.uint8]]:
+        indices: range = range(start, start + len(frames))
+        frame_paths: list[str] = [os.path.join(self.temp_dir, f"frame_{i:06d}.png") for i in indices]
+        out_paths: list[str] = [os.path.join(self.temp_dir, f"proc_{i:06d}.png") for i in indices]
+        for frame, frame_path in zip(frames, frame_paths, strict=True):
+            Image.fromarray(frame).convert("RGBA").save(frame_path, compress_level=INTERMEDIATE_PNG_COMPRESSION)
         try:
-            meta: dict[str, Any] = reader.get_meta_data()
-            fps: float = meta.get("fps") or (1000 / meta.get("duration", 100))
-            frames: list[np.ndarray] = list(reader)
+            if not self._run_rembg_batch(frame_paths, out_paths):
+                raise RuntimeError(f"Falha nos quadros {indices.start}-{indices.stop - 1}.")
+            results: list[NDArray[np.uint8]] = []
+            for out_path in out_paths:
+                with Image.open(out_path) as img:
+                    results.append(composite_on_transparent(img))
+            return results
         finally:
-            reader.close()
-
-        num_frames: int = len(frames)
-        processed_frames: list[Image.Image] = []
-
-        for i, frame in enumerate(frames):
-            frame_path: str = os.path.join(self.temp_dir, f"frame_{i:04d}.png")
-            Image.fromarray(frame).convert("RGBA").save(frame_path)
-
-            out_path: str = os.path.join(self.temp_dir, f"proc_{i:04d}.png")
-            if not self._run_rembg(frame_path, out_path):
-                raise RuntimeError(f"Falha no quadro {i}.")
-
-            with Image.open(out_path) as img:
-                canvas = Image.new("RGBA", img.size, (0, 0, 0, 0))
-                canvas.paste(img.convert("RGBA"), (0, 0), img.convert("RGBA"))
-                processed_frames.append(canvas)
-
-            self.progress.emit(int((i + 1) / num_frames * 90))
-
-        if self.output_format in [".png", ".svg"]:
-            output_dir: str = os.path.splitext(final_output_path)[0]
-            os.makedirs(output_dir, exist_ok=True)
-            for i, pf in enumerate(processed_frames):
-                pf.save(os.path.join(output_dir, f"frame_{i:04d}{self.output_format}"))
-            self.progress.emit(100)
-            return output_dir
-
-        np_frames = [np.array(pf) for pf in processed_frames]
-        if final_output_path.lower().endswith(".webm"):
-            imageio.mimsave(
-                final_output_path, np_frames, fps=fps, codec="libvpx-vp9", pixelformat="yuva420p", quality=8
+            for path in frame_paths + out_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _remove_groups_background(self, _: int, groups: list[FrameGroup]) -> list[NDArray[np.uint8]]:
+        # Apenas os quadros-chave passam pelo rembg; os demais herdam a mascara do seu grupo,
+        # copiada (quadros quase identicos) ou deslocada quadro a quadro pelo fluxo optico.
+        cutouts: list[NDArray[np.uint8]] = self._remove_frames_background(
+            groups[0].index, [group.keyframe for group in groups]
+        )
+        results: list[NDArray[np.uint8]] = []
+        for group, cutout in zip(groups, cutouts, strict=True):
+            results.append(cutout)
+            alpha: NDArray[np.uint8] = cutout[:, :, 3]
+            for i, frame in enumerate(group.frames[1:]):
+                if group.flows:
+                    alpha = propagate_alpha(alpha, group.flows[i])
+                results.append(composite_on_transparent(Image.fromarray(with_alpha(frame, alpha), "RGBA")))
+        return results
+
+    def _group_frames(
+        self, source: Iterable[NDArray[np.uint8]]
+    ) -> tuple[Iterator[FrameGroup], FlowKeyframeGate | FrameSimilarityGate | None]:
+        interval: int = int(get_setting("KEYFRAME_INTERVAL", 0))
+        if interval > 1:
+            flow_gate = FlowKeyframeGate(interval, float(get_setting("FLOW_REKEY_ERROR", 8)))
+            return group_frames_by_flow(source, flow_gate), flow_gate
+        # Opcional: reaproveitar mascaras muda a saida, entao fica desligado ate ser configurado.
+        tolerance: float = float(get_setting("FRAME_SIMILARITY_TOLERANCE", 0))
+        gate: FrameSimilarityGate | None = FrameSimilarityGate(tolerance) if tolerance > 0 else None
+        return group_similar_frames(source, gate), gate
+
+    def stream_frames(
+        self, frames: Iterable[NDArray[np.uint8]], sink: FrameSink, on_progress: Callable[[int], None]
+    ) -> str:
+        batch_size: int = resolve_batch_size(
+            get_setting("REMBG_BATCH_SIZE", "auto"), self.model_name, self.rembg_workers
+        )
+        groups, gate = self._group_frames(frames)
+        try:
+            for frame in iter_processed_frames(
+                groups,
+                self._remove_groups_background,
+                self.rembg_workers,
+                on_progress,
+                batch_size=batch_size,
+            ):
+                sink.append(frame)
+            output_path: str = sink.close()
+        except Exception:
+            sink.abort()
+            raise
+
+        if isinstance(gate, FlowKeyframeGate):
+            self.stats.update(frames_inferred=gate.inferred, frames_propagated=gate.propagated, rekeyed=gate.rekeyed)
+            logger.info(
+                f"Quadros inferidos: {gate.inferred} ({gate.rekeyed} por erro de propagacao); "
+                f"propagados por fluxo optico: {gate.propagated}."
             )
-        else:
-            imageio.mimsave(final_output_path, np_frames, fps=fps, loop=0, disposal=2)
+        elif gate is not None:
+            self.stats.update(frames_inferred=gate.inferred, frames_skipped=gate.skipped)
+            logger.info(f"Quadros inferidos: {gate.inferred}; reaproveitados por similaridade: {gate.skipped}.")
+        return output_path
+
+    def _process_animation(self, current_path: str, final_output_path: str) -> str:
+        logger.info("Processando animacao...")
+
+        with FrameSource(current_path) as source:
+            num_frames: int | None = source.estimated_frame_count
+
+            def on_frame_done(completed: int) -> None:
+                if num_frames:
+                    self.progress.emit(min(90, int(completed / num_frames * 90)))
+
+            segments: int = int(get_setting("VIDEO_SEGMENTS", 1))
+            ranges: list[tuple[int, int | None]] = split_segments(num_frames, segments) if num_frames else []
+            if len(ranges) > 1:
+                output_path: str = self._process_segments(
+                    current_path, final_output_path, source.fps, ranges, on_frame_done
+                )
+            else:
+                sink: FrameSink = open_frame_sink(self.output_format, final_output_path, source.fps, self.temp_dir)
+                output_path = self.stream_frames(source, sink, on_frame_done)
 
         self.progress.emit(100)
-        return final_output_path
+        return output_path
+
+    def _process_segments(
+        self,
+        current_path: str,
+        final_output_path: str,
+        fps: float,
+        ranges: list[tuple[int, int | None]],
+        on_progress: Callable[[int], None],
+    ) -> str:
+        logger.info(f"Dividindo a animacao em {len(ranges)} segmentos processados em paralelo.")
+        runner = SegmentRunner(
+            current_path,
+            self.output_format,
+            final_output_path,
+            self.temp_dir,
+            {
+                "model": self.model_name,
+                "potencia": self.potencia,
+                "rembg_workers": max(1, self.rembg_workers // len(ranges)),
+            },
+        )
+        parts: list[str] = runner.run(ranges, on_progress)
+        self.stats.update(runner.stats)
+        logger.info(f"Segmentos concluidos: {runner.total_frames} quadros; estatisticas somadas: {runner.stats}.")
+        return concat_segments(parts, self.output_format, final_output_path, fps, self.temp_dir)
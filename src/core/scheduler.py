@@ -0,0 +1,308 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import deque
+from collections.abc import Callable, Iterator
+from functools import partial
+
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+
+from src.core.admission import MemoryTicket, admit, estimate_job_memory, try_admit
+from src.core.animation import default_rembg_workers
+from src.core.config_loader import get_setting
+from src.core.dedup import dedup_enabled, find_duplicates, materialize_duplicate
+from src.core.pipeline import Stage, StagePipeline
+from src.core.processor import ImageProcessor, StaticJob, backup_input, final_output_path_for, restore_backup
+from src.core.stage_cache import StageCache, get_stage_cache
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+def default_batch_concurrency() -> int:
+    # Cada job ocupa um worker residente do rembg; mais jobs que workers so criam fila no pool.
+    return max(1, int(get_setting("BATCH_CONCURRENCY", get_setting("REMBG_WORKERS", default_rembg_workers()))))
+
+
+class BatchScheduler(QObject):
+    progress = pyqtSignal(int)
+    job_started = pyqtSignal(str)
+    job_finished = pyqtSignal(str, str)
+    job_failed = pyqtSignal(str, str)
+    all_done = pyqtSignal()
+
+    def __init__(self, paths: list[str], job_factory: Callable[[str], QThread], concurrency: int = 1) -> None:
+        super().__init__()
+        self.paths: list[str] = list(paths)
+        self.job_factory: Callable[[str], QThread] = job_factory
+        self.concurrency: int = max(1, concurrency)
+        self.pending: deque[int] = deque(range(len(self.paths)))
+        self.running: dict[int, QThread] = {}
+        self.job_progress: dict[int, int] = {}
+        self.outputs: dict[str, str] = {}
+        self.failures: dict[str, str] = {}
+        self.duplicates: dict[str, list[str]] = {}
+        self._index: dict[str, int] = {path: i for i, path in enumerate(self.paths)}
+        self._staged: dict[int, QThread] = {}
+        self._estimates: dict[int, int] = {}
+        self._tickets: dict[int, MemoryTicket] = {}
+
+    @property
+    def total(self) -> int:
+        return len(self.paths)
+
+    @property
+    def done(self) -> int:
+        return len(self.outputs) + len(self.failures)
+
+    @property
+    def collapsed(self) -> int:
+        return sum(len(copies) for copies in self.duplicates.values())
+
+    def start(self) -> None:
+        if dedup_enabled():
+            self.duplicates = find_duplicates(self.paths)
+            copies: set[str] = {copy for group in self.duplicates.values() for copy in group}
+            self.pending = deque(i for i in self.pending if self.paths[i] not in copies)
+            if copies:
+                logger.info(f"{len(copies)} arquivo(s) duplicado(s) serao copiados do original, sem reprocessar.")
+        logger.info(f"Processando {len(self.pending)} arquivo(s) com ate {self.concurrency} job(s) simultaneo(s).")
+        self._fill()
+        if not self.running:
+            self.all_done.emit()
+
+    def cancel(self) -> None:
+        self.pending.clear()
+        for thread in self._staged.values():
+            if isinstance(thread, ImageProcessor):
+                thread.cleanup()
+            thread.deleteLater()
+        self._staged.clear()
+
+    def _admit(self, index: int, thread: QThread) -> bool:
+        # Alem do limite de jobs, cada ProcessThread precisa caber no orcamento de memoria; o que
+        # nao cabe fica na frente da fila ate a proxima liberacao (_release chama _fill de novo).
+        if not isinstance(thread, ImageProcessor):
+            return True
+        if index not in self._estimates:
+            self._estimates[index] = estimate_job_memory(thread)
+        ticket: MemoryTicket | None = try_admit(thread, self._estimates[index])
+        if ticket is None:
+            if index not in self._staged:
+                logger.info(
+                    f"{os.path.basename(self.paths[index])} aguarda memoria "
+                    f"(estimativa {self._estimates[index] / 1024**2:.0f} MB)."
+                )
+            self._staged[index] = thread
+            return False
+        self._staged.pop(index, None)
+        self._tickets[index] = ticket
+        return True
+
+    def _fill(self) -> None:
+        while self.pending and len(self.running) < self.concurrency:
+            index: int = self.pending[0]
+            path: str = self.paths[index]
+            thread: QThread = self._staged.get(index) or self.job_factory(path)
+            if not self._admit(index, thread):
+                break
+            self.pending.popleft()
+            thread.progress.connect(partial(self._on_job_progress, index))
+            thread.finished.connect(partial(self._on_job_finished, index))
+            thread.error.connect(partial(self._on_job_failed, index))
+            self.running[index] = thread
+            self.job_progress[index] = 0
+            self.job_started.emit(path)
+            thread.start()
+
+    def _emit_progress(self) -> None:
+        self.progress.emit(int(sum(self.job_progress.values()) / max(1, self.total)))
+
+    def _on_job_progress(self, index: int, value: int) -> None:
+        self.job_progress[index] = value
+        self._emit_progress()
+
+    def _on_job_finished(self, index: int, output_path: str) -> None:
+        path: str = self.paths[index]
+        self.outputs[path] = output_path
+        self.job_finished.emit(path, output_path)
+        output_dir: str | None = getattr(self.running.get(index), "output_dir", None)
+        for copy in self.duplicates.get(path, []):
+            try:
+                self._record_output(copy, materialize_duplicate(output_path, copy, output_dir))
+            except OSError as e:
+                self._record_failure(copy, f"Falha ao copiar a saida de {os.path.basename(path)}: {e}")
+        self._release(index)
+
+    def _on_job_failed(self, index: int, error_message: str) -> None:
+        # Uma falha fica registrada e o lote segue; os demais arquivos nao sao afetados.
+        for path in [self.paths[index], *self.duplicates.get(self.paths[index], [])]:
+            self._record_failure(path, error_message)
+        self._release(index)
+
+    def _record_output(self, path: str, output_path: str) -> None:
+        self.outputs[path] = output_path
+        self.job_progress[self._index[path]] = 100
+        self.job_finished.emit(path, output_path)
+
+    def _record_failure(self, path: str, error_message: str) -> None:
+        logger.error(f"Falha ao processar {path}: {error_message}")
+        self.failures[path] = error_message
+        self.job_progress[self._index[path]] = 100
+        self.job_failed.emit(path, error_message)
+
+    def _release(self, index: int) -> None:
+        thread: QThread | None = self.running.pop(index, None)
+        if thread is not None:
+            thread.wait()
+            thread.deleteLater()
+        ticket: MemoryTicket | None = self._tickets.pop(index, None)
+        if ticket is not None:
+            ticket.release()
+        self.job_progress[index] = 100
+        self._emit_progress()
+        self._fill()
+        if not self.running and not self.pending:
+            self.all_done.emit()
+
+
+class PipelinedBatch(QThread):
+    # Mesma interface do BatchScheduler, mas para lotes de imagens estaticas: os arquivos
+    # atravessam os estagios de _process_static_image em pipeline (src/core/pipeline.py).
+    progress = pyqtSignal(int)
+    job_started = pyqtSignal(str)
+    job_finished = pyqtSignal(str, str)
+    job_failed = pyqtSignal(str, str)
+    all_done = pyqtSignal()
+
+    def __init__(self, paths: list[str], job_factory: Callable[[str], ImageProcessor]) -> None:
+        super().__init__()
+        self.paths: list[str] = list(paths)
+        self.template: ImageProcessor | None = job_factory(self.paths[0]) if self.paths else None
+        self.outputs: dict[str, str] = {}
+        self.failures: dict[str, str] = {}
+        self.running: dict[str, StaticJob] = {}
+        self.duplicates: dict[str, list[str]] = {}
+        self.pipeline: StagePipeline[StaticJob] | None = None
+        self._stages_done: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._cancelled: threading.Event = threading.Event()
+        self._tickets: dict[str, MemoryTicket] = {}
+
+    @property
+    def total(self) -> int:
+        return len(self.paths)
+
+    @property
+    def done(self) -> int:
+        return len(self.outputs) + len(self.failures)
+
+    @property
+    def collapsed(self) -> int:
+        return sum(len(copies) for copies in self.duplicates.values())
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+        if self.pipeline:
+            self.pipeline.cancel()
+
+    def _primaries(self) -> list[str]:
+        copies: set[str] = {copy for group in self.duplicates.values() for copy in group}
+        return [path for path in self.paths if path not in copies]
+
+    def _jobs(self, paths: list[str]) -> Iterator[StaticJob]:
+        output_dir: str | None = self.template.output_dir
+        for path in paths:
+            if self._cancelled.is_set():
+                return
+            # A alimentacao do pipeline espera ate o proximo arquivo caber no orcamento de memoria.
+            ticket: MemoryTicket = admit(self.template, path)
+            with self._lock:
+                self._tickets[path] = ticket
+            work_dir: str = tempfile.mkdtemp(prefix="fogstripper_job_", dir=self.template.temp_dir)
+            final_output_path: str = final_output_path_for(path, self.template.output_format, output_dir)
+            try:
+                if output_dir and os.path.abspath(final_output_path) != os.path.abspath(path):
+                    os.makedirs(output_dir, exist_ok=True)
+                    processing_file, backup_path = path, None
+                else:
+                    processing_file, backup_path = backup_input(path)
+            except OSError as e:
+                job = self.template.create_static_job(path, final_output_path, work_dir)
+                self._finish(job, path, None, e)
+                continue
+            job = self.template.create_static_job(processing_file, final_output_path, work_dir)
+            job.source_path, job.backup_path = path, backup_path
+            with self._lock:
+                self.running[path] = job
+            self.job_started.emit(path)
+            yield job
+
+    def _on_stage_done(self, job: StaticJob, _: str) -> None:
+        with self._lock:
+            self._stages_done += 1
+            stages_done: int = self._stages_done
+        total_stages: int = max(1, (self.total - self.collapsed) * len(self.pipeline.stages))
+        self.progress.emit(int(stages_done / total_stages * 100))
+
+    def _on_job_done(self, job: StaticJob, error: Exception | None) -> None:
+        self._finish(job, job.source_path, job.backup_path, error)
+
+    def _finish(self, job: StaticJob, path: str, backup_path: str | None, error: Exception | None) -> None:
+        shutil.rmtree(job.work_dir, ignore_errors=True)
+        with self._lock:
+            self.running.pop(path, None)
+            ticket: MemoryTicket | None = self._tickets.pop(path, None)
+        if ticket is not None:
+            ticket.release()
+        if error is None and job.output_path:
+            self.outputs[path] = job.output_path
+            self.job_finished.emit(path, job.output_path)
+            for copy in self.duplicates.get(path, []):
+                try:
+                    copy_output: str = materialize_duplicate(job.output_path, copy, self.template.output_dir)
+                except OSError as e:
+                    self._fail(copy, f"Falha ao copiar a saida de {os.path.basename(path)}: {e}")
+                    continue
+                self.outputs[copy] = copy_output
+                self.job_finished.emit(copy, copy_output)
+            return
+        error = error or RuntimeError("Artefato final nao gerado.")
+        restore_backup(path, backup_path)
+        for failed in [path, *self.duplicates.get(path, [])]:
+            self._fail(failed, str(error))
+
+    def _fail(self, path: str, error_message: str) -> None:
+        logger.error(f"Falha ao processar {path}: {error_message}")
+        self.failures[path] = error_message
+        self.job_failed.emit(path, error_message)
+
+    def run(self) -> None:
+        if not self.template:
+            self.all_done.emit()
+            return
+        stages: list[Stage[StaticJob]] = [
+            Stage(name, fn, self.template.rembg_workers if name == "rembg" else 1)
+            for name, fn in self.template.static_stages()
+        ]
+        self.pipeline = StagePipeline(stages)
+        if dedup_enabled():
+            self.duplicates = find_duplicates(self.paths)
+            if self.duplicates:
+                logger.info(f"{self.collapsed} arquivo(s) duplicado(s) serao copiados do original, sem reprocessar.")
+        paths: list[str] = self._primaries()
+        logger.info(f"Processando {len(paths)} imagem(ns) em pipeline: {', '.join(s.name for s in stages)}.")
+        try:
+            self.pipeline.run(self._jobs(paths), self._on_job_done, self._on_stage_done)
+            logger.info(self.pipeline.report())
+            cache: StageCache | None = get_stage_cache()
+            if cache is not None:
+                logger.info(f"Cache de estagios: {cache.stats()}")
+        finally:
+            for ticket in self._tickets.values():
+                ticket.release()
+            self._tickets.clear()
+            self.template.cleanup()
+        self.progress.emit(100)
+        self.all_done.emit()
@@ -0,0 +1,237 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Any
+
+import imageio_ffmpeg
+
+from src.core.animation import FrameDirectorySink, FrameSink, FrameSource, PillowAnimationSink, VideoSink
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+PROJECT_ROOT: str = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+# Segmentos muito curtos nao compensam o custo de subir um processo com decodificador e modelo.
+MIN_SEGMENT_FRAMES: int = 48
+SEGMENT_RETRIES: int = 1
+
+
+def split_segments(
+    frame_count: int, segments: int, min_frames: int = MIN_SEGMENT_FRAMES
+) -> list[tuple[int, int | None]]:
+    count: int = max(1, min(segments, frame_count // max(1, min_frames)))
+    bounds: list[int] = [round(i * frame_count / count) for i in range(count)]
+    # O ultimo segmento vai ate o fim real do arquivo, ja que a contagem pode ser estimada.
+    return [(start, bounds[i + 1] if i + 1 < count else None) for i, start in enumerate(bounds)]
+
+
+def segment_part_path(work_dir: str, index: int, output_format: str) -> str:
+    if output_format == ".webm":
+        return os.path.join(work_dir, f"part_{index:03d}.webm")
+    return os.path.join(work_dir, f"part_{index:03d}")
+
+
+def open_segment_sink(
+    output_format: str, part_path: str, final_output_path: str, start: int, fps: float, temp_dir: str
+) -> FrameSink:
+    if output_format in (".png", ".svg"):
+        # Quadros avulsos ja tem o nome final; cada segmento escreve direto na pasta de saida.
+        return FrameDirectorySink(os.path.splitext(final_output_path)[0], output_format, temp_dir, first_index=start)
+    if output_format == ".webm":
+        return VideoSink(part_path, fps)
+    return FrameDirectorySink(part_path, ".png", temp_dir)
+
+
+def frame_number(name: str) -> int:
+    # frame_0042.png -> 42. O nome tem 4 digitos no minimo, entao a ordem alfabetica quebra a
+    # partir do quadro 10000.
+    return int(os.path.splitext(name)[0].rsplit("_", 1)[1])
+
+
+def concat_segments(parts: list[str], output_format: str, final_output_path: str, fps: float, temp_dir: str) -> str:
+    if output_format in (".png", ".svg"):
+        return os.path.splitext(final_output_path)[0]
+
+    if output_format == ".webm":
+        # Demuxer concat com copia de fluxo: os segmentos tem o mesmo codec e parametros,
+        # entao a juncao nao recodifica nada.
+        listing: str = os.path.join(temp_dir, "segments.txt")
+        with open(listing, "w") as f:
+            for part in parts:
+                f.write(f"file '{part}'\n")
+        cmd: list[str] = [imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error", "-f", "concat", "-safe", "0"]
+        cmd += ["-i", listing, "-c", "copy", final_output_path]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Falha ao concatenar segmentos: {result.stderr.strip()}")
+        return final_output_path
+
+    # GIF/WEBP: os segmentos entregam quadros PNG sem perdas e a codificacao acontece uma vez so.
+    sink = PillowAnimationSink(final_output_path, fps, os.path.join(temp_dir, "encoded_frames"))
+    sink.paths = [os.path.join(part, name) for part in parts for name in sorted(os.listdir(part), key=frame_number)]
+    return sink.close()
+
+
+class SegmentRunner:
+    def __init__(
+        self,
+        input_path: str,
+        output_format: str,
+        final_output_path: str,
+        work_dir: str,
+        options: dict[str, str | int],
+    ) -> None:
+        self.input_path: str = input_path
+        self.output_format: str = output_format
+        self.final_output_path: str = final_output_path
+        self.work_dir: str = work_dir
+        self.options: dict[str, str | int] = options
+        self._done: dict[int, int] = {}
+        self._lock: threading.Lock = threading.Lock()
+        # Contadores que cada segmento informa ao terminar (quadros inferidos, reaproveitados...).
+        self.stats: dict[str, int] = {}
+        self.frames: dict[int, int] = {}
+
+    def _command(self, index: int, start: int, stop: int | None) -> list[str]:
+        cmd: list[str] = [sys.executable, "-m", "src.core.segments", "--input", self.input_path]
+        cmd += ["--output-format", self.output_format, "--final-output", self.final_output_path]
+        cmd += ["--part", segment_part_path(self.work_dir, index, self.output_format), "--start", str(start)]
+        if stop is not None:
+            cmd += ["--stop", str(stop)]
+        for key, value in self.options.items():
+            cmd += [f"--{key.replace('_', '-')}", str(value)]
+        return cmd
+
+    def _run_segment(
+        self, index: int, start: int, stop: int | None, env: dict[str, str], on_progress: Callable[[int], None]
+    ) -> str:
+        for attempt in range(SEGMENT_RETRIES + 1):
+            with self._lock:
+                self._done[index] = 0
+            proc = subprocess.Popen(
+                self._command(index, start, stop),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                cwd=PROJECT_ROOT,
+                env=env,
+            )
+            stderr: list[str] = []
+            drain = threading.Thread(target=self._drain, args=(proc.stderr, stderr), daemon=True)
+            drain.start()
+            assert proc.stdout is not None
+            summary: dict[str, Any] | None = None
+            for line in proc.stdout:
+                try:
+                    message: dict[str, Any] = json.loads(line)
+                    if "frames" in message:
+                        summary = message
+                        continue
+                    done: int = int(message["done"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                with self._lock:
+                    self._done[index] = done
+                    total: int = sum(self._done.values())
+                on_progress(total)
+            proc.wait()
+            drain.join()
+            if proc.returncode == 0:
+                self._record(index, summary)
+                return segment_part_path(self.work_dir, index, self.output_format)
+            logger.warning(
+                f"Segmento {index} (quadro {start}) falhou com codigo {proc.returncode} "
+                f"(tentativa {attempt + 1}): {''.join(stderr[-20:]).strip()}"
+            )
+        raise RuntimeError(f"Falha no segmento {index} a partir do quadro {start}.")
+
+    def _record(self, index: int, summary: dict[str, Any] | None) -> None:
+        with self._lock:
+            self.frames[index] = int(summary["frames"]) if summary else self._done[index]
+            for key, value in (summary or {}).get("stats", {}).items():
+                if isinstance(value, int):
+                    self.stats[key] = self.stats.get(key, 0) + value
+
+    def _check_frame_counts(self, ranges: list[tuple[int, int | None]]) -> None:
+        # Um segmento com fim definido entrega exatamente stop - start quadros; se vier curto,
+        # a juncao perderia quadros. So e aceito quando o arquivo acabou antes (contagem estimada
+        # acima do real) e nenhum segmento seguinte produziu quadros.
+        for index, (start, stop) in enumerate(ranges):
+            if stop is None or self.frames[index] == stop - start:
+                continue
+            if self.frames[index] < stop - start and not any(self.frames[i] for i in range(index + 1, len(ranges))):
+                break
+            raise RuntimeError(
+                f"Segmento {index} entregou {self.frames[index]} quadros; esperados {stop - start} "
+                f"(quadros {start} a {stop})."
+            )
+
+    @staticmethod
+    def _drain(stream: IO[str] | None, lines: list[str]) -> None:
+        if stream is not None:
+            lines.extend(stream)
+
+    def run(self, ranges: list[tuple[int, int | None]], on_progress: Callable[[int], None]) -> list[str]:
+        # Cada segmento e um processo com seu proprio decodificador, sessao do rembg e codificador;
+        # os nucleos sao divididos entre eles para nao competirem.
+        threads: int = max(1, (os.cpu_count() or 1) // len(ranges))
+        pythonpath: str = os.pathsep.join(p for p in (PROJECT_ROOT, os.environ.get("PYTHONPATH")) if p)
+        env: dict[str, str] = {**os.environ, "OMP_NUM_THREADS": str(threads), "PYTHONPATH": pythonpath}
+        with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="fogstripper-segment") as pool:
+            futures = [
+                pool.submit(self._run_segment, i, start, stop, env, on_progress)
+                for i, (start, stop) in enumerate(ranges)
+            ]
+            parts: list[str] = [future.result() for future in futures]
+        self._check_frame_counts(ranges)
+        return parts
+
+    @property
+    def total_frames(self) -> int:
+        return sum(self.frames.values())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Processa um segmento de quadros de uma animacao.")
+    parser.add_argument("--input", required=True)
+    parser.add_argument("--output-format", required=True)
+    parser.add_argument("--final-output", required=True)
+    parser.add_argument("--part", required=True)
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--stop", type=int, default=None)
+    parser.add_argument("--model", default="u2net")
+    parser.add_argument("--potencia", type=int, default=75)
+    parser.add_argument("--rembg-workers", type=int, default=1)
+    args = parser.parse_args()
+
+    from src.core.processor import ImageProcessor
+
+    proc = ImageProcessor(args.input, args.model, args.output_format, args.potencia, 0, {})
+    proc.rembg_workers = args.rembg_workers
+    try:
+        with FrameSource(args.input, args.start, args.stop) as source:
+            sink: FrameSink = open_segment_sink(
+                args.output_format, args.part, args.final_output, args.start, source.fps, proc.temp_dir
+            )
+
+            frames: int = 0
+
+            def report(done: int) -> None:
+                nonlocal frames
+                frames = done
+                print(json.dumps({"done": done}), flush=True)
+
+            proc.stream_frames(source, sink, report)
+            # Ultima linha: o total de quadros e as estatisticas, somados pelo SegmentRunner.
+            print(json.dumps({"frames": frames, "stats": proc.stats}), flush=True)
+    finally:
+        proc.cleanup()
+
+
+if __name__ == "__main__":
+    main()
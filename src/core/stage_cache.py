@@ -0,0 +1,174 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+from PIL import Image
+
+from src.core.config_loader import APP_DIR, get_setting
+from src.utils.image_processing import INTERMEDIATE_PNG_COMPRESSION
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_MAX_MB: int = 2048
+DEFAULT_MASK_CACHE_MAX_MB: int = 512
+# Mascaras sao pequenas e lidas muitas vezes; vale pagar uma compressao maior na gravacao.
+MASK_PNG_COMPRESSION: int = 6
+# Ao estourar o limite, a limpeza desce ate esta fracao dele para nao varrer a pasta a cada gravacao.
+EVICT_TARGET: float = 0.9
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_key(parent: str, stage: str, params: dict[str, Any]) -> str:
+    # A chave de um estagio inclui a do anterior: mudar um parametro invalida ele e todos os seguintes.
+    payload: str = json.dumps({"parent": parent, "stage": stage, "params": params}, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+
+
+class StageCache:
+    # Resultados intermediarios do pipeline estatico (arrays RGBA, ou mascaras de um canal) em PNG,
+    # enderecados pelo conteudo da entrada e pelos parametros de cada estagio. Um acerto atualiza
+    # o mtime do arquivo, que serve de ordem LRU na limpeza.
+    def __init__(self, root: str, max_bytes: int, compress_level: int = INTERMEDIATE_PNG_COMPRESSION) -> None:
+        self.root: str = root
+        self.max_bytes: int = max_bytes
+        self.compress_level: int = compress_level
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+        self._lock: threading.Lock = threading.Lock()
+        self._size: int | None = None
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.png")
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> NDArray[np.uint8] | None:
+        path: str = self._path(key)
+        try:
+            with Image.open(path) as img:
+                image: NDArray[np.uint8] = np.array(img if img.mode in ("L", "RGBA") else img.convert("RGBA"))
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Entrada de cache corrompida descartada ({key}): {e}")
+            self._remove(path)
+            return None
+        return image
+
+    def put(self, key: str, image: NDArray[np.uint8]) -> None:
+        path: str = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".png", dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            Image.fromarray(image, "L" if image.ndim == 2 else "RGBA").save(
+                tmp_path, compress_level=self.compress_level
+            )
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Falha ao gravar no cache de estagios: {e}")
+            self._remove(tmp_path)
+            return
+        with self._lock:
+            self._size = (self._size if self._size is not None else self._scan_size()) + os.path.getsize(path)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def record(self, stage: str, hit: bool) -> None:
+        with self._lock:
+            (self.hits if hit else self.misses)[stage] += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"hits": dict(self.hits), "misses": dict(self.misses), "bytes": self._size}
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries: list[tuple[float, int, str]] = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path: str = os.path.join(dirpath, name)
+                try:
+                    st: os.stat_result = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        entries: list[tuple[float, int, str]] = sorted(self._entries())
+        size: int = sum(entry[1] for entry in entries)
+        target: int = int(self.max_bytes * EVICT_TARGET)
+        removed: int = 0
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            self._remove(path)
+            size -= entry_size
+            removed += 1
+        self._size = size
+        logger.info(f"Cache de estagios: {removed} entrada(s) antiga(s) removida(s), {size / 1024**2:.0f} MB em uso.")
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_caches: dict[str, StageCache] = {}
+_cache_lock: threading.Lock = threading.Lock()
+
+
+def _get_cache(name: str, root: str, max_mb: float, compress_level: int) -> StageCache | None:
+    if max_mb <= 0:
+        return None
+    root = os.path.expanduser(root)
+    with _cache_lock:
+        cache: StageCache | None = _caches.get(name)
+        if cache is None or cache.root != root:
+            cache = _caches[name] = StageCache(root, int(max_mb * 1024**2), compress_level)
+        cache.max_bytes = int(max_mb * 1024**2)
+        return cache
+
+
+def get_stage_cache() -> StageCache | None:
+    return _get_cache(
+        "stages",
+        get_setting("STAGE_CACHE_DIR", os.path.join(APP_DIR, "cache", "stages")),
+        float(get_setting("STAGE_CACHE_MAX_MB", DEFAULT_CACHE_MAX_MB)),
+        INTERMEDIATE_PNG_COMPRESSION,
+    )
+
+
+def get_mask_cache() -> StageCache | None:
+    # Modo opcional: guarda so o alfa do rembg e recompoe a partir da entrada original. As cores
+    # vem do original, nao do primeiro plano estimado pelo alpha matting.
+    if not get_setting("MASK_CACHE", False):
+        return None
+    return _get_cache(
+        "masks",
+        get_setting("MASK_CACHE_DIR", os.path.join(APP_DIR, "cache", "masks")),
+        float(get_setting("MASK_CACHE_MAX_MB", DEFAULT_MASK_CACHE_MAX_MB)),
+        MASK_PNG_COMPRESSION,
+    )
@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+from collections.abc import Callable
+from typing import Any
+
+from src.core.config_loader import APP_DIR, PATHS, get_setting
+from src.utils.memory import upscale_image_bytes
+from src.workers.upscale_models import AUTO_PRESET, DEFAULT_UPSCALE_MODEL, PRESETS, UPSCALE_MODELS, UpscaleModel
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# `tile_size` especial: o bloco sai do perfil de calibracao, por imagem.
+AUTO_TILE: int = -1
+DEFAULT_TILE: int = 640
+DEFAULT_CALIBRATION_TILES: tuple[int, ...] = (128, 192, 256, 384, 512, 640, 768, 1024)
+DEFAULT_CALIBRATION_SIZE: tuple[int, int] = (768, 512)
+CALIBRATION_TIMEOUT: float = 1800
+
+Measurement = dict[str, Any]
+
+_profile_cache: dict[str, tuple[float, dict[str, Any] | None]] = {}
+_warned: set[str] = set()
+
+
+def profile_path() -> str:
+    return os.path.expanduser(get_setting("TILE_PROFILE_PATH", os.path.join(APP_DIR, "tile_profile.json")))
+
+
+def parse_tile(value: str) -> int:
+    # Aceita "auto" onde um tamanho de bloco e esperado (CLI, servidor, config).
+    return AUTO_TILE if str(value).lower() == "auto" else int(value)
+
+
+def calibration_models(choice: str = AUTO_PRESET) -> list[UpscaleModel]:
+    # Um preset calibra todos os modelos que ele pode escolher; um nome, so aquele modelo.
+    if choice in UPSCALE_MODELS:
+        return [UPSCALE_MODELS[choice]]
+    preset: dict[int, str] = PRESETS["quality" if choice == AUTO_PRESET else choice]
+    return [UPSCALE_MODELS[name] for name in dict.fromkeys(preset.values())]
+
+
+def measure_tile(
+    tile: int, width: int, height: int, model: str = DEFAULT_UPSCALE_MODEL, models_dir: str | None = None
+) -> Measurement | None:
+    # Cada tamanho roda em um processo novo do worker de upscale, para que o pico de memoria
+    # de um nao contamine o outro e um estouro de memoria derrube so aquela medicao.
+    python: str | None = PATHS.get("PYTHON_UPSCALE")
+    script: str | None = PATHS.get("UPSCALE_SCRIPT")
+    if not (python and script):
+        raise RuntimeError("PYTHON_UPSCALE/UPSCALE_SCRIPT nao configurados.")
+    cmd: list[str] = [python, script, "--tile", str(tile), "--calibrate", f"{width}x{height}", "--model", model]
+    if models_dir:
+        cmd += ["--models-dir", models_dir]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=CALIBRATION_TIMEOUT, check=True)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+        logger.warning(f"Calibracao do bloco {tile} ({model}) falhou: {e}")
+        return None
+    # O RealESRGANer imprime o progresso dos blocos no stdout; o resultado e a ultima linha.
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def calibrate(
+    tiles: tuple[int, ...] = DEFAULT_CALIBRATION_TILES,
+    size: tuple[int, int] = DEFAULT_CALIBRATION_SIZE,
+    measure: Callable[..., Measurement | None] | None = None,
+    model: str = DEFAULT_UPSCALE_MODEL,
+    models_dir: str | None = None,
+) -> dict[str, Any]:
+    # Perfil de um modelo: o worker amplia na escala nativa da rede, sem reducao final.
+    measure = measure or measure_tile
+    spec: UpscaleModel = UPSCALE_MODELS[model]
+    width, height = size
+    results: list[Measurement] = []
+    for tile in tiles:
+        logger.info(f"Calibrando bloco {tile} de {model} em {width}x{height}...")
+        measurement: Measurement | None = measure(tile, width, height, model, models_dir)
+        if measurement is None:
+            continue
+        measurement["pixels_per_second"] = round(width * height / max(measurement["seconds"], 1e-9), 1)
+        # O que sobra do pico depois de tirar a parte proporcional a imagem e o custo do bloco.
+        measurement["tile_bytes"] = max(
+            0, measurement["peak_bytes"] - upscale_image_bytes(width, height, spec.scale, spec.scale)
+        )
+        logger.info(
+            f"Bloco {tile}: {measurement['seconds']:.2f}s, {measurement['pixels_per_second']:.0f} px/s, "
+            f"pico {measurement['peak_bytes'] / 1024**2:.0f} MB."
+        )
+        results.append(measurement)
+    if not results:
+        raise RuntimeError(f"Nenhum tamanho de bloco de {model} pode ser medido.")
+    return {
+        "created": time.time(),
+        "machine": {"node": platform.node(), "cpu_count": os.cpu_count(), "processor": platform.processor()},
+        "model": model,
+        "size": [width, height],
+        "results": results,
+    }
+
+
+def save_profile(profile: dict[str, Any], path: str | None = None) -> str:
+    # O arquivo guarda um perfil por modelo; calibrar um modelo nao apaga os outros.
+    path = path or profile_path()
+    stored: dict[str, Any] = load_profile(path) or {}
+    models: dict[str, Any] = stored.get("models") or {}
+    models[profile["model"]] = profile
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"models": models}, f, indent=2)
+    _profile_cache.clear()
+    return path
+
+
+def load_profile(path: str | None = None) -> dict[str, Any] | None:
+    path = path or profile_path()
+    try:
+        mtime: float = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached: tuple[float, dict[str, Any] | None] | None = _profile_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        try:
+            with open(path) as f:
+                profile: dict[str, Any] | None = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Perfil de blocos invalido em {path}: {e}")
+            profile = None
+        cached = _profile_cache[path] = (mtime, profile)
+    return cached[1]
+
+
+def model_profile(profile: dict[str, Any], model: str) -> dict[str, Any] | None:
+    return (profile.get("models") or {}).get(model)
+
+
+def choose_tile(
+    width: int, height: int, factor: int, limit_bytes: int | None, profile: dict[str, Any], model_scale: int
+) -> int | None:
+    # O bloco de maior vazao cujo pico previsto para esta imagem cabe no limite; se nenhum
+    # couber, o menor medido. `profile` e o perfil do modelo que vai rodar.
+    results: list[Measurement] = profile.get("results") or []
+    if not results:
+        return None
+    image_bytes: int = upscale_image_bytes(width, height, factor, model_scale)
+    fitting: list[Measurement] = [
+        m for m in results if limit_bytes is None or m["tile_bytes"] + image_bytes <= limit_bytes
+    ]
+    if not fitting:
+        return min(m["tile"] for m in results)
+    return max(fitting, key=lambda m: (m["pixels_per_second"], -m["tile"]))["tile"]
+
+
+def resolve_tile_size(
+    tile_size: int, width: int, height: int, factor: int, limit_bytes: int | None, model: UpscaleModel
+) -> int:
+    if tile_size != AUTO_TILE:
+        return tile_size
+    profile: dict[str, Any] | None = load_profile()
+    entry: dict[str, Any] | None = model_profile(profile, model.name) if profile else None
+    tile: int | None = choose_tile(width, height, factor, limit_bytes, entry, model.scale) if entry else None
+    if tile is None:
+        if model.name not in _warned:
+            logger.warning(
+                f"Sem perfil de blocos calibrado para {model.name}; usando {DEFAULT_TILE}. "
+                f"Rode fogstripper-cli --calibrate-tiles --upscale-model {model.name}."
+            )
+            _warned.add(model.name)
+        return DEFAULT_TILE
+    return tile
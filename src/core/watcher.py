@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+from src.core.config_loader import get_setting
+from src.core.constants import ALL_EXTENSIONS
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+DEFAULT_SETTLE_SECONDS: float = 2.0
+DEFAULT_POLL_INTERVAL: float = 1.0
+
+
+def default_settle_seconds() -> float:
+    return float(get_setting("WATCH_SETTLE_SECONDS", DEFAULT_SETTLE_SECONDS))
+
+
+def default_poll_interval() -> float:
+    return float(get_setting("WATCH_POLL_INTERVAL", DEFAULT_POLL_INTERVAL))
+
+
+class FolderWatcher:
+    # Varredura periodica, sem dependencias: um arquivo so e entregue depois de ficar
+    # `settle_seconds` com tamanho e mtime inalterados, para nao pegar copias pela metade.
+    # Um arquivo reescrito depois de entregue volta a ser entregue.
+    def __init__(
+        self, root: str, settle_seconds: float = DEFAULT_SETTLE_SECONDS, exclude: tuple[str, ...] = ()
+    ) -> None:
+        self.root: str = os.path.abspath(root)
+        self.settle_seconds: float = settle_seconds
+        self.exclude: tuple[str, ...] = tuple(os.path.abspath(path) for path in exclude)
+        self._changing: dict[str, tuple[tuple[int, int], float]] = {}
+        self._delivered: dict[str, tuple[int, int]] = {}
+
+    def _is_candidate(self, path: str) -> bool:
+        name: str = os.path.basename(path).lower()
+        base, _ = os.path.splitext(name)
+        return name.endswith(ALL_EXTENSIONS) and not base.endswith(".bak") and not name.startswith(".")
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        found: dict[str, tuple[int, int]] = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(
+                d for d in dirnames if os.path.join(dirpath, d) not in self.exclude and not d.startswith(".")
+            )
+            for name in sorted(filenames):
+                path: str = os.path.join(dirpath, name)
+                if not self._is_candidate(path):
+                    continue
+                try:
+                    st: os.stat_result = os.stat(path)
+                except OSError:
+                    continue
+                found[path] = (st.st_size, st.st_mtime_ns)
+        return found
+
+    def poll(self, now: float | None = None) -> list[str]:
+        now = time.monotonic() if now is None else now
+        current: dict[str, tuple[int, int]] = self._scan()
+        ready: list[str] = []
+        for path, signature in current.items():
+            if self._delivered.get(path) == signature:
+                continue
+            seen: tuple[tuple[int, int], float] | None = self._changing.get(path)
+            if seen is None or seen[0] != signature:
+                self._changing[path] = (signature, now)
+            elif now - seen[1] >= self.settle_seconds and signature[0] > 0:
+                ready.append(path)
+                self._delivered[path] = signature
+                del self._changing[path]
+        for tracked in (self._changing, self._delivered):
+            for path in [path for path in tracked if path not in current]:
+                del tracked[path]
+        return ready
+
+
+class WatchService:
+    # Liga o FolderWatcher a um pool limitado: no maximo `concurrency` arquivos em andamento; o
+    # resto espera numa fila em memoria, sem segurar a varredura.
+    def __init__(
+        self,
+        watcher: FolderWatcher,
+        handle: Callable[[str], Any],
+        concurrency: int = 1,
+        interval: float = DEFAULT_POLL_INTERVAL,
+    ) -> None:
+        self.watcher: FolderWatcher = watcher
+        self.handle: Callable[[str], Any] = handle
+        self.concurrency: int = max(1, concurrency)
+        self.interval: float = interval
+        self.backlog: deque[str] = deque()
+        self.processed: int = 0
+        self._slots: threading.Semaphore = threading.Semaphore(self.concurrency)
+        self._lock: threading.Lock = threading.Lock()
+
+    def _done(self, future: Future[Any]) -> None:
+        self._slots.release()
+        with self._lock:
+            self.processed += 1
+        if future.exception() is not None:
+            logger.error(f"Falha ao processar arquivo monitorado: {future.exception()}")
+
+    def run(self, stop: threading.Event) -> None:
+        logger.info(f"Monitorando {self.watcher.root} com ate {self.concurrency} arquivo(s) simultaneo(s).")
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="fogstripper-watch") as pool:
+            while not stop.is_set():
+                self.backlog.extend(self.watcher.poll())
+                while self.backlog and self._slots.acquire(blocking=False):
+                    pool.submit(self.handle, self.backlog.popleft()).add_done_callback(self._done)
+                stop.wait(self.interval)
+        logger.info(f"Monitoramento encerrado; {self.processed} arquivo(s) processado(s).")
@@ -0,0 +1,226 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import subprocess
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import IO, Any
+
+from src.core.config_loader import get_setting
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+DEFAULT_IDLE_TIMEOUT: float = 300.0
+
+
+class WorkerError(RuntimeError):
+    pass
+
+
+class PersistentWorker:
+    def __init__(
+        self,
+        python: str,
+        script: str,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        env: dict[str, str] | None = None,
+    ) -> None:
+        self.python: str = python
+        self.script: str = script
+        self.idle_timeout: float = idle_timeout
+        self.env: dict[str, str] | None = env
+        self.process: subprocess.Popen | None = None
+        self._lock: threading.Lock = threading.Lock()
+        self._next_id: int = 0
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.script)
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def _drain_stderr(self, stream: IO[str]) -> None:
+        for line in stream:
+            if line.strip():
+                logger.warning(f"[{self.name}] {line.rstrip()}")
+
+    def _start(self) -> None:
+        cmd: list[str] = [self.python, self.script, "--serve", "--idle-timeout", str(self.idle_timeout)]
+        logger.info(f"Iniciando worker persistente: {' '.join(cmd)}")
+        try:
+            self.process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                bufsize=1,
+                env={**os.environ, **self.env} if self.env else None,
+            )
+        except OSError as e:
+            self.process = None
+            raise WorkerError(f"Falha ao iniciar {self.name}: {e}") from e
+
+        threading.Thread(target=self._drain_stderr, args=(self.process.stderr,), daemon=True).start()
+        ready: dict[str, Any] = self._read_response()
+        if not ready.get("ready"):
+            self._kill()
+            raise WorkerError(f"Handshake inesperado de {self.name}: {ready}")
+
+    def _read_response(self) -> dict[str, Any]:
+        assert self.process is not None and self.process.stdout is not None
+        line: str = self.process.stdout.readline()
+        if not line:
+            code = self.process.poll()
+            self._kill()
+            raise WorkerError(f"Worker {self.name} encerrou inesperadamente (codigo {code}).")
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError as e:
+            self._kill()
+            raise WorkerError(f"Resposta invalida de {self.name}: {line.strip()}") from e
+
+    def _send(self, payload: dict[str, Any]) -> dict[str, Any]:
+        assert self.process is not None and self.process.stdin is not None
+        self.process.stdin.write(json.dumps(payload) + "\n")
+        self.process.stdin.flush()
+        return self._read_response()
+
+    def request(self, op: str, **params: Any) -> dict[str, Any]:
+        with self._lock:
+            self._next_id += 1
+            payload: dict[str, Any] = {"id": self._next_id, "op": op, **params}
+
+            # Uma segunda tentativa cobre o worker que encerrou sozinho por ociosidade.
+            for attempt in range(2):
+                if not self.is_alive():
+                    self._start()
+                try:
+                    response: dict[str, Any] = self._send(payload)
+                    break
+                except (BrokenPipeError, OSError, WorkerError) as e:
+                    self._kill()
+                    if attempt == 1:
+                        raise WorkerError(f"Worker {self.name} indisponivel: {e}") from e
+                    logger.warning(f"Worker {self.name} caiu, reiniciando: {e}")
+
+        if not response.get("ok"):
+            raise WorkerError(response.get("error", "Erro desconhecido no worker."))
+        return response
+
+    def _kill(self) -> None:
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process = None
+
+    def close(self) -> None:
+        with self._lock:
+            if self.is_alive():
+                try:
+                    self._send({"id": None, "op": "shutdown"})
+                    self.process.wait(timeout=5)
+                except (OSError, WorkerError, subprocess.TimeoutExpired):
+                    pass
+            self._kill()
+
+
+class WorkerPool:
+    def __init__(self, python: str, script: str, idle_timeout: float = DEFAULT_IDLE_TIMEOUT) -> None:
+        self.python: str = python
+        self.script: str = script
+        self.idle_timeout: float = idle_timeout
+        self.workers: list[PersistentWorker] = []
+        self._idle: queue.LifoQueue[PersistentWorker] = queue.LifoQueue()
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self.workers)
+
+    def resize(self, size: int) -> None:
+        # O pool so cresce; cada worker recebe uma fatia dos nucleos para o onnxruntime/torch
+        # nao disputar todos os nucleos com os demais workers.
+        with self._lock:
+            size = max(1, size)
+            if size <= len(self.workers):
+                return
+            threads: int = max(1, (os.cpu_count() or 1) // size)
+            env: dict[str, str] | None = {"OMP_NUM_THREADS": str(threads)} if size > 1 else None
+            for worker in self.workers:
+                if worker.env != env and not worker.is_alive():
+                    worker.env = env
+            while len(self.workers) < size:
+                worker = PersistentWorker(self.python, self.script, idle_timeout=self.idle_timeout, env=env)
+                self.workers.append(worker)
+                self._idle.put(worker)
+
+    @contextmanager
+    def acquire(self) -> Iterator[PersistentWorker]:
+        worker: PersistentWorker = self._idle.get()
+        try:
+            yield worker
+        finally:
+            self._idle.put(worker)
+
+    def request(self, op: str, **params: Any) -> dict[str, Any]:
+        with self.acquire() as worker:
+            return worker.request(op, **params)
+
+    def warm(self, op: str = "ping", **params: Any) -> None:
+        # Sobe todos os workers do pool de uma vez, em vez de no primeiro pedido de cada um.
+        for worker in list(self.workers):
+            worker.request(op, **params)
+
+    def close(self) -> None:
+        for worker in self.workers:
+            worker.close()
+
+
+_POOLS: dict[tuple[str, str], WorkerPool] = {}
+_POOLS_LOCK: threading.Lock = threading.Lock()
+_keep_warm: bool = False
+
+
+def keep_workers_warm() -> None:
+    # Modos de longa duracao (pasta monitorada, servidor) nao deixam os workers encerrarem por
+    # ociosidade entre uma chegada e outra; vale para pools novos e para os proximos reinicios.
+    global _keep_warm
+    with _POOLS_LOCK:
+        _keep_warm = True
+        for pool in _POOLS.values():
+            pool.idle_timeout = 0
+            for worker in pool.workers:
+                worker.idle_timeout = 0
+
+
+def get_worker_pool(python: str, script: str, size: int = 1) -> WorkerPool:
+    key: tuple[str, str] = (python, script)
+    with _POOLS_LOCK:
+        if key not in _POOLS:
+            idle: float = 0 if _keep_warm else float(get_setting("WORKER_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT))
+            _POOLS[key] = WorkerPool(python, script, idle_timeout=idle)
+        pool: WorkerPool = _POOLS[key]
+    pool.resize(size)
+    return pool
+
+
+def shutdown_workers() -> None:
+    with _POOLS_LOCK:
+        pools: list[WorkerPool] = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
+    if pools:
+        total: int = sum(pool.size for pool in pools)
+        logger.info(f"{total} worker(s) persistente(s) encerrado(s).")
+
+
+atexit.register(shutdown_workers)
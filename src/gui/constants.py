@@ -1,11 +1,4 @@
-from src.core.constants import ALL_EXTENSIONS, IMAGE_EXTENSIONS, VIDEO_EXTENSIONS
-
-MODEL_DESCRIPTIONS: dict[str, str] = {
-    "u2netp": "Versao 'light' do u2net. Mais rapido, menos detalhe.",
-    "u2net": "Modelo de uso geral, bom equilibrio entre velocidade e precisao.",
-    "u2net_human_seg": "Alta precisao, especializado para recortar pessoas.",
-    "isnet-general-use": "Moderno e porem pesado, mas com a melhor precisao para objetos.",
-}
+from src.core.constants import ALL_EXTENSIONS, IMAGE_EXTENSIONS, MODEL_DESCRIPTIONS, VIDEO_EXTENSIONS
 
 PRESET_COLORS: list[str] = [
     "#ffffff",
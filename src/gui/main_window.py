@@ -1,10 +1,11 @@
 import logging
 import os
 import shutil
+import sqlite3
 from typing import Any
 
-from PyQt6.QtCore import Qt, QUrl
-from PyQt6.QtGui import QDesktopServices, QDragEnterEvent, QDropEvent, QImage, QPixmap
+from PyQt6.QtCore import Qt, QTimer, QUrl
+from PyQt6.QtGui import QCloseEvent, QDesktopServices, QDragEnterEvent, QDropEvent, QImage, QPixmap
 from PyQt6.QtWidgets import (
     QApplication,
     QDialog,
@@ -17,8 +18,12 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
+from src.core.config_loader import get_setting
+from src.core.job_queue import DONE, PENDING, JobQueue, QueuedJob, default_queue_path
 from src.core.logger_config import get_log_path
-from src.core.processor import ProcessThread
+from src.core.process_thread import ProcessThread
+from src.core.scheduler import BatchScheduler, PipelinedBatch, default_batch_concurrency
+from src.core.worker_client import shutdown_workers
 from src.gui.constants import ALL_EXTENSIONS, VIDEO_EXTENSIONS
 from src.gui.dialogs import ProcessingOptionsDialog, create_styled_message_box
 from src.gui.drop_area import DropArea
@@ -33,6 +38,7 @@ class FogStripperWindow(QWidget):
         self._init_state()
         self._setup_ui()
         self._connect_signals()
+        QTimer.singleShot(0, self._offer_resume)
 
     def _init_state(self) -> None:
         self.setObjectName("FogStripper")
@@ -44,11 +50,17 @@ class FogStripperWindow(QWidget):
         self.crop_option: str = "original"
         self.fill_holes_option: bool = False
         self.files_to_process: list[str] = []
-        self.current_index: int = 0
         self.total_files: int = 0
         self.output_directory: str = ""
-        self.thread: ProcessThread | None = None
+        self.scheduler: BatchScheduler | PipelinedBatch | None = None
         self.last_output_path: str = ""
+        self.job_options: dict[str, dict[str, Any]] = {}
+        self.job_ids: dict[str, int] = {}
+        self.job_queue: JobQueue | None = None
+        try:
+            self.job_queue = JobQueue(default_queue_path())
+        except sqlite3.Error as e:
+            logger.error(f"Fila de jobs indisponivel, lote nao sera retomavel: {e}")
 
     def _setup_ui(self) -> None:
         main_layout = QVBoxLayout(self)
@@ -138,6 +150,12 @@ class FogStripperWindow(QWidget):
         if self.sender().isChecked():
             self.upscale_factor = value
 
+    def closeEvent(self, event: QCloseEvent) -> None:
+        if self.scheduler:
+            self.scheduler.cancel()
+        shutdown_workers()
+        super().closeEvent(event)
+
     def dragEnterEvent(self, event: QDragEnterEvent) -> None:
         if event.mimeData().hasUrls():
             event.acceptProposedAction()
@@ -178,25 +196,62 @@ class FogStripperWindow(QWidget):
             self.crop_option = dialog.get_crop_option()
             self.fill_holes_option = dialog.get_fill_holes_option()
 
+        options: dict[str, Any] = self._processor_options()
+        if self.job_queue:
+            jobs: list[QueuedJob] = self.job_queue.enqueue(paths, options)
+        else:
+            jobs = [QueuedJob(0, path, options, PENDING) for path in paths]
+        self._run_jobs(jobs)
+
+    def _offer_resume(self) -> None:
+        jobs: list[QueuedJob] = self.job_queue.unfinished() if self.job_queue else []
+        if not jobs:
+            return
+        msg = create_styled_message_box(
+            self, "Retomar Processamento", f"{len(jobs)} arquivo(s) ficaram pendentes na ultima execucao. Retomar?"
+        )
+        msg.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if msg.exec() == QMessageBox.StandardButton.Yes:
+            self._run_jobs(jobs)
+        else:
+            self.job_queue.discard_unfinished()
+
+    def _run_jobs(self, jobs: list[QueuedJob]) -> None:
+        pending: list[QueuedJob] = [job for job in jobs if job.state != DONE]
+        if len(pending) < len(jobs):
+            logger.info(f"{len(jobs) - len(pending)} arquivo(s) ja processado(s) com as mesmas opcoes foram pulados.")
+        if not pending:
+            self.files_to_process.clear()
+            self.drop_area.clear()
+            create_styled_message_box(
+                self, "Processo Concluído", "Todos os arquivos ja foram processados com essas opcoes."
+            ).exec()
+            return
+
+        paths: list[str] = [job.input_path for job in pending]
+        self.job_ids = {job.input_path: job.id for job in pending}
+        self.job_options = {job.input_path: job.options for job in pending}
+        is_animated = any(p.lower().endswith(VIDEO_EXTENSIONS) for p in paths)
+
         self.output_directory = os.path.dirname(paths[0])
         self.total_files = len(paths)
-        self.current_index = 0
+        self.last_output_path = ""
         self.progress_bar.setValue(0)
         self.progress_bar.setVisible(True)
         self._set_controls_enabled(False)
-        self._process_next()
-
-    def _process_next(self) -> None:
-        if self.current_index >= self.total_files:
-            self._on_all_processed()
-            return
-
-        path = self.files_to_process[self.current_index]
-        self.status_label.setText(
-            f"Processando: {os.path.basename(path)} ({self.current_index + 1}/{self.total_files})"
-        )
-        self.status_label.setVisible(True)
 
+        if get_setting("BATCH_MODE", "concurrent") == "pipeline" and not is_animated and len(paths) > 1:
+            self.scheduler = PipelinedBatch(paths, self._create_job)
+        else:
+            self.scheduler = BatchScheduler(paths, self._create_job, default_batch_concurrency())
+        self.scheduler.progress.connect(self.progress_bar.setValue)
+        self.scheduler.job_started.connect(self._on_job_started)
+        self.scheduler.job_finished.connect(self._on_image_finished)
+        self.scheduler.job_failed.connect(self._on_job_failed)
+        self.scheduler.all_done.connect(self._on_all_processed)
+        self.scheduler.start()
+
+    def _processor_options(self) -> dict[str, Any]:
         post_opts: dict[str, Any] = {
             "enabled": self.post_panel.is_enabled(),
             "upscale_factor": self.upscale_factor,
@@ -204,33 +259,63 @@ class FogStripperWindow(QWidget):
             "fill_holes": self.fill_holes_option,
             **self.post_panel.get_options(),
         }
+        return {
+            "model_name": self.settings_panel.model_combo.currentText(),
+            "output_format": self.settings_panel.format_combo.currentText().lower(),
+            "potencia": self.settings_panel.slider.value(),
+            "tile_size": self.settings_panel.tile_size(),
+            "post_processing_opts": post_opts,
+        }
 
-        self.thread = ProcessThread(
-            input_path=path,
-            model_name=self.settings_panel.model_combo.currentText(),
-            output_format=self.settings_panel.format_combo.currentText().lower(),
-            potencia=self.settings_panel.slider.value(),
-            tile_size=self.settings_panel.tile_slider.value(),
-            post_processing_opts=post_opts,
-        )
-        self.thread.progress.connect(self.progress_bar.setValue)
-        self.thread.finished.connect(self._on_image_finished)
-        self.thread.error.connect(self._on_error)
-        self.thread.start()
+    def _create_job(self, path: str) -> ProcessThread:
+        return ProcessThread(input_path=path, **self.job_options[path])
 
-    def _on_image_finished(self, output_path: str) -> None:
+    def _on_job_started(self, path: str) -> None:
+        if self.job_queue and path in self.job_ids:
+            self.job_queue.mark_running(self.job_ids[path])
+        self._update_status()
+
+    def _on_job_failed(self, path: str, error_message: str) -> None:
+        if self.job_queue and path in self.job_ids:
+            self.job_queue.mark_failed(self.job_ids[path], error_message)
+        self._update_status()
+
+    def _update_status(self, *_: str) -> None:
+        if not self.scheduler:
+            return
+        text = f"Processando: {self.scheduler.done}/{self.total_files} concluido(s)"
+        if len(self.scheduler.running) > 1:
+            text += f", {len(self.scheduler.running)} em andamento"
+        if self.scheduler.failures:
+            text += f", {len(self.scheduler.failures)} com erro"
+        self.status_label.setText(text)
+        self.status_label.setVisible(True)
+
+    def _on_image_finished(self, path: str, output_path: str) -> None:
+        if self.job_queue and path in self.job_ids:
+            self.job_queue.mark_done(self.job_ids[path], output_path)
         self.last_output_path = output_path
-        self.current_index += 1
-        self._process_next()
+        self._update_status()
 
     def _on_all_processed(self) -> None:
+        shutdown_workers()
+        failures: dict[str, str] = self.scheduler.failures if self.scheduler else {}
+        collapsed: int = self.scheduler.collapsed if self.scheduler else 0
+        self.scheduler = None
         self.status_label.setVisible(False)
         self.progress_bar.setVisible(False)
         self._set_controls_enabled(True)
         self.files_to_process.clear()
         self.drop_area.clear()
 
-        msg = create_styled_message_box(self, "Processo Concluído", "Todas as imagens foram processadas.")
+        if failures:
+            self._on_error(failures)
+            return
+
+        text = "Todas as imagens foram processadas."
+        if collapsed:
+            text += f"\n{collapsed} arquivo(s) repetido(s) foram copiados do original, sem reprocessar."
+        msg = create_styled_message_box(self, "Processo Concluído", text)
         open_folder = msg.addButton("Abrir Pasta", QMessageBox.ButtonRole.ActionRole)
 
         open_image = None
@@ -250,20 +335,17 @@ class FogStripperWindow(QWidget):
         elif copy_image and clicked == copy_image:
             self._copy_to_clipboard(self.last_output_path)
 
-    def _on_error(self, error_message: str) -> None:
+    def _on_error(self, failures: dict[str, str]) -> None:
         self.status_label.setText("Ocorreu um erro!")
         self.status_label.setVisible(True)
-        self.progress_bar.setVisible(False)
-        self._set_controls_enabled(True)
-        self.files_to_process.clear()
-        self.drop_area.clear()
 
+        details = "\n".join(f"{os.path.basename(path)}: {error}" for path, error in failures.items())
         dialog = create_styled_message_box(
             self,
             "Erro no Processamento",
-            "Ocorreu um erro.",
+            f"{len(failures)} de {self.total_files} arquivo(s) falharam; os demais foram processados.",
             QMessageBox.Icon.Critical,
-            f"Detalhes: {error_message}",
+            f"Detalhes:\n{details}",
         )
         save_btn = dialog.addButton("Salvar Relatório", QMessageBox.ButtonRole.ActionRole)
         dialog.addButton("OK", QMessageBox.ButtonRole.AcceptRole)
@@ -2,6 +2,7 @@ import logging
 
 from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import (
+    QCheckBox,
     QComboBox,
     QFrame,
     QGroupBox,
@@ -13,6 +14,7 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
+from src.core.tile_calibration import AUTO_TILE
 from src.gui.constants import MODEL_DESCRIPTIONS
 
 logger = logging.getLogger(__name__)
@@ -81,13 +83,22 @@ class SettingsPanel(QWidget):
         vram_label = QLabel("Bloco (VRAM):")
         settings_layout.addWidget(vram_label)
 
+        tile_layout = QHBoxLayout()
         self.tile_slider = QSlider(Qt.Orientation.Horizontal)
         self.tile_slider.setFixedHeight(ROW_HEIGHT)
         self.tile_slider.setRange(256, 1024)
         self.tile_slider.setValue(640)
         self.tile_slider.setSingleStep(64)
         self.tile_slider.setToolTip("Blocos menores usam menos VRAM.")
-        settings_layout.addWidget(self.tile_slider)
+        tile_layout.addWidget(self.tile_slider, 1)
+
+        self.tile_auto_check = QCheckBox("Auto")
+        self.tile_auto_check.setToolTip(
+            "Escolhe o bloco por imagem a partir do perfil medido com fogstripper-cli --calibrate-tiles."
+        )
+        self.tile_auto_check.toggled.connect(lambda checked: self.tile_slider.setEnabled(not checked))
+        tile_layout.addWidget(self.tile_auto_check)
+        settings_layout.addLayout(tile_layout)
 
         self._setup_upscale_options(settings_layout)
 
@@ -116,5 +127,8 @@ class SettingsPanel(QWidget):
 
         layout.addWidget(self.upscale_group)
 
+    def tile_size(self) -> int:
+        return AUTO_TILE if self.tile_auto_check.isChecked() else self.tile_slider.value()
+
     def update_model_description(self, model_name: str) -> None:
         self.model_desc_label.setText(MODEL_DESCRIPTIONS.get(model_name, ""))
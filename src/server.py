@@ -0,0 +1,413 @@
+import argparse
+import json
+import logging
+import mimetypes
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ipaddress import ip_address
+from typing import Any, NoReturn
+from urllib.parse import parse_qs, urlsplit
+
+from src.cli import build_parser, output_format_error, processor_options
+from src.core.admission import admit
+from src.core.animation import default_rembg_workers
+from src.core.config_loader import APP_DIR, get_setting
+from src.core.constants import ALL_EXTENSIONS
+from src.core.job_queue import DONE, FAILED, PENDING, RUNNING
+from src.core.logger_config import setup_logging
+from src.core.processor import ImageProcessor, warm_up_workers
+from src.core.worker_client import keep_workers_warm, shutdown_workers
+
+# Servidor HTTP local (fogstripper-server): recebe a imagem no corpo do POST, as opcoes na query
+# string com os mesmos nomes da CLI, e roda o ImageProcessor em um pool limitado de threads.
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+DEFAULT_PORT: int = 8765
+DEFAULT_MAX_QUEUE: int = 16
+DEFAULT_KEEP_JOBS: int = 100
+DEFAULT_MAX_UPLOAD_MB: int = 512
+
+# Opcoes da CLI aceitas por requisicao; caminhos do servidor (fundo em imagem, saida) ficam de fora.
+REQUEST_OPTIONS: tuple[str, ...] = (
+    "model",
+    "format",
+    "potencia",
+    "tile",
+    "upscale",
+    "upscale-model",
+    "trim",
+    "fill-holes",
+    "shadow",
+    "shadow-blur",
+    "shadow-opacity",
+    "background-color",
+    "background-resize-mode",
+)
+FLAG_OPTIONS: tuple[str, ...] = ("trim", "fill-holes", "shadow")
+CONTENT_TYPE_EXTENSIONS: dict[str, str] = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+    "video/mp4": ".mp4",
+    "video/webm": ".webm",
+    "video/quicktime": ".mov",
+}
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class _RequestParser(argparse.ArgumentParser):
+    def error(self, message: str) -> NoReturn:
+        raise ValueError(message)
+
+
+def _is_loopback(host: str) -> bool:
+    try:
+        return host == "localhost" or ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _truthy(value: str) -> bool:
+    return value.lower() in ("", "1", "true", "yes", "on")
+
+
+def request_options(query: dict[str, list[str]]) -> dict[str, Any]:
+    # Traduz a query string para argumentos da CLI e usa o mesmo parser, com as mesmas validacoes.
+    argv: list[str] = []
+    for key, values in query.items():
+        if key in ("name", "wait"):
+            continue
+        if key not in REQUEST_OPTIONS:
+            raise ValueError(f"opcao desconhecida: {key}")
+        if key in FLAG_OPTIONS:
+            if _truthy(values[-1]):
+                argv.append(f"--{key}")
+        else:
+            argv.extend((f"--{key}", values[-1]))
+    return processor_options(build_parser(_RequestParser).parse_args(argv), None)
+
+
+def upload_name(query: dict[str, list[str]], content_type: str | None) -> str:
+    name: str = os.path.basename(query.get("name", [""])[-1])
+    if not name:
+        ext: str | None = CONTENT_TYPE_EXTENSIONS.get((content_type or "").split(";")[0].strip().lower())
+        name = f"upload{ext}" if ext else ""
+    if not name.lower().endswith(ALL_EXTENSIONS) or name.startswith("."):
+        raise ValueError("informe ?name=arquivo.ext ou um Content-Type de imagem/video suportado")
+    return name
+
+
+@dataclass
+class ServerJob:
+    id: str
+    input_path: str
+    options: dict[str, Any]
+    state: str = PENDING
+    output_path: str | None = None
+    error: str | None = None
+    stats: dict[str, Any] = field(default_factory=dict)
+    submitted: float = field(default_factory=time.monotonic)
+    started: float | None = None
+    finished: float | None = None
+    done: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def finished_state(self) -> bool:
+        return self.state in (DONE, FAILED)
+
+    def timing(self) -> dict[str, float | None]:
+        now: float = time.monotonic()
+        started: float = self.started if self.started is not None else now
+        finished: float = self.finished if self.finished is not None else now
+        return {
+            "queued_seconds": round(started - self.submitted, 3),
+            "processing_seconds": round(finished - started, 3) if self.started is not None else None,
+            "total_seconds": round(finished - self.submitted, 3),
+        }
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "state": self.state,
+            "input": os.path.basename(self.input_path),
+            "error": self.error,
+            "timing": self.timing(),
+            "stats": self.stats,
+            "result": f"/jobs/{self.id}/result" if self.state == DONE else None,
+        }
+
+
+class JobManager:
+    # Jobs em memoria, cada um com sua pasta em `work_dir`. `max_queue` limita os jobs pendentes
+    # mais os em andamento; acima disso o POST recebe 429. Dos concluidos, so os `keep_jobs`
+    # mais recentes ficam guardados.
+    def __init__(self, work_dir: str, concurrency: int, max_queue: int, keep_jobs: int = DEFAULT_KEEP_JOBS) -> None:
+        self.work_dir: str = work_dir
+        self.concurrency: int = max(1, concurrency)
+        self.max_queue: int = max(1, max_queue)
+        self.keep_jobs: int = keep_jobs
+        self.jobs: OrderedDict[str, ServerJob] = OrderedDict()
+        self.active: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="fogstripper-server"
+        )
+        os.makedirs(work_dir, exist_ok=True)
+
+    def submit(self, data: bytes, name: str, options: dict[str, Any]) -> ServerJob:
+        with self._lock:
+            if self.active >= self.max_queue:
+                raise QueueFullError(f"fila cheia ({self.active}/{self.max_queue} jobs)")
+            self.active += 1
+        job_id: str = uuid.uuid4().hex
+        job_dir: str = os.path.join(self.work_dir, job_id)
+        try:
+            os.makedirs(job_dir)
+            input_path: str = os.path.join(job_dir, name)
+            with open(input_path, "wb") as f:
+                f.write(data)
+        except OSError:
+            with self._lock:
+                self.active -= 1
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        job = ServerJob(job_id, input_path, {**options, "output_dir": os.path.join(job_dir, "out")})
+        with self._lock:
+            self.jobs[job_id] = job
+            self._prune()
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job: ServerJob) -> None:
+        proc = ImageProcessor(input_path=job.input_path, **job.options)
+        try:
+            # A espera por memoria conta como tempo na fila.
+            with admit(proc):
+                job.started, job.state = time.monotonic(), RUNNING
+                job.output_path = proc.process()
+                job.state = DONE
+        except Exception as e:
+            logger.error(f"Falha ao processar o job {job.id}: {e}", exc_info=True)
+            job.error, job.state = str(e), FAILED
+        finally:
+            job.finished, job.stats = time.monotonic(), proc.stats
+            with self._lock:
+                self.active -= 1
+            job.done.set()
+            logger.info(f"Job {job.id} {job.state} em {job.timing()['total_seconds']}s.")
+
+    def get(self, job_id: str) -> ServerJob | None:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            job: ServerJob | None = self.jobs.get(job_id)
+            if job is None or not job.finished_state:
+                return False
+            del self.jobs[job_id]
+        shutil.rmtree(os.path.dirname(job.input_path), ignore_errors=True)
+        return True
+
+    def _prune(self) -> None:
+        finished: list[ServerJob] = [job for job in self.jobs.values() if job.finished_state]
+        for job in finished[: max(0, len(finished) - self.keep_jobs)]:
+            del self.jobs[job.id]
+            shutil.rmtree(os.path.dirname(job.input_path), ignore_errors=True)
+
+    def health(self) -> dict[str, Any]:
+        with self._lock:
+            return {"active": self.active, "max_queue": self.max_queue, "concurrency": self.concurrency}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class JobHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], manager: JobManager, max_upload_bytes: int) -> None:
+        super().__init__(address, JobRequestHandler)
+        self.manager: JobManager = manager
+        self.max_upload_bytes: int = max_upload_bytes
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    server: JobHTTPServer
+    server_version = "fogstripper-server"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status: HTTPStatus, payload: dict[str, Any], headers: dict[str, str] | None = None) -> None:
+        body: bytes = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: HTTPStatus, message: str, headers: dict[str, str] | None = None) -> None:
+        self._send_json(status, {"error": message}, headers)
+
+    def _send_result(self, job: ServerJob) -> None:
+        path: str = job.output_path or ""
+        if os.path.isdir(path):
+            # Saidas em pasta (sequencias de quadros) vao compactadas.
+            path = shutil.make_archive(path, "zip", path)
+        timing: dict[str, float | None] = job.timing()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
+        self.send_header("X-Job-Id", job.id)
+        self.send_header("X-Queued-Seconds", str(timing["queued_seconds"]))
+        self.send_header("X-Processing-Seconds", str(timing["processing_seconds"]))
+        self.end_headers()
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile)
+
+    def _route(self) -> tuple[list[str], dict[str, list[str]]]:
+        url = urlsplit(self.path)
+        return [part for part in url.path.split("/") if part], parse_qs(url.query, keep_blank_values=True)
+
+    def do_POST(self) -> None:
+        parts, query = self._route()
+        if parts != ["jobs"]:
+            self._send_error(HTTPStatus.NOT_FOUND, "rota nao encontrada")
+            return
+        length: str | None = self.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            self._send_error(HTTPStatus.LENGTH_REQUIRED, "Content-Length obrigatorio")
+            return
+        if int(length) > self.server.max_upload_bytes:
+            # O corpo nao e lido; a conexao fecha logo apos a resposta.
+            self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "arquivo maior que o limite do servidor")
+            return
+        data: bytes = self.rfile.read(int(length))
+        try:
+            name: str = upload_name(query, self.headers.get("Content-Type"))
+        except ValueError as e:
+            self._send_error(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, str(e))
+            return
+        try:
+            options: dict[str, Any] = request_options(query)
+        except ValueError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        format_error: str | None = output_format_error(name, options["output_format"])
+        if format_error:
+            self._send_error(HTTPStatus.BAD_REQUEST, format_error)
+            return
+        try:
+            job: ServerJob = self.server.manager.submit(data, name, options)
+        except QueueFullError as e:
+            self._send_error(HTTPStatus.TOO_MANY_REQUESTS, str(e), {"Retry-After": "1"})
+            return
+
+        if not _truthy(query.get("wait", ["0"])[-1]):
+            self._send_json(HTTPStatus.ACCEPTED, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+            return
+        job.done.wait()
+        if job.state == DONE:
+            self._send_result(job)
+        else:
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, job.to_dict())
+
+    def do_GET(self) -> None:
+        parts, _ = self._route()
+        if parts == ["health"]:
+            self._send_json(HTTPStatus.OK, self.server.manager.health())
+            return
+        job: ServerJob | None = self.server.manager.get(parts[1]) if len(parts) in (2, 3) else None
+        if parts[:1] != ["jobs"] or job is None or parts[2:] not in ([], ["result"]):
+            self._send_error(HTTPStatus.NOT_FOUND, "job nao encontrado")
+        elif parts[2:] == ["result"]:
+            if job.state == DONE:
+                self._send_result(job)
+            else:
+                self._send_json(HTTPStatus.CONFLICT, job.to_dict())
+        else:
+            self._send_json(HTTPStatus.OK, job.to_dict())
+
+    def do_DELETE(self) -> None:
+        parts, _ = self._route()
+        job: ServerJob | None = self.server.manager.get(parts[1]) if len(parts) == 2 else None
+        if parts[:1] != ["jobs"] or job is None:
+            self._send_error(HTTPStatus.NOT_FOUND, "job nao encontrado")
+        elif not self.server.manager.delete(job.id):
+            self._send_json(HTTPStatus.CONFLICT, job.to_dict())
+        else:
+            self.send_response(HTTPStatus.NO_CONTENT)
+            self.end_headers()
+
+
+def build_server_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="fogstripper-server",
+        description="Servidor HTTP local que remove o fundo das imagens enviadas por POST /jobs.",
+    )
+    parser.add_argument("--host", default=get_setting("SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(get_setting("SERVER_PORT", DEFAULT_PORT)))
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=int(get_setting("SERVER_JOBS", default_rembg_workers())),
+        help="Jobs simultaneos.",
+    )
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        default=int(get_setting("SERVER_MAX_QUEUE", DEFAULT_MAX_QUEUE)),
+        help="Jobs pendentes + em andamento antes de responder 429.",
+    )
+    parser.add_argument("--work-dir", default=get_setting("SERVER_WORK_DIR", os.path.join(APP_DIR, "server")))
+    parser.add_argument("--model", default="u2net", help="Modelo carregado no aquecimento dos workers.")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args: argparse.Namespace = build_server_parser().parse_args(argv)
+    setup_logging(stream=sys.stderr)
+    if not _is_loopback(args.host):
+        logger.warning(f"Servidor exposto em {args.host}: nao ha autenticacao, use apenas em rede confiavel.")
+
+    keep_workers_warm()
+    warm_up_workers(args.model, max(1, args.jobs))
+    manager = JobManager(os.path.expanduser(args.work_dir), args.jobs, args.max_queue)
+    max_upload: int = int(float(get_setting("SERVER_MAX_UPLOAD_MB", DEFAULT_MAX_UPLOAD_MB)) * 1024**2)
+    server = JobHTTPServer((args.host, args.port), manager, max_upload)
+    # shutdown() espera o serve_forever terminar, entao nao pode rodar na thread que o executa.
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    logger.info(f"fogstripper-server ouvindo em http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        manager.close()
+        shutdown_workers()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,7 @@ import shutil
 import tempfile
 from collections.abc import Generator
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 from PIL import Image
@@ -47,3 +48,10 @@ def change_to_temp_dir(temp_dir: Path) -> Generator[None, None, None]:
     original_dir: str = os.getcwd()
     yield
     os.chdir(original_dir)
+
+
+@pytest.fixture(autouse=True)
+def no_stage_cache() -> Generator[None, None, None]:
+    # O cache de estagios fica em ~/.local/share; nos testes ele so e ligado explicitamente.
+    with patch("src.core.stage_cache.get_setting", return_value=0):
+        yield
@@ -0,0 +1,160 @@
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from src.core import admission
+from src.core.admission import admit, estimate_job_memory, media_dimensions, memory_budget_bytes, try_admit
+from src.core.processor import ImageProcessor
+from src.utils.memory import MemoryBudget, RssSampler, estimate_peak_bytes, process_tree_rss_bytes
+
+
+def make_processor(path: Path, upscale: int = 0, tile: int = 640) -> ImageProcessor:
+    return ImageProcessor(
+        input_path=str(path),
+        model_name="u2netp",
+        output_format="png",
+        potencia=75,
+        tile_size=tile,
+        post_processing_opts={"upscale_factor": upscale},
+    )
+
+
+@pytest.fixture
+def budget() -> Iterator[MemoryBudget]:
+    budget = MemoryBudget(100)
+    with patch.object(admission, "get_memory_budget", return_value=budget):
+        yield budget
+
+
+class TestEstimatePeakBytes:
+    def test_grows_with_upscale_and_tile(self) -> None:
+        plain = estimate_peak_bytes(6000, 4000)
+        upscaled = estimate_peak_bytes(6000, 4000, upscale_factor=4, tile_size=256)
+        big_tile = estimate_peak_bytes(6000, 4000, upscale_factor=4, tile_size=1024)
+        assert plain < upscaled < big_tile
+        # 24 MP a 4x passa de varios GB: o caso que derrubava a maquina.
+        assert upscaled > 8 * 1024**3
+
+    def test_parallel_upscale_processes_cost_more(self) -> None:
+        one = estimate_peak_bytes(2000, 1500, 4, tile_size=256)
+        four = estimate_peak_bytes(2000, 1500, 4, tile_size=256, upscale_processes=4)
+        assert four - one >= 3 * 700 * 1024**2
+
+    def test_tile_zero_uses_whole_image(self) -> None:
+        assert estimate_peak_bytes(800, 600, 2, tile_size=0) == estimate_peak_bytes(800, 600, 2, tile_size=800)
+
+    def test_frames_are_capped_by_streaming_window(self) -> None:
+        one = estimate_peak_bytes(640, 480)
+        assert estimate_peak_bytes(640, 480, frames=4) == 4 * one
+        assert estimate_peak_bytes(640, 480, frames=10_000) == estimate_peak_bytes(640, 480, frames=16)
+
+
+class TestMemoryBudget:
+    def test_admits_only_what_fits(self) -> None:
+        budget = MemoryBudget(100)
+        assert budget.try_reserve(60)
+        assert not budget.try_reserve(50)
+        budget.release(60)
+        assert budget.try_reserve(50)
+
+    def test_oversized_job_runs_alone(self) -> None:
+        budget = MemoryBudget(100)
+        assert budget.try_reserve(500)
+        assert not budget.try_reserve(1)
+
+    def test_reserve_waits_for_release(self) -> None:
+        budget = MemoryBudget(100)
+        budget.try_reserve(80)
+        admitted = threading.Event()
+        waiter = threading.Thread(target=lambda: (budget.reserve(50), admitted.set()))
+        waiter.start()
+        assert not admitted.wait(0.1)
+        budget.release(80)
+        assert admitted.wait(5)
+        waiter.join()
+        assert budget.used_bytes == 50
+
+
+class TestAdmission:
+    def test_media_dimensions(self, temp_dir: Path) -> None:
+        path = temp_dir / "a.png"
+        Image.new("RGB", (64, 32)).save(path)
+        frames = [Image.new("RGB", (20, 10), (i * 40, 0, 0)) for i in range(3)]
+        frames[0].save(temp_dir / "b.gif", save_all=True, append_images=frames[1:])
+        assert media_dimensions(str(path)) == (64, 32, 1)
+        assert media_dimensions(str(temp_dir / "b.gif")) == (20, 10, 3)
+
+    def test_estimate_uses_processor_options(self, temp_dir: Path) -> None:
+        path = temp_dir / "a.png"
+        Image.new("RGB", (400, 300)).save(path)
+        assert estimate_job_memory(make_processor(path, upscale=4)) > estimate_job_memory(make_processor(path))
+
+    def test_unreadable_input_gets_minimum_estimate(self, temp_dir: Path) -> None:
+        assert estimate_job_memory(make_processor(temp_dir / "missing.png")) > 0
+
+    def test_try_admit_and_release(self, temp_dir: Path, budget: MemoryBudget) -> None:
+        proc = make_processor(temp_dir / "a.png")
+        first = try_admit(proc, estimate=70)
+        assert first is not None
+        assert try_admit(proc, estimate=70) is None
+        first.release()
+        first.release()
+        assert budget.used_bytes == 0
+
+    def test_admit_logs_estimate_and_peak(self, temp_dir: Path, budget: MemoryBudget) -> None:
+        with (
+            patch.object(admission, "estimate_job_memory", return_value=40),
+            patch.object(admission.logger, "info") as info,
+        ):
+            with admit(make_processor(temp_dir / "a.png")):
+                assert budget.used_bytes == 40
+        assert budget.used_bytes == 0
+        assert "estimativa" in info.call_args.args[0] and "crescimento do RSS" in info.call_args.args[0]
+
+    @pytest.mark.parametrize(("setting", "expected"), [("512", 512 * 1024**2), ("0", None)])
+    def test_budget_setting(self, setting: str, expected: int | None) -> None:
+        with patch.object(admission, "get_setting", return_value=setting):
+            assert memory_budget_bytes() == expected
+
+    def test_auto_budget_uses_available_memory(self) -> None:
+        with (
+            patch.object(admission, "get_setting", return_value="auto"),
+            patch.object(admission, "available_memory_bytes", return_value=10 * 1024**3),
+        ):
+            assert memory_budget_bytes() == int(10 * 1024**3 * admission.AUTO_BUDGET_FRACTION)
+
+
+class TestRssSampling:
+    def test_process_tree_rss_is_positive(self) -> None:
+        rss = process_tree_rss_bytes()
+        assert rss is None or rss > 0
+
+    def test_window_measures_growth_over_baseline(self) -> None:
+        sampler = RssSampler(interval=0.01)
+        window = sampler.open()
+        if window is None:
+            pytest.skip("/proc indisponivel")
+        block = b"x" * (64 * 1024**2)
+        time.sleep(0.05)
+        growth = sampler.close(window)
+        del block
+        assert growth is not None and 48 * 1024**2 <= growth < window.peak_bytes
+
+    def test_windows_share_one_thread(self) -> None:
+        sampler = RssSampler(interval=0.01)
+        windows = [sampler.open()]
+        if windows[0] is None:
+            pytest.skip("/proc indisponivel")
+        thread = sampler._thread
+        windows += [sampler.open(), sampler.open()]
+        assert thread is not None and thread.is_alive() and sampler._thread is thread
+        assert all(window.concurrent == 3 for window in windows)
+        for window in windows:
+            sampler.close(window)
+        time.sleep(0.05)
+        assert sampler._thread is None
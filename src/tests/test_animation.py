@@ -0,0 +1,397 @@
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import cv2
+import imageio.v2 as imageio
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.core.animation import (
+    MAX_AUTO_BATCH,
+    FlowKeyframeGate,
+    FrameDirectorySink,
+    FrameSimilarityGate,
+    FrameSource,
+    PillowAnimationSink,
+    group_frames_by_flow,
+    group_similar_frames,
+    iter_processed_frames,
+    open_frame_sink,
+    propagate_alpha,
+    resolve_batch_size,
+)
+from src.core.process_thread import ProcessThread
+
+PROJECT_ROOT: str = str(Path(__file__).parent.parent.parent)
+
+
+def make_clip(path: Path, num_frames: int, size: int = 64) -> Path:
+    writer = imageio.get_writer(str(path), duration=40, loop=0)
+    for i in range(num_frames):
+        frame = np.zeros((size, size, 3), dtype=np.uint8)
+        x = (i * 3) % (size - 16)
+        frame[16:32, x : x + 16] = (255, 0, 0)
+        writer.append_data(frame)
+    writer.close()
+    return path
+
+
+def textured_frames(num_frames: int, step: int = 2, size: int = 96, cut_at: int | None = None) -> list[np.ndarray]:
+    rng = np.random.default_rng(0)
+    scenes = [cv2.GaussianBlur(rng.integers(0, 255, (size, size, 3), dtype=np.uint8), (0, 0), 2) for _ in range(2)]
+    scenes = [cv2.normalize(scene, None, 0, 255, cv2.NORM_MINMAX) for scene in scenes]
+    frames: list[np.ndarray] = []
+    for i in range(num_frames):
+        scene = scenes[1 if cut_at is not None and i >= cut_at else 0]
+        frames.append(np.roll(scene, i * step, axis=1))
+    return frames
+
+
+def fake_rembg(input_path: str, output_path: str) -> bool:
+    shutil.copy(input_path, output_path)
+    return True
+
+
+class TestFrameSource:
+    def test_reads_metadata_and_frames(self, temp_dir: Path) -> None:
+        clip: Path = make_clip(temp_dir / "clip.gif", 5)
+        with FrameSource(str(clip)) as source:
+            assert source.fps == pytest.approx(25)
+            assert source.frame_count == 5
+            frames = list(source)
+        assert len(frames) == 5
+        assert frames[0].shape[:2] == (64, 64)
+
+
+class TestFrameSinks:
+    def test_directory_sink_writes_one_file_per_frame(self, temp_dir: Path) -> None:
+        sink = FrameDirectorySink(str(temp_dir / "out"), ".png", str(temp_dir))
+        for _ in range(3):
+            sink.append(np.zeros((8, 8, 4), dtype=np.uint8))
+        output_dir: str = sink.close()
+        assert sorted(p.name for p in Path(output_dir).iterdir()) == [
+            "frame_0000.png",
+            "frame_0001.png",
+            "frame_0002.png",
+        ]
+
+    def test_pillow_sink_encodes_all_frames(self, temp_dir: Path) -> None:
+        output: Path = temp_dir / "out.gif"
+        sink = PillowAnimationSink(str(output), 10, str(temp_dir / "spill"))
+        for i in range(4):
+            sink.append(np.full((8, 8, 4), i * 60, dtype=np.uint8))
+        sink.close()
+
+        with Image.open(output) as img:
+            assert img.n_frames == 4
+        assert not (temp_dir / "spill").exists()
+
+    def test_pillow_sink_without_frames(self, temp_dir: Path) -> None:
+        sink = PillowAnimationSink(str(temp_dir / "out.gif"), 10, str(temp_dir / "spill"))
+        with pytest.raises(RuntimeError):
+            sink.close()
+
+    @pytest.mark.parametrize(
+        "fmt,expected",
+        [(".png", FrameDirectorySink), (".svg", FrameDirectorySink), (".gif", PillowAnimationSink)],
+    )
+    def test_open_frame_sink(self, fmt: str, expected: type, temp_dir: Path) -> None:
+        sink = open_frame_sink(fmt, str(temp_dir / f"clip{fmt}"), 10, str(temp_dir))
+        assert isinstance(sink, expected)
+
+
+class TestIterProcessedFrames:
+    @staticmethod
+    def _slow_when_even(start: int, frames: list[np.ndarray]) -> list[np.ndarray]:
+        time.sleep(0.02 if start % 2 == 0 else 0)
+        return [frame + 1 for frame in frames]
+
+    @pytest.mark.parametrize("workers,batch_size", [(1, 1), (4, 1), (1, 3), (3, 5)])
+    def test_preserves_order(self, workers: int, batch_size: int) -> None:
+        frames = (np.full((2, 2), i, dtype=np.uint8) for i in range(12))
+        results = list(iter_processed_frames(frames, self._slow_when_even, workers, batch_size=batch_size))
+        assert [int(r[0, 0]) for r in results] == list(range(1, 13))
+
+    def test_batches_are_contiguous(self) -> None:
+        calls: list[tuple[int, int]] = []
+
+        def record(start: int, frames: list[np.ndarray]) -> list[np.ndarray]:
+            calls.append((start, len(frames)))
+            return frames
+
+        list(iter_processed_frames([np.zeros((2, 2), dtype=np.uint8)] * 10, record, batch_size=4))
+        assert calls == [(0, 4), (4, 4), (8, 2)]
+
+    def test_progress_counts_every_frame(self) -> None:
+        seen: list[int] = []
+        frames = [np.zeros((2, 2), dtype=np.uint8)] * 5
+        list(iter_processed_frames(frames, self._slow_when_even, 3, seen.append, batch_size=2))
+        assert sorted(seen)[-1] == 5
+        assert len(seen) == 3
+
+    def test_bounded_window(self) -> None:
+        consumed: list[int] = []
+
+        def frames():
+            for i in range(50):
+                consumed.append(i)
+                yield np.zeros((2, 2), dtype=np.uint8)
+
+        iterator = iter_processed_frames(frames(), lambda start, batch: batch, 2, max_pending=4)
+        next(iterator)
+        assert len(consumed) <= 6
+        iterator.close()
+
+    def test_error_propagates(self) -> None:
+        def fail_on_three(start: int, frames: list[np.ndarray]) -> list[np.ndarray]:
+            if start == 3:
+                raise RuntimeError("quadro 3")
+            return frames
+
+        with pytest.raises(RuntimeError, match="quadro 3"):
+            list(iter_processed_frames([np.zeros((2, 2), dtype=np.uint8)] * 8, fail_on_three, 4))
+
+
+class TestFrameSimilarity:
+    @staticmethod
+    def _frames(values: list[int]) -> list[np.ndarray]:
+        return [np.full((64, 64, 3), v, dtype=np.uint8) for v in values]
+
+    def test_groups_near_duplicates(self) -> None:
+        gate = FrameSimilarityGate(tolerance=3)
+        groups = list(group_similar_frames(self._frames([10, 11, 12, 80, 80, 10]), gate))
+        assert [(g.index, len(g.frames)) for g in groups] == [(0, 3), (3, 2), (5, 1)]
+        assert (gate.inferred, gate.skipped) == (3, 3)
+
+    def test_compares_against_keyframe(self) -> None:
+        # Variacoes pequenas acumuladas nao podem se arrastar indefinidamente.
+        gate = FrameSimilarityGate(tolerance=3)
+        groups = list(group_similar_frames(self._frames([10, 12, 14, 16]), gate))
+        assert [len(g.frames) for g in groups] == [2, 2]
+
+    def test_small_moving_object_breaks_group(self) -> None:
+        first, second = self._frames([0, 0])
+        second[8:12, 8:12] = 255
+        groups = list(group_similar_frames([first, second], FrameSimilarityGate(tolerance=3)))
+        assert len(groups) == 2
+
+    def test_small_subject_in_large_frame_breaks_group(self) -> None:
+        # Em 1280x720, uma miniatura fixa de 32x32 teria celulas de 40x22 px: um objeto de 3x3 que
+        # anda 10 px continua na mesma celula e o quadro reaproveitaria a mascara antiga.
+        first = np.zeros((720, 1280, 3), dtype=np.uint8)
+        second = first.copy()
+        first[300:303, 600:603] = 255
+        second[300:303, 610:613] = 255
+        assert FrameSimilarityGate(tolerance=3).thumbnail_size(first[:, :, 0]) == (160, 90)
+        assert len(list(group_similar_frames([first, second], FrameSimilarityGate(tolerance=3)))) == 2
+
+    def test_group_size_is_capped(self) -> None:
+        gate = FrameSimilarityGate(tolerance=3)
+        groups = list(group_similar_frames(self._frames([5] * 10), gate, max_group=4))
+        assert [len(g.frames) for g in groups] == [4, 4, 2]
+        assert gate.inferred == 3
+
+    def test_disabled_gate(self) -> None:
+        groups = list(group_similar_frames(self._frames([5] * 3), None))
+        assert [len(g.frames) for g in groups] == [1, 1, 1]
+
+
+class TestFlowPropagation:
+    def test_propagates_mask_along_motion(self) -> None:
+        frames = textured_frames(2, step=4)
+        gate = FlowKeyframeGate(interval=4, max_error=8)
+        groups = list(group_frames_by_flow(frames, gate))
+        assert len(groups) == 1 and len(groups[0].flows) == 1
+
+        alpha = np.zeros((96, 96), dtype=np.uint8)
+        alpha[32:64, 32:64] = 255
+        moved = propagate_alpha(alpha, groups[0].flows[0])
+        columns = np.where(moved[48] > 127)[0]
+        assert abs(columns[0] - 36) <= 1 and abs(columns[-1] - 67) <= 1
+
+    def test_interval_limits_group(self) -> None:
+        gate = FlowKeyframeGate(interval=3, max_error=8)
+        groups = list(group_frames_by_flow(textured_frames(7), gate))
+        assert [len(g.frames) for g in groups] == [3, 3, 1]
+        assert (gate.inferred, gate.propagated, gate.rekeyed) == (3, 4, 0)
+
+    def test_scene_change_rekeys(self) -> None:
+        gate = FlowKeyframeGate(interval=8, max_error=8)
+        groups = list(group_frames_by_flow(textured_frames(6, cut_at=3), gate))
+        assert [g.index for g in groups] == [0, 3]
+        assert gate.rekeyed == 1
+
+    def test_flow_is_computed_at_reduced_scale(self) -> None:
+        gate = FlowKeyframeGate(interval=2, max_error=255)
+        frames = [np.zeros((240, 640, 3), dtype=np.uint8)] * 2
+        groups = list(group_frames_by_flow(frames, gate))
+        assert groups[0].flows[0].shape == (120, FlowKeyframeGate.FLOW_WIDTH, 2)
+        assert propagate_alpha(np.zeros((240, 640), dtype=np.uint8), groups[0].flows[0]).shape == (240, 640)
+
+
+class TestResolveBatchSize:
+    def test_explicit_value(self) -> None:
+        assert resolve_batch_size(4, "u2net", 2) == 4
+        assert resolve_batch_size("0", "u2net", 2) == 1
+
+    def test_auto_scales_with_memory(self) -> None:
+        with patch("src.core.animation.available_memory_bytes", return_value=8 * 1024**3):
+            small_model = resolve_batch_size("auto", "u2netp", 1)
+            large_model = resolve_batch_size("auto", "isnet-general-use", 1)
+        assert small_model == MAX_AUTO_BATCH
+        assert large_model == 2
+
+    def test_auto_is_one_when_memory_is_short_or_unknown(self) -> None:
+        with patch("src.core.animation.available_memory_bytes", return_value=256 * 1024**2):
+            assert resolve_batch_size("auto", "u2net", 4) == 1
+        with patch("src.core.animation.available_memory_bytes", return_value=None):
+            assert resolve_batch_size("auto", "u2net", 1) == 1
+
+    def test_auto_unknown_model(self) -> None:
+        assert resolve_batch_size("auto", "sam", 1) == 1
+
+
+class TestProcessAnimation:
+    def test_gif_round_trip(self, temp_dir: Path) -> None:
+        clip: Path = make_clip(temp_dir / "clip.gif", 6)
+        proc = ProcessThread(str(clip), "u2net", ".gif", 75, 512, {})
+        output: str = str(temp_dir / "result.gif")
+
+        with patch.object(proc, "_run_rembg", side_effect=fake_rembg):
+            result: str = proc._process_animation(str(clip), output)
+        proc.cleanup()
+
+        with Image.open(result) as img:
+            assert img.n_frames == 6
+
+    def test_temporary_frames_are_removed(self, temp_dir: Path) -> None:
+        clip: Path = make_clip(temp_dir / "clip.gif", 4)
+        proc = ProcessThread(str(clip), "u2net", ".png", 75, 512, {})
+
+        with patch.object(proc, "_run_rembg", side_effect=fake_rembg):
+            proc._process_animation(str(clip), str(temp_dir / "result.png"))
+
+        assert list(Path(proc.temp_dir).iterdir()) == []
+        proc.cleanup()
+
+    def test_static_frames_reuse_mask(self, temp_dir: Path) -> None:
+        clip: Path = temp_dir / "static.gif"
+        writer = imageio.get_writer(str(clip), duration=40, loop=0)
+        for i in range(6):
+            # Ruido de um nivel por quadro: o Pillow funde quadros exatamente iguais no GIF.
+            frame = np.full((64, 64, 3), i % 2, dtype=np.uint8)
+            frame[16:32, 16:32] = (255, 0, 0) if i < 4 else (0, 0, 255)
+            writer.append_data(frame)
+        writer.close()
+        proc = ProcessThread(str(clip), "u2net", ".gif", 75, 512, {})
+
+        with (
+            patch(
+                "src.core.processor.get_setting",
+                side_effect=lambda key, default=None: 3 if key == "FRAME_SIMILARITY_TOLERANCE" else default,
+            ),
+            patch.object(proc, "_run_rembg", side_effect=fake_rembg) as rembg,
+        ):
+            result: str = proc._process_animation(str(clip), str(temp_dir / "result.gif"))
+        proc.cleanup()
+
+        assert rembg.call_count == 2
+        assert proc.stats == {"frames_inferred": 2, "frames_skipped": 4}
+        with Image.open(result) as img:
+            assert img.n_frames == 6
+
+    def test_similarity_gate_is_off_by_default(self, temp_dir: Path) -> None:
+        clip: Path = make_clip(temp_dir / "clip.gif", 4)
+        proc = ProcessThread(str(clip), "u2net", ".png", 75, 512, {})
+
+        with patch.object(proc, "_run_rembg", side_effect=fake_rembg) as rembg:
+            proc._process_animation(str(clip), str(temp_dir / "result.png"))
+        proc.cleanup()
+
+        assert rembg.call_count == 4
+        assert proc.stats == {}
+
+    def test_keyframe_interval_uses_optical_flow(self, temp_dir: Path) -> None:
+        clip: Path = temp_dir / "pan.gif"
+        writer = imageio.get_writer(str(clip), duration=40, loop=0)
+        for frame in textured_frames(8):
+            writer.append_data(frame)
+        writer.close()
+        proc = ProcessThread(str(clip), "u2net", ".gif", 75, 512, {})
+        settings = {"KEYFRAME_INTERVAL": 4, "FLOW_REKEY_ERROR": 255}
+
+        with (
+            patch("src.core.processor.get_setting", side_effect=lambda key, default=None: settings.get(key, default)),
+            patch.object(proc, "_run_rembg", side_effect=fake_rembg) as rembg,
+        ):
+            result: str = proc._process_animation(str(clip), str(temp_dir / "result.gif"))
+        proc.cleanup()
+
+        assert rembg.call_count == 2
+        assert proc.stats == {"frames_inferred": 2, "frames_propagated": 6, "rekeyed": 0}
+        with Image.open(result) as img:
+            assert img.n_frames == 8
+
+
+# O pico e zerado apos os imports (clear_refs = 5) para medir apenas o processamento.
+PEAK_RSS_SCRIPT: str = """
+import shutil
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, sys.argv[1])
+from src.core.process_thread import ProcessThread
+
+
+def fake_rembg(self, input_path, output_path):
+    shutil.copy(input_path, output_path)
+    return True
+
+
+def vm_hwm_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+
+
+clip, output = sys.argv[2], sys.argv[3]
+proc = ProcessThread(clip, "u2net", ".png", 75, 512, {})
+with open("/proc/self/clear_refs", "w") as f:
+    f.write("5")
+with patch.object(ProcessThread, "_run_rembg", fake_rembg):
+    proc._process_animation(clip, output)
+proc.cleanup()
+print(vm_hwm_kb())
+"""
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(not os.path.exists("/proc/self/clear_refs"), reason="Requer /proc do Linux")
+class TestStreamingPeakRss:
+    def _peak_rss_kb(self, clip: Path, temp_dir: Path) -> int:
+        result = subprocess.run(
+            [sys.executable, "-c", PEAK_RSS_SCRIPT, PROJECT_ROOT, str(clip), str(temp_dir / f"{clip.stem}_out.png")],
+            capture_output=True,
+            text=True,
+            timeout=300,
+        )
+        assert result.returncode == 0, result.stderr
+        return int(result.stdout.strip().splitlines()[-1])
+
+    def test_peak_rss_independent_of_clip_length(self, temp_dir: Path) -> None:
+        # Mantidos em memoria, 400 quadros 256x256 somam cerca de 170 MB a mais que 20 quadros
+        # (quadro RGB + canvas RGBA + copia NumPy por quadro).
+        short_clip: Path = make_clip(temp_dir / "short.gif", 20, size=256)
+        long_clip: Path = make_clip(temp_dir / "long.gif", 400, size=256)
+
+        short_rss: int = self._peak_rss_kb(short_clip, temp_dir)
+        long_rss: int = self._peak_rss_kb(long_clip, temp_dir)
+
+        assert long_rss - short_rss < 16 * 1024
@@ -0,0 +1,150 @@
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from src.cli import build_parser, collect_inputs, main, process_file, processor_options
+from src.core.job_queue import JobQueue
+from src.core.processor import ImageProcessor
+
+PROJECT_ROOT: Path = Path(__file__).resolve().parents[2]
+
+
+def fake_rembg(input_path: str, output_path: str) -> bool:
+    if "bad" in input_path:
+        return False
+    Image.open(input_path).convert("RGBA").save(output_path)
+    return True
+
+
+def make_images(folder: Path, names: list[str]) -> list[Path]:
+    paths: list[Path] = []
+    for i, name in enumerate(names):
+        path = folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Image.new("RGB", (16, 16), (255, i * 20, 0)).save(path)
+        paths.append(path)
+    return paths
+
+
+def run_cli(argv: list[str], capsys: pytest.CaptureFixture[str], queue: Path) -> tuple[int, dict]:
+    with (
+        patch.dict("src.core.processor.PATHS", {"REMBG_PYTHON": "python"}, clear=True),
+        patch.object(ImageProcessor, "_run_rembg", side_effect=fake_rembg),
+        patch("src.cli.setup_logging"),
+    ):
+        code: int = main([*argv, "--queue", str(queue)])
+    return code, json.loads(capsys.readouterr().out)
+
+
+class TestCollectInputs:
+    def test_directories_are_recursive_and_filtered(self, temp_dir: Path) -> None:
+        make_images(temp_dir, ["a.png", "sub/b.jpg"])
+        (temp_dir / "notes.txt").write_text("x")
+        found = collect_inputs([str(temp_dir)], str(temp_dir / "out"))
+        assert found == [
+            (str(temp_dir / "a.png"), str(temp_dir / "out")),
+            (str(temp_dir / "sub" / "b.jpg"), str(temp_dir / "out" / "sub")),
+        ]
+
+    def test_globs_and_duplicates(self, temp_dir: Path) -> None:
+        a, b = make_images(temp_dir, ["a.png", "b.png"])
+        found = collect_inputs([str(temp_dir / "*.png"), str(a)])
+        assert [path for path, _ in found] == [str(a), str(b)]
+
+
+class TestCliMain:
+    def test_writes_to_output_dir_without_touching_inputs(
+        self, temp_dir: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        inputs = make_images(temp_dir / "in", ["a.jpg", "b.jpg", "c.jpg"])
+        out: Path = temp_dir / "out"
+
+        code, summary = run_cli(
+            [str(temp_dir / "in"), "-o", str(out), "--jobs", "2", "--trim"], capsys, temp_dir / "jobs.sqlite3"
+        )
+
+        assert code == 0
+        assert summary["succeeded"] == 3 and summary["failed"] == 0
+        assert all(path.exists() for path in inputs)
+        assert sorted(p.name for p in out.iterdir()) == ["a.png", "b.png", "c.png"]
+        assert all(f["seconds"] >= 0 and f["output"].startswith(str(out)) for f in summary["files"])
+
+    def test_failure_sets_exit_code(self, temp_dir: Path, capsys: pytest.CaptureFixture[str]) -> None:
+        inputs = make_images(temp_dir, ["ok.jpg", "bad.jpg"])
+
+        code, summary = run_cli([str(p) for p in inputs], capsys, temp_dir / "jobs.sqlite3")
+
+        assert code == 1
+        by_name = {Path(f["input"]).name: f for f in summary["files"]}
+        assert by_name["ok.jpg"]["status"] == "ok"
+        assert by_name["bad.jpg"]["status"] == "error"
+        # Sem --output-dir, a entrada com falha volta do backup.
+        assert inputs[1].exists()
+
+    def test_webm_is_rejected_for_still_images(self, temp_dir: Path, capsys: pytest.CaptureFixture[str]) -> None:
+        inputs = make_images(temp_dir, ["a.jpg"])
+
+        code, summary = run_cli([str(inputs[0]), "-f", "webm"], capsys, temp_dir / "jobs.sqlite3")
+
+        assert code == 1
+        [result] = summary["files"]
+        assert result["status"] == "error" and "so vale para animacoes" in result["error"]
+        # Rejeitado antes de processar: a entrada nem chega a ir para o backup.
+        assert inputs[0].exists() and not (temp_dir / "a.bak.jpg").exists()
+
+    def test_rerun_skips_completed_files(self, temp_dir: Path, capsys: pytest.CaptureFixture[str]) -> None:
+        make_images(temp_dir / "in", ["a.jpg", "b.jpg"])
+        argv = [str(temp_dir / "in"), "-o", str(temp_dir / "out")]
+        queue: Path = temp_dir / "jobs.sqlite3"
+        run_cli(argv, capsys, queue)
+        (temp_dir / "out" / "b.png").unlink()
+
+        code, summary = run_cli(argv, capsys, queue)
+
+        assert code == 0
+        assert summary["skipped"] == 1 and summary["succeeded"] == 1
+        assert (temp_dir / "out" / "b.png").exists()
+
+    def test_resume_runs_unfinished_jobs(self, temp_dir: Path, capsys: pytest.CaptureFixture[str]) -> None:
+        inputs = make_images(temp_dir, ["a.jpg"])
+        queue = JobQueue(str(temp_dir / "jobs.sqlite3"))
+        job = queue.enqueue([str(inputs[0])], processor_options(build_parser().parse_args(["x"]), None))[0]
+        queue.mark_running(job.id)
+        queue.close()
+
+        code, summary = run_cli(["--resume"], capsys, temp_dir / "jobs.sqlite3")
+
+        assert code == 0
+        assert summary["files"][0]["input"] == str(inputs[0])
+        assert (temp_dir / "a.png").exists()
+
+    def test_duplicate_content_is_processed_once(self, temp_dir: Path, capsys: pytest.CaptureFixture[str]) -> None:
+        a, b = make_images(temp_dir / "in", ["a.jpg", "b.jpg"])
+        shutil.copy(a, temp_dir / "in" / "a_copia.jpg")
+
+        with patch("src.cli.process_file", wraps=process_file) as processed:
+            code, summary = run_cli(
+                [str(temp_dir / "in"), "-o", str(temp_dir / "out")], capsys, temp_dir / "jobs.sqlite3"
+            )
+
+        assert code == 0
+        assert processed.call_count == 2
+        assert summary["duplicates"] == 1
+        copy = next(f for f in summary["files"] if f["status"] == "duplicate")
+        assert copy["duplicate_of"] == str(a)
+        assert (temp_dir / "out" / "a_copia.png").read_bytes() == (temp_dir / "out" / "a.png").read_bytes()
+
+
+class TestHeadlessImport:
+    def test_cli_does_not_import_qt(self) -> None:
+        code = "import sys, src.cli; print('PyQt6' in sys.modules)"
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        )
+        assert result.stdout.strip() == "False"
@@ -0,0 +1,57 @@
+import os
+from pathlib import Path
+
+from src.core.dedup import find_duplicates, materialize_duplicate
+
+
+def write(path: Path, data: bytes) -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+class TestFindDuplicates:
+    def test_groups_by_content_keeping_first(self, temp_dir: Path) -> None:
+        a = write(temp_dir / "a.png", b"conteudo-1")
+        b = write(temp_dir / "b.png", b"conteudo-2")
+        c = write(temp_dir / "sub" / "c.png", b"conteudo-1")
+        d = write(temp_dir / "d.png", b"conteudo-1")
+        assert find_duplicates([a, b, c, d], workers=2) == {a: [c, d]}
+
+    def test_same_size_different_content(self, temp_dir: Path) -> None:
+        paths = [write(temp_dir / f"{i}.png", bytes([i]) * 64) for i in range(3)]
+        assert find_duplicates(paths) == {}
+
+    def test_missing_file_is_ignored(self, temp_dir: Path) -> None:
+        a = write(temp_dir / "a.png", b"x")
+        assert find_duplicates([a, str(temp_dir / "sumiu.png")]) == {}
+
+
+class TestMaterializeDuplicate:
+    def test_in_place_backs_up_and_links(self, temp_dir: Path) -> None:
+        output = write(temp_dir / "a.png", b"saida")
+        copy = write(temp_dir / "copia.jpg", b"entrada")
+
+        target = materialize_duplicate(output, copy)
+
+        assert target == str(temp_dir / "copia.png")
+        assert Path(target).read_bytes() == b"saida"
+        assert (temp_dir / "copia.bak.jpg").exists() and not Path(copy).exists()
+
+    def test_output_dir_keeps_input(self, temp_dir: Path) -> None:
+        output = write(temp_dir / "out" / "a.webp", b"saida")
+        copy = write(temp_dir / "in" / "copia.jpg", b"entrada")
+
+        target = materialize_duplicate(output, copy, str(temp_dir / "out"))
+
+        assert target == str(temp_dir / "out" / "copia.webp")
+        assert Path(copy).exists()
+
+    def test_frame_directory_output(self, temp_dir: Path) -> None:
+        write(temp_dir / "out" / "clip" / "frame_0000.png", b"q0")
+        write(temp_dir / "out" / "clip" / "frame_0001.png", b"q1")
+        copy = write(temp_dir / "in" / "outro.gif", b"entrada")
+
+        target = materialize_duplicate(str(temp_dir / "out" / "clip"), copy, str(temp_dir / "out"))
+
+        assert sorted(os.listdir(target)) == ["frame_0000.png", "frame_0001.png"]
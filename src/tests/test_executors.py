@@ -0,0 +1,82 @@
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from src.core.executors import InProcessExecutor, SubprocessExecutor, get_stage_executor
+from src.core.process_thread import ProcessThread
+
+WORKERS_DIR: Path = Path(__file__).parent.parent / "workers"
+
+
+@pytest.fixture
+def foreground(sample_image_with_transparency: Path) -> Image.Image:
+    with Image.open(sample_image_with_transparency) as img:
+        return img.convert("RGBA")
+
+
+@pytest.fixture
+def worker_paths() -> dict[str, str]:
+    return {
+        "PYTHON_REMBG": sys.executable,
+        "EFFECTS_SCRIPT": str(WORKERS_DIR / "worker_effects.py"),
+        "BACKGROUND_SCRIPT": str(WORKERS_DIR / "worker_background.py"),
+    }
+
+
+class TestInProcessExecutor:
+    def test_effects_enlarges_canvas(self, foreground: Image.Image) -> None:
+        result: Image.Image = InProcessExecutor().run("effects", foreground, {"blur_radius": 5, "opacity": 128})
+        assert result.size == (100 + 10 + 10, 100 + 10 + 10)
+
+    def test_background_ignores_none_params(self, foreground: Image.Image) -> None:
+        params = {"bg_type": "color", "bg_data": "#00FF00", "resize_mode": None}
+        result: Image.Image = InProcessExecutor().run("background", foreground, params)
+        assert result.getpixel((0, 0)) == (0, 255, 0, 255)
+        assert result.getpixel((50, 50)) == (255, 0, 0, 255)
+
+
+class TestSubprocessExecutor:
+    @pytest.mark.parametrize(
+        "stage,params",
+        [
+            ("effects", {"blur_radius": 5, "opacity": 128}),
+            ("background", {"bg_type": "color", "bg_data": "#00FF00", "resize_mode": None}),
+        ],
+    )
+    def test_matches_inprocess(
+        self,
+        stage: str,
+        params: dict,
+        foreground: Image.Image,
+        worker_paths: dict[str, str],
+        sample_image: Path,
+        temp_dir: Path,
+    ) -> None:
+        runner = ProcessThread(str(sample_image), "u2net", ".png", 75, 512, {})
+        with patch.dict("src.core.executors.PATHS", worker_paths):
+            remote: Image.Image = SubprocessExecutor(runner.run_command, str(temp_dir)).run(stage, foreground, params)
+        runner.cleanup()
+        local: Image.Image = InProcessExecutor().run(stage, foreground, params)
+
+        assert remote.size == local.size
+        assert remote.tobytes() == local.tobytes()
+
+    def test_failure_raises(self, foreground: Image.Image, sample_image: Path, temp_dir: Path) -> None:
+        runner = ProcessThread(str(sample_image), "u2net", ".png", 75, 512, {})
+        with patch.object(runner, "run_command", return_value=False):
+            with pytest.raises(RuntimeError):
+                SubprocessExecutor(runner.run_command, str(temp_dir)).run("effects", foreground, {})
+        runner.cleanup()
+
+
+class TestGetStageExecutor:
+    @pytest.mark.parametrize(
+        "setting,expected",
+        [("inprocess", InProcessExecutor), ("subprocess", SubprocessExecutor), ("bogus", InProcessExecutor)],
+    )
+    def test_choice_from_config(self, setting: str, expected: type, temp_dir: Path) -> None:
+        with patch("src.core.executors.get_setting", return_value=setting):
+            assert isinstance(get_stage_executor(lambda cmd: True, str(temp_dir)), expected)
@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from src.utils.image_processing import (
+    fill_internal_holes_array,
+    load_rgba,
+    remove_external_noise_array,
+    save_rgba,
+    trim_to_content,
+    trim_to_content_array,
+)
+
+
+def _square_with_hole() -> np.ndarray:
+    image = np.zeros((60, 60, 4), dtype=np.uint8)
+    image[10:50, 10:50] = (255, 0, 0, 255)
+    image[25:35, 25:35, 3] = 0
+    return image
+
+
+class TestArrayStages:
+    def test_fill_internal_holes_uses_original_pixels(self) -> None:
+        original = np.full((60, 60, 3), 200, dtype=np.uint8)
+        result = fill_internal_holes_array(_square_with_hole(), original)
+
+        assert result[30, 30].tolist() == [200, 200, 200, 255]
+        assert result[5, 5, 3] == 0
+
+    def test_fill_internal_holes_does_not_mutate_input(self) -> None:
+        image = _square_with_hole()
+        fill_internal_holes_array(image, np.zeros((60, 60, 4), dtype=np.uint8))
+        assert image[30, 30, 3] == 0
+
+    def test_remove_external_noise_drops_specks(self) -> None:
+        image = _square_with_hole()
+        image[2:4, 55:57] = (0, 255, 0, 255)
+        result = remove_external_noise_array(image)
+
+        assert result[3, 56, 3] == 0
+        assert result[20, 20, 3] == 255
+
+    def test_remove_external_noise_without_alpha(self) -> None:
+        image = np.zeros((10, 10, 3), dtype=np.uint8)
+        assert remove_external_noise_array(image) is image
+
+    def test_trim_to_content(self) -> None:
+        result = trim_to_content_array(_square_with_hole())
+        assert result is not None
+        assert result.shape == (40, 40, 4)
+
+    def test_trim_empty_image(self) -> None:
+        assert trim_to_content_array(np.zeros((10, 10, 4), dtype=np.uint8)) is None
+
+
+class TestPathWrappers:
+    def test_round_trip(self, temp_dir: Path) -> None:
+        path = str(temp_dir / "roundtrip.png")
+        image = _square_with_hole()
+        save_rgba(image, path, intermediate=True)
+        assert np.array_equal(load_rgba(path), image)
+
+    def test_trim_to_content_file(self, sample_image_with_transparency: Path) -> None:
+        assert trim_to_content(str(sample_image_with_transparency)) is True
+        with Image.open(sample_image_with_transparency) as img:
+            assert img.size == (50, 50)
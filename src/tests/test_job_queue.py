@@ -0,0 +1,121 @@
+import os
+import sqlite3
+from pathlib import Path
+
+from src.core.job_queue import DONE, FAILED, PENDING, JobQueue
+
+OPTIONS: dict = {"model_name": "u2net", "output_format": "png", "post_processing_opts": {"crop_option": "trim"}}
+
+
+def make_files(folder: Path, names: list[str]) -> list[str]:
+    for name in names:
+        (folder / name).write_bytes(b"x")
+    return [str(folder / name) for name in names]
+
+
+class TestJobQueue:
+    def test_enqueue_is_idempotent(self, temp_dir: Path) -> None:
+        queue = JobQueue(str(temp_dir / "jobs.sqlite3"))
+        paths = make_files(temp_dir, ["a.png", "b.png"])
+        first = queue.enqueue(paths, OPTIONS)
+        second = queue.enqueue(paths, OPTIONS)
+        assert [job.id for job in first] == [job.id for job in second]
+        assert queue.counts() == {PENDING: 2}
+
+    def test_done_jobs_are_skipped_while_output_exists(self, temp_dir: Path) -> None:
+        queue = JobQueue(str(temp_dir / "jobs.sqlite3"))
+        paths = make_files(temp_dir, ["a.png", "b.png"])
+        jobs = queue.enqueue(paths, OPTIONS)
+        output = temp_dir / "a_out.png"
+        output.write_bytes(b"y")
+        queue.mark_running(jobs[0].id)
+        queue.mark_done(jobs[0].id, str(output))
+
+        assert [job.state for job in queue.enqueue(paths, OPTIONS)] == [DONE, PENDING]
+        assert [job.state for job in queue.enqueue(paths, OPTIONS, force=True)] == [PENDING, PENDING]
+        queue.mark_done(jobs[0].id, str(output))
+        output.unlink()
+        assert queue.enqueue(paths, OPTIONS)[0].state == PENDING
+
+    def test_edited_input_is_requeued(self, temp_dir: Path) -> None:
+        queue = JobQueue(str(temp_dir / "jobs.sqlite3"))
+        paths = make_files(temp_dir, ["a.png", "b.png"])
+        jobs = queue.enqueue(paths, OPTIONS)
+        for job in jobs:
+            output = temp_dir / f"{Path(job.input_path).stem}_out.png"
+            output.write_bytes(b"y")
+            queue.mark_done(job.id, str(output))
+        assert [job.state for job in queue.enqueue(paths, OPTIONS)] == [DONE, DONE]
+
+        # a.png muda de conteudo; b.png so de mtime, com o mesmo tamanho.
+        Path(paths[0]).write_bytes(b"editado")
+        os.utime(paths[1], ns=(0, os.stat(paths[1]).st_mtime_ns + 10**9))
+        assert [job.state for job in queue.enqueue(paths, OPTIONS)] == [PENDING, PENDING]
+
+    def test_output_over_input_counts_as_done(self, temp_dir: Path) -> None:
+        queue = JobQueue(str(temp_dir / "jobs.sqlite3"))
+        paths = make_files(temp_dir, ["a.png"])
+        job = queue.enqueue(paths, OPTIONS)[0]
+        # Sem pasta de saida: a saida e gravada no lugar da entrada.
+        Path(paths[0]).write_bytes(b"saida maior")
+        queue.mark_done(job.id, paths[0])
+        assert queue.enqueue(paths, OPTIONS)[0].state == DONE
+
+    def test_other_options_are_separate_jobs(self, temp_dir: Path) -> None:
+        queue = JobQueue(str(temp_dir / "jobs.sqlite3"))
+        paths = make_files(temp_dir, ["a.png"])
+        queue.enqueue(paths, OPTIONS)
+        queue.enqueue(paths, {**OPTIONS, "output_format": "webp"})
+        assert queue.counts() == {PENDING: 2}
+
+    def test_reopen_recovers_running_jobs_and_backups(self, temp_dir: Path) -> None:
+        db = str(temp_dir / "jobs.sqlite3")
+        queue = JobQueue(db)
+        paths = make_files(temp_dir, ["a.png", "b.png"])
+        jobs = queue.enqueue(paths, OPTIONS)
+        queue.mark_running(jobs[0].id)
+        queue.mark_failed(jobs[1].id, "erro")
+        # Simula a queda no meio do job: a entrada so existe como backup.
+        Path(paths[0]).rename(temp_dir / "a.bak.png")
+        queue.close()
+
+        reopened = JobQueue(db)
+        unfinished = reopened.unfinished()
+        assert [job.input_path for job in unfinished] == [paths[0]]
+        assert unfinished[0].options == OPTIONS
+        assert Path(paths[0]).exists()
+        assert reopened.counts() == {PENDING: 1, FAILED: 1}
+
+    def test_recover_restores_backup_over_written_output(self, temp_dir: Path) -> None:
+        db = str(temp_dir / "jobs.sqlite3")
+        queue = JobQueue(db)
+        paths = make_files(temp_dir, ["a.png"])
+        queue.mark_running(queue.enqueue(paths, OPTIONS)[0].id)
+        # Queda entre gravar a saida e o mark_done: sem pasta de saida, a.png ja e a saida e
+        # o original esta no .bak.
+        Path(paths[0]).rename(temp_dir / "a.bak.png")
+        Path(paths[0]).write_bytes(b"saida")
+        queue.close()
+
+        reopened = JobQueue(db)
+        assert [job.input_path for job in reopened.unfinished()] == paths
+        assert Path(paths[0]).read_bytes() == b"x"
+        assert not (temp_dir / "a.bak.png").exists()
+
+    def test_opens_queue_without_signature_columns(self, temp_dir: Path) -> None:
+        db = temp_dir / "jobs.sqlite3"
+        with sqlite3.connect(db) as conn:
+            conn.execute(
+                "CREATE TABLE jobs (id INTEGER PRIMARY KEY, input_path TEXT NOT NULL, options_key TEXT NOT NULL, "
+                "options TEXT NOT NULL, state TEXT NOT NULL, output_path TEXT, error TEXT, "
+                "attempts INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL, UNIQUE (input_path, options_key))"
+            )
+        conn.close()
+        queue = JobQueue(str(db))
+        assert [job.state for job in queue.enqueue(make_files(temp_dir, ["a.png"]), OPTIONS)] == [PENDING]
+
+    def test_discard_unfinished(self, temp_dir: Path) -> None:
+        queue = JobQueue(str(temp_dir / "jobs.sqlite3"))
+        queue.enqueue(make_files(temp_dir, ["a.png", "b.png"]), OPTIONS)
+        assert queue.discard_unfinished() == 2
+        assert queue.unfinished() == []
@@ -0,0 +1,164 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.cli import main
+from src.core import admission, onnx_export
+from src.core.admission import upscale_models_dir, upscale_processes
+from src.core.onnx_export import upscale_script
+from src.workers.onnx_upscale import OnnxUpsampler, onnx_model_path, session_options
+from src.workers.upscale_models import UPSCALE_MODELS
+
+onnx = pytest.importorskip("onnx")
+
+WORKER: str = str(Path(__file__).resolve().parents[1] / "workers" / "worker_upscale_onnx.py")
+TORCH_WORKER: str = str(Path(__file__).resolve().parents[1] / "workers" / "worker_upscale.py")
+
+
+def save_fake_model(path: Path, scale: int) -> str:
+    # Rede de teste: reduz o canal 0 da entrada pela metade e amplia por vizinho mais proximo.
+    helper, tensor = onnx.helper, onnx.TensorProto
+    nodes = [
+        helper.make_node("Mul", ["input", "gain"], ["scaled"]),
+        helper.make_node("Resize", ["scaled", "", "scales"], ["output"], mode="nearest"),
+    ]
+    initializers = [
+        helper.make_tensor("gain", tensor.FLOAT, [1, 3, 1, 1], [0.5, 1.0, 1.0]),
+        helper.make_tensor("scales", tensor.FLOAT, [4], [1, 1, scale, scale]),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "fake_upscale",
+        [helper.make_tensor_value_info("input", tensor.FLOAT, [1, 3, None, None])],
+        [helper.make_tensor_value_info("output", tensor.FLOAT, [1, 3, None, None])],
+        initializers,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    path.parent.mkdir(parents=True, exist_ok=True)
+    onnx.save(model, str(path))
+    return str(path)
+
+
+def expected_output(image: np.ndarray, scale: int) -> np.ndarray:
+    # O RealESRGANer entrega BGR a rede: o canal 0 da rede e o azul da imagem RGB.
+    expected = image.astype(np.float32) / 255.0
+    expected[:, :, 2] *= 0.5
+    expected = (expected * 255.0).round().astype(np.uint8)
+    return np.repeat(np.repeat(expected, scale, axis=0), scale, axis=1)
+
+
+class TestOnnxUpsampler:
+    @pytest.mark.parametrize(("scale", "size"), [(4, (24, 17)), (2, (15, 9))])
+    def test_matches_realesrgan_conventions(self, temp_dir: Path, scale: int, size: tuple[int, int]) -> None:
+        upsampler = OnnxUpsampler(save_fake_model(temp_dir / "m.onnx", scale), scale)
+        image = np.random.default_rng(0).integers(0, 256, (*size, 3), dtype=np.uint8)
+        output, mode = upsampler.enhance(image, outscale=scale)
+        assert mode == "RGB"
+        assert output.shape == (size[0] * scale, size[1] * scale, 3)
+        assert np.array_equal(output, expected_output(image, scale))
+
+    def test_outscale_resizes(self, temp_dir: Path) -> None:
+        upsampler = OnnxUpsampler(save_fake_model(temp_dir / "m.onnx", 4), 4)
+        output, _ = upsampler.enhance(np.zeros((10, 12, 3), dtype=np.uint8), outscale=2)
+        assert output.shape == (20, 24, 3)
+
+    def test_session_threads_follow_omp(self) -> None:
+        with patch.dict(os.environ, {"OMP_NUM_THREADS": "3"}):
+            options = session_options()
+        assert options.intra_op_num_threads == 3 and options.inter_op_num_threads == 3
+
+
+class TestOnnxWorker:
+    def test_worker_upscales_visible_content(self, temp_dir: Path) -> None:
+        models = temp_dir / "models"
+        save_fake_model(Path(onnx_model_path("RealESRGAN_x4plus", str(models))), 4)
+        rgba = np.zeros((40, 50, 4), dtype=np.uint8)
+        rgba[10:20, 5:30] = (200, 100, 50, 255)
+        Image.fromarray(rgba).save(temp_dir / "in.png")
+
+        cmd = [sys.executable, WORKER, "--input", str(temp_dir / "in.png"), "--output", str(temp_dir / "out.png")]
+        result = subprocess.run(
+            [*cmd, "--tile", "8", "--outscale", "4", "--models-dir", str(models)], capture_output=True, text=True
+        )
+
+        assert result.returncode == 0, result.stderr
+        output = np.array(Image.open(temp_dir / "out.png"))
+        assert output.shape == (160, 200, 4)
+        assert tuple(output[60, 60]) == (200, 100, 25, 255)
+        assert output[0, 0, 3] == 0
+
+    def test_processes_is_reported_as_ignored(self, temp_dir: Path) -> None:
+        models = temp_dir / "models"
+        save_fake_model(Path(onnx_model_path("RealESRGAN_x4plus", str(models))), 4)
+        Image.new("RGBA", (8, 8), (1, 2, 3, 255)).save(temp_dir / "in.png")
+        cmd = [sys.executable, WORKER, "--input", str(temp_dir / "in.png"), "--output", str(temp_dir / "out.png")]
+        result = subprocess.run([*cmd, "--models-dir", str(models), "--processes", "3"], capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        assert "processes=3 ignorado" in result.stderr
+
+    def test_missing_model_fails(self, temp_dir: Path) -> None:
+        Image.new("RGBA", (8, 8), (1, 2, 3, 255)).save(temp_dir / "in.png")
+        cmd = [sys.executable, WORKER, "--input", str(temp_dir / "in.png"), "--output", str(temp_dir / "out.png")]
+        result = subprocess.run([*cmd, "--models-dir", str(temp_dir)], capture_output=True, text=True)
+        assert result.returncode == 1
+        assert "--export-onnx-upscale" in result.stderr
+
+
+class TestBackendSelection:
+    def test_onnx_backend_uses_sibling_worker(self) -> None:
+        paths = {"UPSCALE_SCRIPT": "/app/src/workers/worker_upscale.py"}
+        with patch.dict(onnx_export.PATHS, paths, clear=True):
+            assert upscale_script() == "/app/src/workers/worker_upscale.py"
+            with patch.object(onnx_export, "upscale_backend", return_value="onnx"):
+                assert upscale_script() == "/app/src/workers/worker_upscale_onnx.py"
+
+    def test_onnx_backend_runs_a_single_process(self) -> None:
+        settings = {"UPSCALE_BACKEND": "onnx", "UPSCALE_PROCESSES": 4}
+        with patch.object(admission, "get_setting", side_effect=lambda key, default=None: settings.get(key, default)):
+            assert upscale_processes() == 1
+            settings["UPSCALE_BACKEND"] = "torch"
+            assert upscale_processes() == 4
+
+    @pytest.mark.parametrize(("ok", "code"), [(True, 0), (False, 1)])
+    def test_cli_export_reports_parity(self, ok: bool, code: int, capsys: pytest.CaptureFixture[str]) -> None:
+        report = {"model": "RealESRGAN_x2plus", "path": "x.onnx", "ok": ok, "tolerance": 2, "results": []}
+        completed = MagicMock(stdout="progresso\n" + json.dumps(report) + "\n", stderr="")
+        paths = {"PYTHON_UPSCALE": "python3", "UPSCALE_SCRIPT": "worker_upscale.py"}
+        with (
+            patch.dict(onnx_export.PATHS, paths, clear=True),
+            patch.object(onnx_export.subprocess, "run", return_value=completed) as run,
+            patch("src.cli.setup_logging"),
+        ):
+            assert main(["--export-onnx-upscale", "RealESRGAN_x2plus"]) == code
+
+        cmd = run.call_args.args[0]
+        assert cmd[2:5] == ["--export-onnx", "--model", "RealESRGAN_x2plus"]
+        assert json.loads(capsys.readouterr().out)["ok"] is ok
+
+
+class TestTorchParity:
+    # Exportacao real contra o RealESRGANer: precisa do torch e dos pesos ja baixados em
+    # UPSCALE_MODELS_DIR, entao fica de fora onde eles nao existem.
+    @pytest.mark.parametrize("model", list(UPSCALE_MODELS))
+    def test_export_matches_torch(self, temp_dir: Path, model: str) -> None:
+        for module in ("torch", "basicsr", "realesrgan"):
+            pytest.importorskip(module)
+        weights = Path(upscale_models_dir()) / UPSCALE_MODELS[model].filename
+        if not weights.is_file():
+            pytest.skip(f"pesos de {model} ausentes em {weights.parent}")
+        # O .onnx vai para uma pasta temporaria, ao lado de um link para os pesos.
+        (temp_dir / weights.name).symlink_to(weights)
+        cmd = [sys.executable, TORCH_WORKER, "--export-onnx", "--model", model, "--models-dir", str(temp_dir)]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        assert report["ok"], report["results"]
+        assert Path(report["path"]).is_file()
@@ -0,0 +1,92 @@
+import threading
+import time
+from collections.abc import Callable
+
+import pytest
+
+from src.core.pipeline import Stage, StagePipeline
+
+
+def sleeper(seconds: float, name: str = "") -> Callable[[dict], None]:
+    def fn(item: dict) -> None:
+        time.sleep(seconds)
+        item.setdefault("path", []).append(name)
+
+    return fn
+
+
+class TestStagePipeline:
+    def test_every_item_passes_every_stage(self) -> None:
+        done: list[dict] = []
+        stages = [Stage("a", sleeper(0, name="a")), Stage("b", sleeper(0, name="b"), workers=2)]
+        StagePipeline(stages).run(({"id": i} for i in range(10)), lambda item, error: done.append(item))
+        assert sorted(item["id"] for item in done) == list(range(10))
+        assert all(item["path"] == ["a", "b"] for item in done)
+
+    def test_stages_overlap(self) -> None:
+        stages = [Stage(name, sleeper(0.05, name=name)) for name in ("a", "b", "c")]
+        pipeline = StagePipeline(stages)
+        start = time.perf_counter()
+        pipeline.run(({"id": i} for i in range(6)), lambda item, error: None)
+        # Em serie seriam 6 x 3 x 0.05 = 0.9 s; em pipeline, cerca de (6 + 2) x 0.05.
+        assert time.perf_counter() - start < 0.7
+
+    def test_error_skips_remaining_stages(self) -> None:
+        def fail_on_two(item: dict) -> None:
+            if item["id"] == 2:
+                raise ValueError("item 2")
+
+        results: dict[int, Exception | None] = {}
+        after: list[int] = []
+        stages = [Stage("a", fail_on_two), Stage("b", lambda item: after.append(item["id"]))]
+        StagePipeline(stages).run(({"id": i} for i in range(4)), lambda item, e: results.__setitem__(item["id"], e))
+
+        assert isinstance(results[2], ValueError)
+        assert [i for i, e in results.items() if e is None] == [0, 1, 3]
+        assert 2 not in after
+
+    def test_bounded_queue_limits_read_ahead(self) -> None:
+        consumed: list[int] = []
+        release = threading.Event()
+
+        def items():
+            for i in range(20):
+                consumed.append(i)
+                yield {"id": i}
+
+        pipeline = StagePipeline([Stage("slow", lambda item: release.wait(5))], queue_size=2)
+        runner = threading.Thread(target=pipeline.run, args=(items(), lambda item, error: None))
+        runner.start()
+        time.sleep(0.1)
+        assert len(consumed) <= 4
+        release.set()
+        runner.join(5)
+
+    def test_utilization_identifies_bottleneck(self) -> None:
+        stages = [Stage("fast", sleeper(0.005)), Stage("slow", sleeper(0.04))]
+        pipeline = StagePipeline(stages)
+        pipeline.run(({"id": i} for i in range(5)), lambda item, error: None)
+        usage = pipeline.utilization()
+        assert usage["slow"] > usage["fast"]
+        assert usage["slow"] == pytest.approx(0.2 / pipeline.elapsed, rel=0.3)
+        assert "gargalo: slow" in pipeline.report()
+
+    def test_cancel_marks_pending_items(self) -> None:
+        errors: list[Exception | None] = []
+        pipeline = StagePipeline([Stage("a", lambda item: pipeline.cancel())])
+        pipeline.run(({"id": i} for i in range(3)), lambda item, e: errors.append(e))
+        assert errors[0] is None
+        assert all(isinstance(e, RuntimeError) for e in errors[1:])
+
+    def test_failing_source_drains_and_stops_workers(self) -> None:
+        def items():
+            yield {"id": 0}
+            yield {"id": 1}
+            raise OSError("leitura falhou")
+
+        done: list[int] = []
+        stages = [Stage("a", sleeper(0.01, name="a")), Stage("b", sleeper(0, name="b"), workers=2)]
+        with pytest.raises(OSError, match="leitura falhou"):
+            StagePipeline(stages).run(items(), lambda item, error: done.append(item["id"]))
+        assert sorted(done) == [0, 1]
+        assert not [t for t in threading.enumerate() if t.name.startswith(("fogstripper-a-", "fogstripper-b-"))]
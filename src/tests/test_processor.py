@@ -1,12 +1,15 @@
 import os
+import shutil
 import tempfile
 from pathlib import Path
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 
 import pytest
+from PIL import Image
 
 from src.core.constants import VIDEO_EXTENSIONS
-from src.core.processor import ProcessThread
+from src.core.process_thread import ProcessThread
+from src.core.worker_client import WorkerError
 
 
 class TestProcessThread:
@@ -131,3 +134,117 @@ class TestProcessThread:
 
     def test_model_name_stored(self, processor: ProcessThread) -> None:
         assert processor.model_name == "u2net"
+
+    def test_run_rembg_uses_persistent_worker(self, processor: ProcessThread) -> None:
+        worker = MagicMock()
+        paths = {"PYTHON_REMBG": "/usr/bin/python3", "REMBG_SCRIPT": "worker_rembg.py"}
+        with (
+            patch.dict("src.core.processor.PATHS", paths, clear=True),
+            patch("src.core.processor.get_worker_pool", return_value=worker),
+            patch.object(processor, "run_command") as run_command,
+        ):
+            assert processor._run_rembg("in.png", "out.png") is True
+
+        worker.request.assert_called_once_with("remove", input="in.png", output="out.png", model="u2net", potencia=75)
+        run_command.assert_not_called()
+
+    def test_run_rembg_falls_back_to_oneshot(self, processor: ProcessThread) -> None:
+        worker = MagicMock()
+        worker.request.side_effect = WorkerError("caiu")
+        paths = {"PYTHON_REMBG": "/usr/bin/python3", "REMBG_SCRIPT": "worker_rembg.py"}
+        with (
+            patch.dict("src.core.processor.PATHS", paths, clear=True),
+            patch("src.core.processor.get_worker_pool", return_value=worker),
+            patch.object(processor, "run_command", return_value=True) as run_command,
+        ):
+            assert processor._run_rembg("in.png", "out.png") is True
+
+        assert run_command.call_args[0][0][:2] == ["/usr/bin/python3", "worker_rembg.py"]
+
+    def test_run_rembg_respects_persistent_setting(self, processor: ProcessThread) -> None:
+        paths = {"PYTHON_REMBG": "/usr/bin/python3", "REMBG_SCRIPT": "worker_rembg.py", "PERSISTENT_WORKERS": False}
+        with (
+            patch.dict("src.core.processor.PATHS", paths, clear=True),
+            patch("src.core.config_loader.PATHS", paths),
+            patch("src.core.processor.get_worker_pool") as get_worker,
+            patch.object(processor, "run_command", return_value=True),
+        ):
+            assert processor._run_rembg("in.png", "out.png") is True
+
+        get_worker.assert_not_called()
+
+    def test_run_upscale_uses_persistent_worker(self, processor: ProcessThread) -> None:
+        worker = MagicMock()
+        paths = {"PYTHON_UPSCALE": "/usr/bin/python3", "UPSCALE_SCRIPT": "worker_upscale.py"}
+        with (
+            patch.dict("src.core.processor.PATHS", paths, clear=True),
+            patch("src.core.processor.get_worker_pool", return_value=worker),
+            patch.object(processor, "run_command") as run_command,
+        ):
+            assert processor._run_upscale("in.png", "out.png", 2) is True
+
+        worker.request.assert_called_once_with(
+            "upscale",
+            input="in.png",
+            output="out.png",
+            tile=512,
+            outscale=2,
+            model="RealESRGAN_x2plus",
+            models_dir=ANY,
+            processes=1,
+        )
+        run_command.assert_not_called()
+
+    def test_static_image_applies_post_processing(self, sample_image_with_transparency: Path, temp_dir: Path) -> None:
+        proc: ProcessThread = ProcessThread(
+            input_path=str(sample_image_with_transparency),
+            model_name="u2net",
+            output_format=".png",
+            potencia=75,
+            tile_size=512,
+            post_processing_opts={
+                "enabled": True,
+                "upscale_factor": 0,
+                "shadow_enabled": True,
+                "shadow_blur": 5,
+                "shadow_opacity": 50,
+                "background_type": "color",
+                "background_data": "#0000FF",
+            },
+        )
+        final_path: str = str(temp_dir / "final.png")
+
+        def fake_rembg(input_path: str, output_path: str) -> bool:
+            shutil.copy(input_path, output_path)
+            return True
+
+        with patch.object(proc, "_run_rembg", side_effect=fake_rembg):
+            result: str = proc._process_static_image(str(sample_image_with_transparency), final_path)
+        proc.cleanup()
+
+        assert result == final_path
+        with Image.open(final_path) as img:
+            assert img.size == (100 + 10 + 5 * 2, 100 + 10 + 5 * 2)
+            assert img.getpixel((0, 0)) == (0, 0, 255, 255)
+
+    def test_run_rembg_batch_uses_single_request(self, processor: ProcessThread) -> None:
+        worker = MagicMock()
+        paths = {"PYTHON_REMBG": "/usr/bin/python3", "REMBG_SCRIPT": "worker_rembg.py"}
+        with (
+            patch.dict("src.core.processor.PATHS", paths, clear=True),
+            patch("src.core.processor.get_worker_pool", return_value=worker),
+        ):
+            assert processor._run_rembg_batch(["a.png", "b.png"], ["c.png", "d.png"]) is True
+
+        worker.request.assert_called_once()
+        assert worker.request.call_args[0][0] == "remove_batch"
+        assert worker.request.call_args[1]["inputs"] == ["a.png", "b.png"]
+
+    def test_run_rembg_batch_falls_back_per_frame(self, processor: ProcessThread) -> None:
+        with (
+            patch.object(processor, "_run_persistent", return_value=False),
+            patch.object(processor, "_run_rembg", return_value=True) as run_rembg,
+        ):
+            assert processor._run_rembg_batch(["a.png", "b.png"], ["c.png", "d.png"]) is True
+
+        assert run_rembg.call_count == 2
@@ -0,0 +1,213 @@
+import shutil
+import threading
+import time
+from collections.abc import Generator
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+from PyQt6.QtCore import QCoreApplication, QEventLoop, QThread, QTimer, pyqtSignal
+
+from src.core.process_thread import ProcessThread
+from src.core.scheduler import BatchScheduler, PipelinedBatch, default_batch_concurrency
+from src.utils.memory import MemoryBudget
+
+
+class FakeJob(QThread):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(str)
+    error = pyqtSignal(str)
+
+    active: int = 0
+    peak: int = 0
+    lock: threading.Lock = threading.Lock()
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path: str = path
+
+    def run(self) -> None:
+        with FakeJob.lock:
+            FakeJob.active += 1
+            FakeJob.peak = max(FakeJob.peak, FakeJob.active)
+        self.progress.emit(50)
+        time.sleep(0.02)
+        with FakeJob.lock:
+            FakeJob.active -= 1
+        if "bad" in self.path:
+            self.error.emit(f"falhou: {self.path}")
+        else:
+            self.finished.emit(f"{self.path}.out")
+
+
+@pytest.fixture
+def app() -> Generator[QCoreApplication, None, None]:
+    yield QCoreApplication.instance() or QCoreApplication([])
+    FakeJob.active = FakeJob.peak = 0
+
+
+def run_scheduler(scheduler: BatchScheduler) -> None:
+    loop = QEventLoop()
+    scheduler.all_done.connect(loop.quit)
+    QTimer.singleShot(10000, loop.quit)
+    QTimer.singleShot(0, scheduler.start)
+    loop.exec()
+
+
+class TestBatchScheduler:
+    def test_runs_jobs_concurrently(self, app: QCoreApplication) -> None:
+        paths = [f"img_{i}.png" for i in range(8)]
+        scheduler = BatchScheduler(paths, FakeJob, concurrency=3)
+        progress: list[int] = []
+        scheduler.progress.connect(progress.append)
+
+        run_scheduler(scheduler)
+
+        assert scheduler.outputs == {p: f"{p}.out" for p in paths}
+        assert 1 < FakeJob.peak <= 3
+        assert progress[-1] == 100
+        assert progress == sorted(progress)
+
+    def test_failure_does_not_stop_batch(self, app: QCoreApplication) -> None:
+        paths = ["a.png", "bad.png", "c.png", "d.png"]
+        scheduler = BatchScheduler(paths, FakeJob, concurrency=2)
+        failed: list[str] = []
+        scheduler.job_failed.connect(lambda path, _: failed.append(path))
+
+        run_scheduler(scheduler)
+
+        assert failed == ["bad.png"]
+        assert scheduler.failures == {"bad.png": "falhou: bad.png"}
+        assert set(scheduler.outputs) == {"a.png", "c.png", "d.png"}
+
+    def test_cancel_drops_pending_jobs(self, app: QCoreApplication) -> None:
+        scheduler = BatchScheduler([f"{i}.png" for i in range(6)], FakeJob, concurrency=1)
+        scheduler.job_started.connect(lambda _: scheduler.cancel())
+
+        run_scheduler(scheduler)
+
+        assert scheduler.done == 1
+
+    def test_duplicates_are_processed_once(self, app: QCoreApplication, temp_dir: Path) -> None:
+        class WritingJob(FakeJob):
+            output_dir: str = str(temp_dir / "out")
+
+            def run(self) -> None:
+                target = Path(self.output_dir) / f"{Path(self.path).stem}.png"
+                target.parent.mkdir(exist_ok=True)
+                target.write_bytes(Path(self.path).read_bytes())
+                self.finished.emit(str(target))
+
+        paths: list[str] = []
+        for name, data in [("a.png", b"um"), ("b.png", b"dois"), ("a2.png", b"um"), ("a3.png", b"um")]:
+            (temp_dir / name).write_bytes(data)
+            paths.append(str(temp_dir / name))
+        started: list[str] = []
+        scheduler = BatchScheduler(paths, WritingJob, concurrency=2)
+        scheduler.job_started.connect(started.append)
+
+        run_scheduler(scheduler)
+
+        assert started == paths[:2]
+        assert scheduler.collapsed == 2
+        assert set(scheduler.outputs) == set(paths)
+        assert (temp_dir / "out" / "a3.png").read_bytes() == b"um"
+
+    def test_memory_budget_limits_admission(self, app: QCoreApplication, temp_dir: Path) -> None:
+        paths = [str(temp_dir / f"{i}.png") for i in range(4)]
+        budget = MemoryBudget(100)
+        active: list[int] = [0, 0]
+
+        def fake_process(proc: ProcessThread) -> str:
+            with FakeJob.lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+            time.sleep(0.02)
+            with FakeJob.lock:
+                active[0] -= 1
+            return f"{proc.input_path}.out"
+
+        with (
+            patch("src.core.admission.get_memory_budget", return_value=budget),
+            patch("src.core.scheduler.estimate_job_memory", return_value=60),
+            patch.object(ProcessThread, "process", autospec=True, side_effect=fake_process),
+            patch("src.core.scheduler.dedup_enabled", return_value=False),
+        ):
+            scheduler = BatchScheduler(paths, lambda path: ProcessThread(path, "u2net", ".png", 75, 512, {}), 4)
+            run_scheduler(scheduler)
+
+        assert len(scheduler.outputs) == 4
+        # Dois jobs de 60 nao cabem em 100: mesmo com 4 vagas, um de cada vez.
+        assert active[1] == 1
+        assert budget.used_bytes == 0
+
+    def test_empty_batch(self, app: QCoreApplication) -> None:
+        scheduler = BatchScheduler([], FakeJob)
+        done: list[bool] = []
+        scheduler.all_done.connect(lambda: done.append(True))
+        scheduler.start()
+        assert done == [True]
+
+
+def fake_rembg(input_path: str, output_path: str) -> bool:
+    if "bad" in input_path:
+        return False
+    shutil.copy(input_path, output_path)
+    return True
+
+
+class TestPipelinedBatch:
+    def _paths(self, temp_dir: Path, names: list[str]) -> list[str]:
+        paths: list[str] = []
+        for i, name in enumerate(names):
+            path = temp_dir / name
+            Image.new("RGB", (32, 32), (255, i * 20, 0)).save(path)
+            paths.append(str(path))
+        return paths
+
+    def _job(self, path: str) -> ProcessThread:
+        return ProcessThread(path, "u2net", ".png", 75, 512, {"crop_option": "trim"})
+
+    def test_processes_all_files(self, app: QCoreApplication, temp_dir: Path) -> None:
+        paths = self._paths(temp_dir, [f"img_{i}.jpg" for i in range(5)])
+        batch = PipelinedBatch(paths, self._job)
+
+        with patch.object(ProcessThread, "_run_rembg", side_effect=fake_rembg):
+            run_scheduler(batch)
+        batch.wait()
+
+        assert set(batch.outputs) == set(paths)
+        assert all(Path(out).suffix == ".png" and Path(out).exists() for out in batch.outputs.values())
+        assert batch.pipeline is not None
+        assert [stage.name for stage in batch.pipeline.stages] == ["rembg", "cleanup", "save"]
+        assert all(stage.items == 5 for stage in batch.pipeline.stages)
+        assert not Path(batch.template.temp_dir).exists()
+
+    def test_failure_restores_backup_and_continues(self, app: QCoreApplication, temp_dir: Path) -> None:
+        paths = self._paths(temp_dir, ["a.jpg", "bad.jpg", "c.jpg"])
+        batch = PipelinedBatch(paths, self._job)
+
+        with patch.object(ProcessThread, "_run_rembg", side_effect=fake_rembg):
+            run_scheduler(batch)
+        batch.wait()
+
+        assert set(batch.failures) == {paths[1]}
+        assert Path(paths[1]).exists()
+        assert len(batch.outputs) == 2
+
+
+class TestDefaultBatchConcurrency:
+    def test_follows_setting(self) -> None:
+        with patch(
+            "src.core.scheduler.get_setting",
+            side_effect=lambda key, default=None: 6 if key == "BATCH_CONCURRENCY" else default,
+        ):
+            assert default_batch_concurrency() == 6
+
+    def test_falls_back_to_rembg_workers(self) -> None:
+        with patch(
+            "src.core.scheduler.get_setting",
+            side_effect=lambda key, default=None: 2 if key == "REMBG_WORKERS" else default,
+        ):
+            assert default_batch_concurrency() == 2
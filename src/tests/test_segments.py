@@ -0,0 +1,201 @@
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import imageio
+import imageio_ffmpeg
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.core.animation import FrameDirectorySink, FrameSource, VideoSink
+from src.core.process_thread import ProcessThread
+from src.core.segments import SegmentRunner, concat_segments, segment_part_path, split_segments
+
+# Segmento falso: grava quadros PNG na pasta da parte e informa o progresso e o resumo final
+# como o real. Com FAIL_ONCE, a primeira execucao de cada segmento falha para exercitar a nova
+# tentativa; com SHORT, o segmento que comeca no quadro 3 entrega um quadro a menos.
+FAKE_SEGMENT: str = """
+import json, os, sys
+from PIL import Image
+args = dict(zip(sys.argv[1::2], sys.argv[2::2]))
+part, start = args["--part"], int(args["--start"])
+stop = int(args.get("--stop", start + 3))
+marker = part + ".failed"
+if os.environ.get("FAIL_ONCE") and not os.path.exists(marker):
+    open(marker, "w").close()
+    sys.exit(3)
+if os.environ.get("SHORT") and start == 3:
+    stop -= 1
+os.makedirs(part, exist_ok=True)
+for i in range(start, stop):
+    Image.new("RGBA", (8, 8), (i, 0, 0, 255)).save(os.path.join(part, f"frame_{i:04d}.png"))
+    print(json.dumps({"done": i - start + 1}), flush=True)
+stats = {"frames_inferred": 1, "frames_skipped": stop - start - 1}
+print(json.dumps({"frames": stop - start, "stats": stats}), flush=True)
+"""
+
+
+def write_h264(path: Path, count: int) -> str:
+    # H.264 com GOP longo e quadros B, em taxa variavel: so o primeiro quadro e intra e os
+    # tempos nao seguem indice / fps.
+    cfr: Path = path.with_suffix(".cfr.mp4")
+    writer = imageio.get_writer(str(cfr), fps=24, codec="libx264", macro_block_size=16)
+    for i in range(count):
+        writer.append_data(np.full((32, 32, 3), i * 4, dtype=np.uint8))
+    writer.close()
+    cmd: list[str] = [imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error", "-i", str(cfr)]
+    cmd += ["-vf", "setpts='(N+if(gte(N,10),N-10,0))/24/TB'", "-fps_mode", "vfr"]
+    cmd += ["-c:v", "libx264", "-g", "250", "-bf", "2", str(path)]
+    subprocess.run(cmd, check=True)
+    return str(path)
+
+
+def write_webm(path: Path, values: list[int]) -> str:
+    sink = VideoSink(str(path), 10)
+    for value in values:
+        sink.append(np.full((16, 16, 4), (value, 0, 0, 255), dtype=np.uint8))
+    return sink.close()
+
+
+class TestSplitSegments:
+    def test_even_split_last_open_ended(self) -> None:
+        assert split_segments(400, 4, min_frames=10) == [(0, 100), (100, 200), (200, 300), (300, None)]
+
+    def test_short_clip_is_not_split(self) -> None:
+        assert split_segments(60, 8, min_frames=48) == [(0, None)]
+        assert len(split_segments(100, 8, min_frames=48)) == 2
+
+
+class TestFrameSourceRange:
+    @pytest.mark.parametrize("start,stop,expected", [(0, None, 30), (10, 20, 10), (25, None, 5)])
+    def test_reads_only_range(self, temp_dir: Path, start: int, stop: int | None, expected: int) -> None:
+        clip: str = write_webm(temp_dir / "clip.webm", [i * 8 for i in range(30)])
+        with FrameSource(clip, start, stop) as source:
+            frames = list(source)
+            assert source.estimated_frame_count == 30
+        assert len(frames) == expected
+        assert abs(int(frames[0][0, 0, 0]) - start * 8) <= 6
+
+    def test_segments_join_to_full_read_with_inter_frames(self, temp_dir: Path) -> None:
+        clip: str = write_h264(temp_dir / "clip.mp4", 40)
+        with FrameSource(clip) as source:
+            full: list[int] = [int(frame[0, 0, 0]) for frame in source]
+        joined: list[int] = []
+        for start, stop in split_segments(len(full), 3, min_frames=10):
+            with FrameSource(clip, start, stop) as source:
+                joined += [int(frame[0, 0, 0]) for frame in source]
+        assert joined == full
+
+
+class TestConcatSegments:
+    def test_webm_stream_copy(self, temp_dir: Path) -> None:
+        parts = [write_webm(temp_dir / f"part_{i}.webm", [i * 100] * 5) for i in range(2)]
+        output: str = concat_segments(parts, ".webm", str(temp_dir / "out.webm"), 10, str(temp_dir))
+        with FrameSource(output) as source:
+            frames = list(source)
+        assert len(frames) == 10
+        assert int(frames[0][0, 0, 0]) < 20 and int(frames[-1][0, 0, 0]) > 80
+
+    def test_gif_from_frame_directories(self, temp_dir: Path) -> None:
+        parts: list[str] = []
+        for i in range(3):
+            sink = FrameDirectorySink(str(temp_dir / f"part_{i}"), ".png", str(temp_dir))
+            for j in range(2):
+                sink.append(np.full((8, 8, 4), i * 80 + j * 20, dtype=np.uint8))
+            parts.append(sink.close())
+        output: str = concat_segments(parts, ".gif", str(temp_dir / "out.gif"), 10, str(temp_dir))
+        with Image.open(output) as img:
+            assert img.n_frames == 6
+
+    def test_frames_past_9999_keep_numeric_order(self, temp_dir: Path) -> None:
+        part = temp_dir / "part_000"
+        sink = FrameDirectorySink(str(part), ".png", str(temp_dir), first_index=9998)
+        for value in (10, 20, 30, 40):
+            sink.append(np.full((4, 4, 4), (value, 0, 0, 255), dtype=np.uint8))
+        output: str = concat_segments([sink.close()], ".gif", str(temp_dir / "out.gif"), 10, str(temp_dir))
+        with Image.open(output) as img:
+            reds = []
+            for i in range(img.n_frames):
+                img.seek(i)
+                reds.append(img.convert("RGBA").getpixel((0, 0))[0])
+        assert reds == sorted(reds)
+
+    def test_png_segments_share_output_directory(self, temp_dir: Path) -> None:
+        final: str = str(temp_dir / "clip.png")
+        for start in (0, 3):
+            sink = FrameDirectorySink(str(temp_dir / "clip"), ".png", str(temp_dir), first_index=start)
+            for _ in range(3):
+                sink.append(np.zeros((4, 4, 4), dtype=np.uint8))
+        output: str = concat_segments([], ".png", final, 10, str(temp_dir))
+        assert len(list(Path(output).iterdir())) == 6
+
+
+class TestSegmentRunner:
+    def _runner(self, temp_dir: Path) -> SegmentRunner:
+        runner = SegmentRunner("in.webm", ".gif", str(temp_dir / "out.gif"), str(temp_dir), {"model": "u2net"})
+        script: Path = temp_dir / "fake_segment.py"
+        script.write_text(FAKE_SEGMENT)
+        original = runner._command
+        runner._command = lambda *args: [sys.executable, str(script), *original(*args)[3:]]  # type: ignore[method-assign]
+        return runner
+
+    def test_runs_segments_and_reports_progress(self, temp_dir: Path) -> None:
+        seen: list[int] = []
+        parts: list[str] = self._runner(temp_dir).run([(0, 3), (3, 6), (6, 9)], seen.append)
+        assert parts == [segment_part_path(str(temp_dir), i, ".gif") for i in range(3)]
+        assert max(seen) == 9
+
+    def test_sums_segment_stats(self, temp_dir: Path) -> None:
+        runner: SegmentRunner = self._runner(temp_dir)
+        runner.run([(0, 3), (3, 6), (6, 9)], lambda _: None)
+        assert runner.total_frames == 9
+        assert runner.stats == {"frames_inferred": 3, "frames_skipped": 6}
+
+    def test_short_segment_raises(self, temp_dir: Path) -> None:
+        with patch.dict("os.environ", {"SHORT": "1"}), pytest.raises(RuntimeError, match="Segmento 1 entregou 2"):
+            self._runner(temp_dir).run([(0, 3), (3, 6), (6, 9)], lambda _: None)
+
+    def test_file_ending_early_is_accepted(self, temp_dir: Path) -> None:
+        # Contagem estimada maior que a real: o ultimo segmento com dados termina antes.
+        runner: SegmentRunner = self._runner(temp_dir)
+        with patch.dict("os.environ", {"SHORT": "1"}):
+            runner.run([(0, 3), (3, 6)], lambda _: None)
+        assert runner.total_frames == 5
+
+    def test_failed_segment_is_retried(self, temp_dir: Path) -> None:
+        with patch.dict("os.environ", {"FAIL_ONCE": "1"}):
+            parts: list[str] = self._runner(temp_dir).run([(0, 3), (3, 6)], lambda _: None)
+        assert all(len(list(Path(part).iterdir())) == 3 for part in parts)
+
+    def test_persistent_failure_raises(self, temp_dir: Path) -> None:
+        runner: SegmentRunner = self._runner(temp_dir)
+        runner._command = lambda *args: [sys.executable, "-c", "raise SystemExit(2)"]  # type: ignore[method-assign]
+        with pytest.raises(RuntimeError, match="segmento 0"):
+            runner.run([(0, 3)], lambda _: None)
+
+
+class TestProcessAnimationSegments:
+    def test_long_clip_is_split(self, temp_dir: Path) -> None:
+        clip: str = write_webm(temp_dir / "clip.webm", [0] * 100)
+        proc = ProcessThread(clip, "u2net", ".gif", 75, 512, {})
+        settings = {"VIDEO_SEGMENTS": 4}
+
+        def fake_run(runner: SegmentRunner, ranges: list, on_progress: object) -> list[str]:
+            runner.frames = {0: 50, 1: 50}
+            runner.stats = {"frames_skipped": 7}
+            return ["a", "b"]
+
+        with (
+            patch("src.core.processor.get_setting", side_effect=lambda key, default=None: settings.get(key, default)),
+            patch.object(SegmentRunner, "run", autospec=True, side_effect=fake_run) as run,
+            patch("src.core.processor.concat_segments", return_value=str(temp_dir / "out.gif")) as concat,
+        ):
+            result: str = proc._process_animation(clip, str(temp_dir / "out.gif"))
+        proc.cleanup()
+
+        assert result == str(temp_dir / "out.gif")
+        assert run.call_args.args[1] == [(0, 50), (50, None)]
+        assert concat.call_args.args[:2] == (["a", "b"], ".gif")
+        assert proc.stats["frames_skipped"] == 7
@@ -0,0 +1,144 @@
+import http.client
+import io
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from src.core.processor import ImageProcessor
+from src.server import JobHTTPServer, JobManager, request_options
+
+release: threading.Event = threading.Event()
+# Sem proxies do ambiente: as requisicoes vao direto para o servidor em 127.0.0.1.
+opener: urllib.request.OpenerDirector = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+def fake_rembg(input_path: str, output_path: str) -> bool:
+    release.wait(timeout=10)
+    if os.path.basename(input_path).startswith("falha"):
+        return False
+    Image.open(input_path).convert("RGBA").save(output_path)
+    return True
+
+
+def png_bytes(color: tuple[int, int, int] = (255, 0, 0)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def server(temp_dir: Path) -> Iterator[JobHTTPServer]:
+    release.set()
+    manager = JobManager(str(temp_dir / "work"), concurrency=1, max_queue=2)
+    httpd = JobHTTPServer(("127.0.0.1", 0), manager, max_upload_bytes=1024**2)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    with (
+        patch.dict("src.core.processor.PATHS", {"REMBG_PYTHON": "python"}, clear=True),
+        patch.object(ImageProcessor, "_run_rembg", side_effect=fake_rembg),
+    ):
+        thread.start()
+        yield httpd
+        release.set()
+        httpd.shutdown()
+        httpd.server_close()
+        manager.close()
+
+
+def call(
+    server: JobHTTPServer, method: str, path: str, data: bytes | None = None, content_type: str = "image/png"
+) -> tuple[int, dict[str, str], bytes]:
+    url: str = f"http://127.0.0.1:{server.server_port}{path}"
+    request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": content_type})
+    try:
+        with opener.open(request, timeout=10) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def wait_state(server: JobHTTPServer, job_id: str) -> dict[str, Any]:
+    deadline: float = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        _, _, body = call(server, "GET", f"/jobs/{job_id}")
+        job: dict[str, Any] = json.loads(body)
+        if job["state"] in ("done", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("job nao terminou")
+
+
+class TestRequestOptions:
+    def test_maps_query_to_processor_options(self) -> None:
+        options = request_options({"model": ["u2netp"], "format": ["webp"], "trim": [""], "shadow": ["0"]})
+        assert options["model_name"] == "u2netp"
+        assert options["output_format"] == "webp"
+        assert options["post_processing_opts"]["crop_option"] == "trim"
+        assert options["post_processing_opts"]["shadow_enabled"] is False
+
+    @pytest.mark.parametrize("query", [{"model": ["nope"]}, {"background-image": ["/etc/passwd"]}])
+    def test_rejects_invalid_or_unknown_options(self, query: dict[str, list[str]]) -> None:
+        with pytest.raises(ValueError):
+            request_options(query)
+
+
+class TestJobServer:
+    def test_wait_returns_result_with_timing(self, server: JobHTTPServer) -> None:
+        status, headers, body = call(server, "POST", "/jobs?wait=1&name=foto.jpg&trim=1", png_bytes())
+
+        assert status == 200
+        assert headers["Content-Type"] == "image/png"
+        assert 'filename="foto.png"' in headers["Content-Disposition"]
+        assert float(headers["X-Processing-Seconds"]) >= 0
+        assert Image.open(io.BytesIO(body)).mode == "RGBA"
+
+    def test_poll_job_then_fetch_result_and_delete(self, server: JobHTTPServer) -> None:
+        status, headers, body = call(server, "POST", "/jobs", png_bytes())
+        job: dict[str, Any] = json.loads(body)
+        assert status == 202 and headers["Location"] == f"/jobs/{job['id']}"
+
+        finished = wait_state(server, job["id"])
+        assert finished["state"] == "done"
+        assert finished["timing"]["processing_seconds"] >= 0
+        assert call(server, "GET", finished["result"])[0] == 200
+        assert call(server, "DELETE", f"/jobs/{job['id']}")[0] == 204
+        assert call(server, "GET", f"/jobs/{job['id']}")[0] == 404
+
+    def test_full_queue_returns_429(self, server: JobHTTPServer) -> None:
+        release.clear()
+        ids: list[str] = [json.loads(call(server, "POST", "/jobs", png_bytes((0, i, 0)))[2])["id"] for i in range(2)]
+
+        status, headers, _ = call(server, "POST", "/jobs", png_bytes())
+        assert status == 429 and headers["Retry-After"] == "1"
+        assert call(server, "GET", f"/jobs/{ids[0]}/result")[0] == 409
+
+        release.set()
+        assert all(wait_state(server, job_id)["state"] == "done" for job_id in ids)
+        assert call(server, "POST", "/jobs", png_bytes())[0] == 202
+
+    def test_failed_job_reports_error(self, server: JobHTTPServer) -> None:
+        status, _, body = call(server, "POST", "/jobs?wait=1&name=falha.png", png_bytes())
+        assert status == 500
+        assert json.loads(body)["state"] == "failed"
+
+    def test_rejects_bad_requests(self, server: JobHTTPServer) -> None:
+        assert call(server, "POST", "/jobs?model=nope", png_bytes())[0] == 400
+        assert call(server, "POST", "/jobs?format=webm", png_bytes())[0] == 400
+        assert call(server, "POST", "/jobs", b"x", content_type="text/plain")[0] == 415
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+        connection.putrequest("POST", "/jobs")
+        connection.putheader("Content-Length", str(1024**2 + 1))
+        connection.endheaders()
+        assert connection.getresponse().status == 413
+        connection.close()
+        assert call(server, "GET", "/jobs/desconhecido")[0] == 404
+        assert json.loads(call(server, "GET", "/health")[2])["max_queue"] == 2
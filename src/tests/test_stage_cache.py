@@ -0,0 +1,135 @@
+import os
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image
+
+from src.core.processor import ImageProcessor
+from src.core.stage_cache import StageCache, stage_key
+
+
+def image(value: int, size: int = 32) -> np.ndarray:
+    return np.random.default_rng(value).integers(0, 255, (size, size, 4), dtype=np.uint8)
+
+
+class TestStageCache:
+    def test_roundtrip_and_miss(self, temp_dir: Path) -> None:
+        cache = StageCache(str(temp_dir / "cache"), 10 * 1024**2)
+        cache.put("ab" * 20, image(1))
+        assert np.array_equal(cache.get("ab" * 20), image(1))
+        assert cache.get("cd" * 20) is None
+
+    def test_eviction_drops_least_recently_used(self, temp_dir: Path) -> None:
+        cache = StageCache(str(temp_dir / "cache"), 10 * 1024**2)
+        keys = [f"{i:02d}" * 20 for i in range(4)]
+        for i, key in enumerate(keys):
+            cache.put(key, image(i, 64))
+            os.utime(cache._path(key), (i, i))
+        cache.get(keys[0])
+        cache.max_bytes = int(os.path.getsize(cache._path(keys[0])) * 3.2)
+
+        cache.put("99" * 20, image(9, 64))
+
+        assert keys[0] in cache and "99" * 20 in cache
+        assert keys[1] not in cache
+        assert cache.stats()["bytes"] <= cache.max_bytes
+
+    def test_corrupted_entry_is_dropped(self, temp_dir: Path) -> None:
+        cache = StageCache(str(temp_dir / "cache"), 10 * 1024**2)
+        cache.put("ab" * 20, image(1))
+        Path(cache._path("ab" * 20)).write_bytes(b"lixo")
+        assert cache.get("ab" * 20) is None
+        assert "ab" * 20 not in cache
+
+    def test_key_depends_on_parent_and_params(self) -> None:
+        base = stage_key("input", "rembg", {"model": "u2net"})
+        assert base == stage_key("input", "rembg", {"model": "u2net"})
+        assert base != stage_key("input", "rembg", {"model": "u2netp"})
+        assert stage_key(base, "cleanup", {}) != stage_key("outro", "cleanup", {})
+
+
+class TestProcessorStageCache:
+    def _run(self, source: Path, temp_dir: Path, cache: StageCache, calls: list[str], **opts: object) -> ImageProcessor:
+        def fake_rembg(input_path: str, output_path: str) -> bool:
+            calls.append(input_path)
+            shutil.copy(input_path, output_path)
+            return True
+
+        proc = ImageProcessor(str(source), "u2net", ".png", 75, 512, dict(opts))
+        with (
+            patch("src.core.processor.get_stage_cache", return_value=cache),
+            patch.object(proc, "_run_rembg", side_effect=fake_rembg),
+        ):
+            proc._process_static_image(str(source), str(temp_dir / "out.png"))
+        proc.cleanup()
+        return proc
+
+    def test_resumes_from_deepest_cached_stage(self, temp_dir: Path) -> None:
+        source: Path = temp_dir / "in.png"
+        Image.fromarray(image(3)).save(source)
+        cache = StageCache(str(temp_dir / "cache"), 10 * 1024**2)
+        calls: list[str] = []
+
+        self._run(source, temp_dir, cache, calls, crop_option="trim")
+        again = self._run(source, temp_dir, cache, calls, crop_option="trim")
+        other_crop = self._run(source, temp_dir, cache, calls, crop_option="original")
+
+        assert len(calls) == 1
+        assert again.stats["cached_stages"] == ["rembg", "cleanup"]
+        assert other_crop.stats["cached_stages"] == ["rembg"]
+        assert cache.hits == {"rembg": 2, "cleanup": 1}
+        assert cache.misses == {"rembg": 1, "cleanup": 2}
+
+    def test_changed_input_bytes_miss(self, temp_dir: Path) -> None:
+        source: Path = temp_dir / "in.png"
+        cache = StageCache(str(temp_dir / "cache"), 10 * 1024**2)
+        calls: list[str] = []
+        for value in (1, 2):
+            Image.fromarray(image(value)).save(source)
+            self._run(source, temp_dir, cache, calls)
+        assert len(calls) == 2
+
+
+class TestMaskCache:
+    def test_mask_roundtrip_is_single_channel(self, temp_dir: Path) -> None:
+        cache = StageCache(str(temp_dir / "masks"), 10 * 1024**2, compress_level=6)
+        mask = image(4)[:, :, 3]
+        cache.put("ab" * 20, mask)
+        loaded = cache.get("ab" * 20)
+        assert loaded is not None and loaded.ndim == 2
+        assert np.array_equal(loaded, mask)
+
+    def test_recomposite_skips_rembg(self, temp_dir: Path) -> None:
+        source: Path = temp_dir / "in.png"
+        original = image(5)
+        original[:, :, 3] = 255
+        Image.fromarray(original).save(source)
+        masks = StageCache(str(temp_dir / "masks"), 10 * 1024**2, compress_level=6)
+        calls: list[str] = []
+
+        def fake_rembg(input_path: str, output_path: str) -> bool:
+            calls.append(input_path)
+            cutout = original.copy()
+            cutout[:, :, :3] = 0
+            cutout[:16, :, 3] = 0
+            Image.fromarray(cutout).save(output_path)
+            return True
+
+        outputs: list[np.ndarray] = []
+        for crop in ("original", "trim"):
+            proc = ImageProcessor(str(source), "u2net", ".png", 75, 512, {"crop_option": crop})
+            with (
+                patch("src.core.processor.get_mask_cache", return_value=masks),
+                patch.object(proc, "_run_rembg", side_effect=fake_rembg),
+            ):
+                out = proc._process_static_image(str(source), str(temp_dir / f"{crop}.png"))
+            proc.cleanup()
+            outputs.append(np.array(Image.open(out)))
+
+        assert len(calls) == 1
+        assert masks.hits == {"mask": 1} and masks.misses == {"mask": 1}
+        # A recomposicao usa as cores da entrada com o alfa guardado.
+        assert outputs[1].shape == (16, 32, 4)
+        assert np.array_equal(outputs[1][:, :, :3], original[16:, :, :3])
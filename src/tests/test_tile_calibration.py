@@ -0,0 +1,156 @@
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from src.cli import build_parser, main
+from src.core import tile_calibration
+from src.core.processor import ImageProcessor, StaticJob
+from src.core.tile_calibration import (
+    AUTO_TILE,
+    DEFAULT_TILE,
+    calibrate,
+    calibration_models,
+    choose_tile,
+    load_profile,
+    parse_tile,
+    resolve_tile_size,
+    save_profile,
+)
+from src.utils.memory import upscale_image_bytes
+from src.workers.upscale_models import UPSCALE_MODELS
+
+X4: str = "RealESRGAN_x4plus"
+X2: str = "RealESRGAN_x2plus"
+
+# Vazao e pico de memoria (acima do modelo carregado) de cada bloco em uma maquina ficticia.
+MEASURED: dict[int, tuple[float, int]] = {
+    256: (8.0, 600 * 1024**2),
+    512: (5.0, 1800 * 1024**2),
+    1024: (4.0, 6000 * 1024**2),
+}
+
+
+def fake_measure(tile: int, width: int, height: int, model: str, models_dir: str | None) -> dict[str, Any] | None:
+    if tile not in MEASURED:
+        return None
+    seconds, peak = MEASURED[tile]
+    # O x2plus roda cerca de um quarto das ativacoes: blocos maiores cabem no mesmo limite.
+    if model == X2:
+        peak //= 4
+    return {"model": model, "tile": tile, "width": width, "height": height, "seconds": seconds, "peak_bytes": peak}
+
+
+@pytest.fixture
+def profile(temp_dir: Path) -> Iterator[dict[str, Any]]:
+    path = temp_dir / "tile_profile.json"
+    with patch.object(tile_calibration, "profile_path", return_value=str(path)):
+        save_profile(calibrate((256, 512, 1024, 2048), (768, 512), measure=fake_measure))
+        save_profile(calibrate((256, 512, 1024), (768, 512), measure=fake_measure, model=X2))
+        yield load_profile()
+
+
+class TestCalibrate:
+    def test_profile_keeps_successful_measurements(self, profile: dict[str, Any]) -> None:
+        entry: dict[str, Any] = profile["models"][X4]
+        assert [m["tile"] for m in entry["results"]] == [256, 512, 1024]
+        assert entry["size"] == [768, 512]
+        assert all(m["pixels_per_second"] > 0 and m["tile_bytes"] >= 0 for m in entry["results"])
+
+    def test_profiles_are_kept_per_model(self, profile: dict[str, Any]) -> None:
+        assert set(profile["models"]) == {X4, X2}
+        assert profile["models"][X2]["model"] == X2
+
+    def test_tile_bytes_discount_the_model_scale_image(self, profile: dict[str, Any]) -> None:
+        # O worker amplia na escala nativa: o x2plus desconta a imagem 2x, nao a 4x.
+        measured: dict[str, Any] = profile["models"][X2]["results"][1]
+        assert measured["tile_bytes"] == MEASURED[512][1] // 4 - upscale_image_bytes(768, 512, 2, 2)
+
+    def test_presets_calibrate_every_model_they_pick(self) -> None:
+        assert [m.name for m in calibration_models("auto")] == [X2, X4]
+        assert [m.name for m in calibration_models("fast")] == ["realesr-general-x4v3"]
+        assert [m.name for m in calibration_models(X2)] == [X2]
+
+    def test_fails_when_nothing_was_measured(self) -> None:
+        with pytest.raises(RuntimeError):
+            calibrate((2048,), measure=fake_measure)
+
+    def test_parse_tile(self) -> None:
+        assert parse_tile("auto") == AUTO_TILE
+        assert parse_tile("384") == 384
+
+
+class TestChooseTile:
+    def test_fastest_tile_that_fits(self, profile: dict[str, Any]) -> None:
+        x4: dict[str, Any] = profile["models"][X4]
+        assert choose_tile(1000, 800, 4, None, x4, 4) == 1024
+        assert choose_tile(1000, 800, 4, 3 * 1024**3, x4, 4) == 512
+        assert choose_tile(1000, 800, 4, 1024**3, x4, 4) == 256
+
+    def test_bigger_images_need_smaller_tiles(self, profile: dict[str, Any]) -> None:
+        limit = 4 * 1024**3
+        assert choose_tile(500, 400, 4, limit, profile["models"][X4], 4) == 512
+        assert choose_tile(4000, 3000, 4, limit, profile["models"][X4], 4) == 256
+
+    def test_resolve_auto(self, profile: dict[str, Any], temp_dir: Path) -> None:
+        with patch.object(tile_calibration, "profile_path", return_value=str(temp_dir / "tile_profile.json")):
+            assert resolve_tile_size(AUTO_TILE, 1000, 800, 4, None, UPSCALE_MODELS[X4]) == 1024
+            assert resolve_tile_size(384, 1000, 800, 4, None, UPSCALE_MODELS[X4]) == 384
+
+    def test_resolve_auto_uses_the_active_model_profile(self, profile: dict[str, Any], temp_dir: Path) -> None:
+        limit = 3 * 1024**3
+        with patch.object(tile_calibration, "profile_path", return_value=str(temp_dir / "tile_profile.json")):
+            assert resolve_tile_size(AUTO_TILE, 1000, 800, 4, limit, UPSCALE_MODELS[X4]) == 512
+            assert resolve_tile_size(AUTO_TILE, 1000, 800, 2, limit, UPSCALE_MODELS[X2]) == 1024
+            # Modelo sem perfil calibrado cai no bloco padrao.
+            fast = UPSCALE_MODELS["realesr-general-x4v3"]
+            assert resolve_tile_size(AUTO_TILE, 1000, 800, 4, limit, fast) == DEFAULT_TILE
+
+    def test_resolve_auto_without_profile_uses_default(self, temp_dir: Path) -> None:
+        with patch.object(tile_calibration, "profile_path", return_value=str(temp_dir / "nenhum.json")):
+            assert resolve_tile_size(AUTO_TILE, 1000, 800, 2, None, UPSCALE_MODELS[X2]) == DEFAULT_TILE
+
+
+class TestAutoTileInPipeline:
+    def test_upscale_stage_passes_resolved_tile(self, temp_dir: Path) -> None:
+        proc = ImageProcessor(str(temp_dir / "a.png"), "u2net", "png", 75, AUTO_TILE, {"upscale_factor": 2})
+        job = StaticJob(str(temp_dir / "a.png"), str(temp_dir / "a_out.png"), str(temp_dir))
+        job.image = np.zeros((40, 60, 4), dtype=np.uint8)
+
+        def fake_upscale(input_path: str, output_path: str, factor: int, tile: int) -> bool:
+            Path(output_path).write_bytes(Path(input_path).read_bytes())
+            return True
+
+        with (
+            patch("src.core.processor.upscale_tile_size", return_value=256) as resolve,
+            patch.object(proc, "_run_upscale", side_effect=fake_upscale) as run,
+        ):
+            proc._stage_upscale(job)
+
+        resolve.assert_called_once_with(AUTO_TILE, 60, 40, 2, UPSCALE_MODELS[X2])
+        assert run.call_args.args[3] == 256
+        proc.cleanup()
+
+
+class TestCalibrateCommand:
+    def test_cli_writes_profile(self, temp_dir: Path, capsys: pytest.CaptureFixture[str]) -> None:
+        path = temp_dir / "tile_profile.json"
+        with (
+            patch.object(tile_calibration, "profile_path", return_value=str(path)),
+            patch.object(tile_calibration, "measure_tile", side_effect=fake_measure),
+            patch("src.cli.setup_logging"),
+        ):
+            code = main(["--calibrate-tiles", "256,512", "--calibrate-size", "320x240", "--upscale-model", X2])
+
+        assert code == 0
+        assert json.loads(path.read_text())["models"][X2]["size"] == [320, 240]
+        [printed] = json.loads(capsys.readouterr().out)
+        assert printed["model"] == X2
+        assert [m["tile"] for m in printed["results"]] == [256, 512]
+
+    def test_tile_option_accepts_auto(self) -> None:
+        assert build_parser().parse_args(["x", "--tile", "auto"]).tile == AUTO_TILE
@@ -0,0 +1,101 @@
+from collections.abc import Callable
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+from numpy.typing import NDArray
+
+from src.workers.tiling import alpha_bbox, is_visible, plan_tiles, split_tile, upscale_tiles
+
+
+def nearest(scale: int) -> tuple[Callable[[NDArray[np.uint8]], NDArray[np.uint8]], list[tuple[int, int]]]:
+    calls: list[tuple[int, int]] = []
+
+    def upscale(patch: NDArray[np.uint8]) -> NDArray[np.uint8]:
+        calls.append(patch.shape[:2])
+        return np.repeat(np.repeat(patch, scale, axis=0), scale, axis=1)
+
+    return upscale, calls
+
+
+def random_rgb(height: int, width: int) -> NDArray[np.uint8]:
+    return np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+class TestAlphaBbox:
+    def test_bbox_with_margin_is_clipped(self) -> None:
+        alpha = np.zeros((100, 200), dtype=np.uint8)
+        alpha[40:50, 5:30] = 255
+        assert alpha_bbox(alpha) == (5, 40, 30, 50)
+        assert alpha_bbox(alpha, margin=10) == (0, 30, 40, 60)
+
+    def test_fully_transparent(self) -> None:
+        assert alpha_bbox(np.zeros((10, 10), dtype=np.uint8)) is None
+
+
+class TestPlanTiles:
+    def test_tiles_cover_image_once(self) -> None:
+        tiles = plan_tiles(100, 70, 32, 4)
+        covered = np.zeros((70, 100), dtype=int)
+        for t in tiles:
+            covered[t.y0 : t.y1, t.x0 : t.x1] += 1
+            assert t.px0 == max(0, t.x0 - 4) and t.py1 == min(70, t.y1 + 4)
+        assert (covered == 1).all()
+        assert len(tiles) == 4 * 3
+
+    def test_zero_tile_is_whole_image(self) -> None:
+        (tile,) = plan_tiles(100, 70, 0, 10)
+        assert (tile.x0, tile.y0, tile.x1, tile.y1) == (0, 0, 100, 70)
+        assert (tile.px0, tile.py0, tile.px1, tile.py1) == (0, 0, 100, 70)
+
+
+class TestUpscaleTiles:
+    def test_stitching_matches_whole_image(self) -> None:
+        rgb = random_rgb(50, 70)
+        upscale, _ = nearest(4)
+        whole, _ = nearest(4)
+        output, total, skipped = upscale_tiles(rgb, None, 4, 16, 3, upscale)
+        assert np.array_equal(output, whole(rgb))
+        assert (total, skipped) == (20, 0)
+
+    def test_transparent_tiles_are_skipped(self) -> None:
+        rgb = random_rgb(64, 64)
+        alpha = np.zeros((64, 64), dtype=np.uint8)
+        alpha[2:10, 2:10] = 255
+        upscale, calls = nearest(2)
+        output, total, skipped = upscale_tiles(rgb, alpha, 2, 16, 2, upscale)
+
+        assert (total, skipped) == (16, 15)
+        assert len(calls) == 1
+        # O bloco visivel sai igual ao upscale direto; os pulados ficam pretos.
+        assert np.array_equal(output[:32, :32], np.repeat(np.repeat(rgb[:16, :16], 2, 0), 2, 1))
+        assert not output[32:, :].any() and not output[:, 32:].any()
+
+    def test_padding_keeps_neighbours_of_content(self) -> None:
+        alpha = np.zeros((64, 64), dtype=np.uint8)
+        alpha[17, 17] = 255
+        tiles = plan_tiles(64, 64, 16, 2)
+        visible = [t for t in tiles if is_visible(t, alpha)]
+        # O pixel fica a 1 px da borda do bloco vizinho: o contexto o inclui tambem.
+        assert {(t.x0, t.y0) for t in visible} == {(0, 0), (16, 0), (0, 16), (16, 16)}
+
+    def test_parallel_mapping_matches_sequential(self) -> None:
+        rgb = random_rgb(90, 60)
+        alpha = np.zeros((90, 60), dtype=np.uint8)
+        alpha[10:80, 5:40] = 200
+        upscale, _ = nearest(4)
+        sequential, *_ = upscale_tiles(rgb, alpha, 4, 16, 4, upscale)
+        with ThreadPool(3) as pool:
+            parallel, total, skipped = upscale_tiles(
+                rgb, alpha, 4, 16, 4, map_patches=lambda patches: pool.imap(upscale, patches)
+            )
+        assert np.array_equal(parallel, sequential)
+        assert skipped > 0 and total == 24
+
+
+class TestSplitTile:
+    def test_gives_enough_parts(self) -> None:
+        for width, height, parts in [(640, 480, 8), (100, 3000, 4), (7, 7, 9), (1000, 1000, 1)]:
+            side = split_tile(width, height, parts)
+            tiles = plan_tiles(width, height, side, 0)
+            assert len(tiles) >= parts
+        assert split_tile(1000, 1000, 1) == 1000
@@ -0,0 +1,63 @@
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from src.cli import build_parser, build_post_processing_opts
+from src.core.admission import upscale_model_for
+from src.core.processor import ImageProcessor
+from src.utils.memory import estimate_peak_bytes
+from src.workers.upscale_models import UPSCALE_MODELS, model_choices, model_source, select_model
+
+
+class TestSelectModel:
+    @pytest.mark.parametrize(
+        ("factor", "choice", "expected"),
+        [
+            (2, "auto", "RealESRGAN_x2plus"),
+            (3, "auto", "RealESRGAN_x4plus"),
+            (4, "quality", "RealESRGAN_x4plus"),
+            (2, "fast", "realesr-general-x4v3"),
+            (2, "RealESRGAN_x4plus", "RealESRGAN_x4plus"),
+        ],
+    )
+    def test_choice(self, factor: int, choice: str, expected: str) -> None:
+        assert select_model(factor, choice).name == expected
+
+    def test_native_scale_matches_factor_when_available(self) -> None:
+        assert select_model(2).scale == 2
+        assert select_model(4).scale == 4
+
+    def test_local_weights_take_priority(self, temp_dir: Path) -> None:
+        model = UPSCALE_MODELS["RealESRGAN_x2plus"]
+        assert model_source(model, str(temp_dir)) == model.url
+        (temp_dir / model.filename).write_bytes(b"pesos")
+        assert model_source(model, str(temp_dir)) == str(temp_dir / model.filename)
+
+
+class TestUpscaleModelInPipeline:
+    def test_options_override_setting(self) -> None:
+        assert upscale_model_for({"upscale_factor": 2, "upscale_model": "fast"}).name == "realesr-general-x4v3"
+        assert upscale_model_for({"upscale_factor": 4}, factor=2).name == "RealESRGAN_x2plus"
+
+    def test_native_x2_estimate_is_lower(self) -> None:
+        legacy = UPSCALE_MODELS["RealESRGAN_x4plus"]
+        native = UPSCALE_MODELS["RealESRGAN_x2plus"]
+        assert estimate_peak_bytes(
+            2000, 1500, 2, 512, model_scale=native.scale, tile_bytes_per_pixel=native.tile_bytes_per_pixel
+        ) < estimate_peak_bytes(
+            2000, 1500, 2, 512, model_scale=legacy.scale, tile_bytes_per_pixel=legacy.tile_bytes_per_pixel
+        )
+
+    def test_model_is_part_of_stage_cache_key(self, temp_dir: Path) -> None:
+        def params(choice: str) -> dict[str, Any]:
+            opts = {"upscale_factor": 2, "upscale_model": choice}
+            return ImageProcessor(str(temp_dir / "a.png"), "u2net", "png", 75, 512, opts)._stage_params("upscale")
+
+        assert params("auto")["model"] == "RealESRGAN_x2plus"
+        assert params("auto") != params("fast")
+
+    def test_cli_option(self) -> None:
+        args = build_parser().parse_args(["x", "--upscale", "2", "--upscale-model", "fast"])
+        assert build_post_processing_opts(args)["upscale_model"] == "fast"
+        assert set(model_choices()) >= {"auto", "quality", "fast", *UPSCALE_MODELS}
@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from src.cli import build_parser, run_watch
+from src.core.job_queue import JobQueue
+from src.core.processor import ImageProcessor
+from src.core.watcher import FolderWatcher, WatchService
+
+
+def write_image(path: Path, color: tuple[int, int, int] = (255, 0, 0)) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", (16, 16), color).save(path)
+    return path
+
+
+def fake_rembg(input_path: str, output_path: str) -> bool:
+    Image.open(input_path).convert("RGBA").save(output_path)
+    return True
+
+
+class TestFolderWatcher:
+    def test_file_is_ready_only_after_settle(self, temp_dir: Path) -> None:
+        watcher = FolderWatcher(str(temp_dir), settle_seconds=2.0)
+        path = write_image(temp_dir / "a.png")
+
+        assert watcher.poll(now=0.0) == []
+        assert watcher.poll(now=1.0) == []
+        assert watcher.poll(now=2.5) == [str(path)]
+        assert watcher.poll(now=10.0) == []
+
+    def test_growing_file_restarts_settle(self, temp_dir: Path) -> None:
+        watcher = FolderWatcher(str(temp_dir), settle_seconds=2.0)
+        path = temp_dir / "a.png"
+        path.write_bytes(b"\x89PNG parcial")
+        watcher.poll(now=0.0)
+        write_image(path)
+
+        assert watcher.poll(now=3.0) == []
+        assert watcher.poll(now=5.5) == [str(path)]
+
+    def test_rewritten_file_is_delivered_again(self, temp_dir: Path) -> None:
+        watcher = FolderWatcher(str(temp_dir), settle_seconds=0.0)
+        path = write_image(temp_dir / "a.png")
+        watcher.poll(now=0.0)
+        assert watcher.poll(now=1.0) == [str(path)]
+
+        write_image(path, (0, 255, 0))
+        os.utime(path, ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+        watcher.poll(now=2.0)
+        assert watcher.poll(now=3.0) == [str(path)]
+
+    def test_ignores_excluded_backups_and_other_files(self, temp_dir: Path) -> None:
+        watcher = FolderWatcher(str(temp_dir), settle_seconds=0.0, exclude=(str(temp_dir / "out"),))
+        keep = write_image(temp_dir / "sub" / "a.jpg")
+        write_image(temp_dir / "out" / "a.png")
+        write_image(temp_dir / "b.bak.png")
+        (temp_dir / "notes.txt").write_text("x")
+
+        watcher.poll(now=0.0)
+        assert watcher.poll(now=1.0) == [str(keep)]
+
+
+class TestWatchService:
+    def test_concurrency_is_bounded(self, temp_dir: Path) -> None:
+        for i in range(6):
+            write_image(temp_dir / f"{i}.png", (i * 40, 0, 0))
+        active: list[int] = [0]
+        peak: list[int] = [0]
+        done: list[str] = []
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def handle(path: str) -> None:
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+                done.append(path)
+                if len(done) == 6:
+                    stop.set()
+
+        service = WatchService(FolderWatcher(str(temp_dir), settle_seconds=0.0), handle, concurrency=2, interval=0.01)
+        service.run(stop)
+
+        assert len(done) == 6
+        assert peak[0] <= 2
+        assert service.processed == 6
+
+
+class TestRunWatch:
+    def test_arrivals_are_processed_into_output_dir(self, temp_dir: Path, capsys: pytest.CaptureFixture[str]) -> None:
+        watch: Path = temp_dir / "in"
+        watch.mkdir()
+        args = build_parser().parse_args(
+            ["--watch", str(watch), "-o", str(temp_dir / "out"), "--settle", "0", "--interval", "0.01"]
+        )
+        queue = JobQueue(str(temp_dir / "jobs.sqlite3"))
+        stop = threading.Event()
+
+        with (
+            patch.dict("src.core.processor.PATHS", {"REMBG_PYTHON": "python"}, clear=True),
+            patch.object(ImageProcessor, "_run_rembg", side_effect=fake_rembg),
+            patch("src.cli.keep_workers_warm"),
+        ):
+            thread = threading.Thread(target=run_watch, args=(args, queue, stop))
+            thread.start()
+            write_image(watch / "sub" / "a.jpg")
+            deadline: float = time.monotonic() + 10
+            while not (temp_dir / "out" / "sub" / "a.png").exists() and time.monotonic() < deadline:
+                time.sleep(0.02)
+            stop.set()
+            thread.join(timeout=10)
+        queue.close()
+
+        assert (temp_dir / "out" / "sub" / "a.png").exists()
+        assert (watch / "sub" / "a.jpg").exists()
+        line = json.loads(capsys.readouterr().out.splitlines()[0])
+        assert line["status"] == "ok" and line["input"] == str(watch / "sub" / "a.jpg")
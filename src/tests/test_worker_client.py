@@ -0,0 +1,126 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from src.core.worker_client import PersistentWorker, WorkerError, WorkerPool, get_worker_pool, shutdown_workers
+
+WORKERS_DIR: str = str(Path(__file__).parent.parent / "workers")
+
+FAKE_WORKER: str = f"""
+import os
+import sys
+sys.path.insert(0, {WORKERS_DIR!r})
+from protocol import serve
+
+def echo(request):
+    print("ruido de biblioteca no stdout")
+    return {{"echo": request["value"], "pid": os.getpid()}}
+
+def fail(request):
+    raise ValueError("falha proposital")
+
+idle = float(sys.argv[sys.argv.index("--idle-timeout") + 1])
+serve({{"echo": echo, "fail": fail}}, idle_timeout=idle)
+"""
+
+
+@pytest.fixture
+def fake_worker_script(temp_dir: Path) -> str:
+    script: Path = temp_dir / "fake_worker.py"
+    script.write_text(FAKE_WORKER)
+    return str(script)
+
+
+class TestPersistentWorker:
+    def test_request_round_trip(self, fake_worker_script: str) -> None:
+        worker: PersistentWorker = PersistentWorker(sys.executable, fake_worker_script)
+        try:
+            assert worker.request("echo", value=42)["echo"] == 42
+        finally:
+            worker.close()
+
+    def test_process_is_reused(self, fake_worker_script: str) -> None:
+        worker: PersistentWorker = PersistentWorker(sys.executable, fake_worker_script)
+        try:
+            first = worker.request("echo", value=1)["pid"]
+            second = worker.request("echo", value=2)["pid"]
+            assert first == second
+        finally:
+            worker.close()
+
+    def test_handler_error_raises_and_keeps_worker(self, fake_worker_script: str) -> None:
+        worker: PersistentWorker = PersistentWorker(sys.executable, fake_worker_script)
+        try:
+            with pytest.raises(WorkerError, match="falha proposital"):
+                worker.request("fail")
+            assert worker.request("echo", value="ok")["echo"] == "ok"
+        finally:
+            worker.close()
+
+    def test_unknown_op(self, fake_worker_script: str) -> None:
+        worker: PersistentWorker = PersistentWorker(sys.executable, fake_worker_script)
+        try:
+            with pytest.raises(WorkerError, match="desconhecida"):
+                worker.request("nope")
+        finally:
+            worker.close()
+
+    def test_restarts_after_idle_exit(self, fake_worker_script: str) -> None:
+        worker: PersistentWorker = PersistentWorker(sys.executable, fake_worker_script, idle_timeout=0.2)
+        try:
+            first = worker.request("echo", value=1)["pid"]
+            assert worker.process is not None
+            worker.process.wait(timeout=5)
+            second = worker.request("echo", value=2)["pid"]
+            assert first != second
+        finally:
+            worker.close()
+
+    def test_close_stops_process(self, fake_worker_script: str) -> None:
+        worker: PersistentWorker = PersistentWorker(sys.executable, fake_worker_script)
+        worker.request("echo", value=1)
+        worker.close()
+        assert not worker.is_alive()
+
+    def test_missing_executable(self, fake_worker_script: str) -> None:
+        worker: PersistentWorker = PersistentWorker("/nonexistent/python", fake_worker_script)
+        with pytest.raises(WorkerError):
+            worker.request("echo", value=1)
+
+
+class TestWorkerPool:
+    def test_pool_spreads_concurrent_requests(self, fake_worker_script: str) -> None:
+        pool: WorkerPool = WorkerPool(sys.executable, fake_worker_script)
+        pool.resize(3)
+        try:
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                with pool.acquire() as a, pool.acquire() as b:
+                    pids = {a.request("echo", value=1)["pid"], b.request("echo", value=2)["pid"]}
+                    third = executor.submit(pool.request, "echo", value=3).result(timeout=30)
+                    pids.add(third["pid"])
+            assert len(pids) == 3
+        finally:
+            pool.close()
+
+    def test_resize_only_grows_and_limits_threads(self, fake_worker_script: str) -> None:
+        pool: WorkerPool = WorkerPool(sys.executable, fake_worker_script)
+        pool.resize(2)
+        pool.resize(1)
+        assert pool.size == 2
+        assert all(worker.env and "OMP_NUM_THREADS" in worker.env for worker in pool.workers)
+
+
+class TestShutdownWorkers:
+    def test_shutdown_closes_registered_workers(self, fake_worker_script: str) -> None:
+        pool: WorkerPool = get_worker_pool(sys.executable, fake_worker_script)
+        pool.request("echo", value=1)
+        worker: PersistentWorker = pool.workers[0]
+        assert worker.is_alive()
+
+        shutdown_workers()
+
+        assert not worker.is_alive()
+        assert get_worker_pool(sys.executable, fake_worker_script) is not pool
+        shutdown_workers()
@@ -1,10 +1,63 @@
+import importlib
 import subprocess
 import sys
 from pathlib import Path
+from types import ModuleType, SimpleNamespace
+from typing import Any
 
+import numpy as np
 import pytest
 from PIL import Image
 
+WORKERS_DIR: Path = Path(__file__).resolve().parents[1] / "workers"
+
+
+class FakeInnerSession:
+    # Rede falsa com lote dinamico: cada item do lote vira uma mascara 320x320 que so depende
+    # dele (canal 0 ao quadrado), entao lote e quadro a quadro tem de dar o mesmo resultado.
+    def __init__(self, accepts_batches: bool = True) -> None:
+        self.accepts_batches: bool = accepts_batches
+        self.batch_sizes: list[int] = []
+
+    def get_inputs(self) -> list[SimpleNamespace]:
+        return [SimpleNamespace(name="input.1")]
+
+    def run(self, output_names: Any, feed: dict[str, np.ndarray]) -> list[np.ndarray]:
+        batch: np.ndarray = feed["input.1"]
+        self.batch_sizes.append(len(batch))
+        if len(batch) > 1 and not self.accepts_batches:
+            raise ValueError("dimensao de lote fixa")
+        return [batch[:, :1] ** 2]
+
+
+@pytest.fixture
+def worker_rembg(temp_dir: Path, monkeypatch: pytest.MonkeyPatch) -> ModuleType:
+    monkeypatch.setenv("U2NET_HOME", str(temp_dir / "u2net"))
+    monkeypatch.syspath_prepend(str(WORKERS_DIR))
+    module: ModuleType = importlib.import_module("worker_rembg")
+    monkeypatch.setattr(module, "_SESSIONS", {})
+    monkeypatch.setattr(module, "_UNBATCHABLE", set())
+    return module
+
+
+def fake_u2net_session(inner: FakeInnerSession) -> Any:
+    # Sessao real do rembg (normalize e predict originais) sobre a rede falsa.
+    from rembg.sessions.u2net import U2netSession
+
+    session = object.__new__(U2netSession)
+    session.inner_session = inner
+    return session
+
+
+def frames() -> list[Image.Image]:
+    # Tamanhos e faixas de cor diferentes: a normalizacao min-max e o redimensionamento sao por item.
+    rng: np.random.Generator = np.random.default_rng(0)
+    sizes: list[tuple[int, int]] = [(64, 48), (50, 70), (33, 33)]
+    return [
+        Image.fromarray(rng.integers(low, low + 90, (h, w, 3), dtype=np.uint8))
+        for (w, h), low in zip(sizes, (0, 80, 160), strict=True)
+    ]
+
 
 class TestWorkerBackground:
     def test_color_background(self, sample_image_with_transparency: Path, temp_dir: Path) -> None:
@@ -120,6 +173,53 @@ class TestWorkerRembg:
             assert output_path.exists()
 
 
+class TestRembgBatch:
+    def test_batch_matches_single_image_predict(self, worker_rembg: ModuleType) -> None:
+        inner = FakeInnerSession()
+        session = fake_u2net_session(inner)
+        worker_rembg._SESSIONS["u2net"] = session
+        images: list[Image.Image] = frames()
+
+        masks: list[Image.Image] = worker_rembg.predict_masks("u2net", images)
+
+        assert inner.batch_sizes == [3]
+        expected: list[Image.Image] = [session.predict(img)[0] for img in images]
+        for mask, reference, img in zip(masks, expected, images, strict=True):
+            assert mask.mode == "L" and mask.size == img.size
+            assert np.array_equal(np.asarray(mask), np.asarray(reference))
+
+    def test_rejected_batch_falls_back_to_single_images(self, worker_rembg: ModuleType) -> None:
+        inner = FakeInnerSession(accepts_batches=False)
+        session = fake_u2net_session(inner)
+        worker_rembg._SESSIONS["u2net"] = session
+        images: list[Image.Image] = frames()
+
+        masks: list[Image.Image] = worker_rembg.predict_masks("u2net", images)
+        # Depois da recusa, o modelo nao tenta lote de novo.
+        worker_rembg.predict_masks("u2net", images)
+
+        assert "u2net" in worker_rembg._UNBATCHABLE
+        assert inner.batch_sizes == [3, 1, 1, 1, 1, 1, 1]
+        expected: list[Image.Image] = [session.predict(img)[0] for img in images]
+        assert all(np.array_equal(np.asarray(m), np.asarray(e)) for m, e in zip(masks, expected, strict=True))
+
+    def test_batch_cutouts_match_single_image_path(self, worker_rembg: ModuleType, temp_dir: Path) -> None:
+        inputs: list[str] = []
+        for i, img in enumerate(frames()):
+            inputs.append(str(temp_dir / f"in_{i}.png"))
+            img.save(inputs[-1])
+        batched: list[str] = [str(temp_dir / f"lote_{i}.png") for i in range(len(inputs))]
+        single: list[str] = [str(temp_dir / f"unico_{i}.png") for i in range(len(inputs))]
+
+        worker_rembg._SESSIONS["u2net"] = fake_u2net_session(FakeInnerSession())
+        worker_rembg.remove_background_batch(inputs, batched, "u2net", 75)
+        worker_rembg._UNBATCHABLE.add("u2net")
+        worker_rembg.remove_background_batch(inputs, single, "u2net", 75)
+
+        for a, b in zip(batched, single, strict=True):
+            assert np.array_equal(np.asarray(Image.open(a)), np.asarray(Image.open(b)))
+
+
 class TestWorkerUpscale:
     @pytest.mark.slow
     def test_upscale(self, sample_image: Path, temp_dir: Path) -> None:
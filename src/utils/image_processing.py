@@ -3,61 +3,69 @@ from pathlib import Path
 
 import cv2
 import numpy as np
-from PIL import Image
+from numpy.typing import NDArray
+from PIL import Image, ImageOps
 
 logger: logging.Logger = logging.getLogger(__name__)
 
+# Nivel de compressao dos PNGs intermediarios: o custo do zlib em niveis altos domina
+# o tempo fora da IA em imagens grandes, e esses arquivos vivem apenas no diretorio temporario.
+INTERMEDIATE_PNG_COMPRESSION: int = 1
 
-def fill_internal_holes(processed_path: str, original_path: str) -> bool:
-    try:
-        img = cv2.imread(processed_path, cv2.IMREAD_UNCHANGED)
-        if img is None:
-            raise ValueError("Erro ao ler imagem processada")
 
-        if img.shape[2] == 4:
-            alpha = img[:, :, 3]
-        else:
-            alpha = np.zeros((img.shape[0], img.shape[1]), dtype=np.uint8)
+def load_rgba(path: str, oriented: bool = False) -> NDArray[np.uint8]:
+    with Image.open(path) as img:
+        # oriented aplica a rotacao EXIF, como o rembg faz com a entrada antes da inferencia.
+        return np.array((ImageOps.exif_transpose(img) if oriented else img).convert("RGBA"), dtype=np.uint8)
+
+
+def save_rgba(image: NDArray[np.uint8], path: str, intermediate: bool = False) -> None:
+    pil_img: Image.Image = Image.fromarray(image, "RGBA")
+    if intermediate:
+        pil_img.save(path, compress_level=INTERMEDIATE_PNG_COMPRESSION)
+    else:
+        pil_img.save(path)
+
+
+def fill_internal_holes_array(image: NDArray[np.uint8], original: NDArray[np.uint8]) -> NDArray[np.uint8]:
+    try:
+        if image.ndim != 3 or image.shape[2] != 4:
+            raise ValueError("Imagem processada sem canal alfa")
+        img: NDArray[np.uint8] = image.copy()
+        alpha = img[:, :, 3]
 
         contours, _ = cv2.findContours(alpha, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         filled_mask = np.zeros_like(alpha)
         cv2.drawContours(filled_mask, contours, -1, 255, -1)
 
-        original_img = cv2.imread(original_path, cv2.IMREAD_UNCHANGED)
-        if original_img is None:
-            raise ValueError("Erro ao ler imagem original")
+        if original.shape[:2] != img.shape[:2]:
+            original = cv2.resize(original, (img.shape[1], img.shape[0]))
 
-        if original_img.shape[:2] != img.shape[:2]:
-            original_img = cv2.resize(original_img, (img.shape[1], img.shape[0]))
-
-        if original_img.shape[2] == 3:
-            original_img = cv2.cvtColor(original_img, cv2.COLOR_BGR2BGRA)
+        if original.ndim == 2:
+            original = cv2.cvtColor(original, cv2.COLOR_GRAY2BGRA)
+        elif original.shape[2] == 3:
+            original = cv2.cvtColor(original, cv2.COLOR_BGR2BGRA)
 
         holes_mask = (filled_mask > 0) & (alpha < 10)
-        img[holes_mask] = original_img[holes_mask]
-        cv2.imwrite(processed_path, img)
+        img[holes_mask] = original[holes_mask]
         logger.info("Buracos internos preenchidos com sucesso.")
-        return True
+        return img
 
     except Exception as e:
         logger.error(f"Falha ao preencher buracos: {e}")
-        return False
+        return image
 
 
-def remove_external_noise(image_path: str) -> bool:
+def remove_external_noise_array(image: NDArray[np.uint8]) -> NDArray[np.uint8]:
     try:
-        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
-        if img is None:
-            raise ValueError("Erro ao ler imagem")
+        if image.ndim != 3 or image.shape[2] != 4:
+            return image
 
-        if img.shape[2] != 4:
-            return True
-
-        alpha = img[:, :, 3]
+        alpha = image[:, :, 3]
         contours, _ = cv2.findContours(alpha, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
         if not contours:
-            return True
+            return image
 
         _, binary = cv2.threshold(alpha, 10, 255, cv2.THRESH_BINARY)
         kernel = np.ones((5, 5), np.uint8)
@@ -75,37 +83,67 @@ def remove_external_noise(image_path: str) -> bool:
             mask = np.zeros_like(alpha)
             cv2.drawContours(mask, [largest], -1, 255, -1)
 
+        img: NDArray[np.uint8] = image.copy()
         img[:, :, 3] = cv2.bitwise_and(alpha, mask)
-        cv2.imwrite(image_path, img)
         logger.info("Ruidos externos removidos.")
-        return True
+        return img
 
     except Exception as e:
         logger.error(f"Falha ao limpar ruidos: {e}")
+        return image
+
+
+def trim_to_content_array(image: NDArray[np.uint8], threshold: int = 15) -> NDArray[np.uint8] | None:
+    alpha = image[:, :, 3]
+
+    rows = np.any(alpha > threshold, axis=1)
+    cols = np.any(alpha > threshold, axis=0)
+
+    if not (rows.any() and cols.any()):
+        logger.warning("Imagem vazia ou totalmente transparente.")
+        return None
+
+    ymin, ymax = np.where(rows)[0][[0, -1]]
+    xmin, xmax = np.where(cols)[0][[0, -1]]
+
+    cropped: NDArray[np.uint8] = image[ymin : ymax + 1, xmin : xmax + 1]
+    logger.info(f"Imagem recortada. Novo tamanho: {(cropped.shape[1], cropped.shape[0])}")
+    return cropped
+
+
+def fill_internal_holes(processed_path: str, original_path: str) -> bool:
+    img = cv2.imread(processed_path, cv2.IMREAD_UNCHANGED)
+    original_img = cv2.imread(original_path, cv2.IMREAD_UNCHANGED)
+    if img is None or original_img is None:
+        logger.error("Falha ao preencher buracos: erro ao ler imagem")
         return False
 
+    result = fill_internal_holes_array(img, original_img)
+    if result is img:
+        return False
+    cv2.imwrite(processed_path, result)
+    return True
 
-def trim_to_content(image_path: str, threshold: int = 15) -> bool:
-    try:
-        with Image.open(image_path) as img:
-            img = img.convert("RGBA")
-            data = np.array(img)
-            alpha = data[:, :, 3]
 
-            rows = np.any(alpha > threshold, axis=1)
-            cols = np.any(alpha > threshold, axis=0)
+def remove_external_noise(image_path: str) -> bool:
+    img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        logger.error("Falha ao limpar ruidos: erro ao ler imagem")
+        return False
 
-            if not (rows.any() and cols.any()):
-                logger.warning("Imagem vazia ou totalmente transparente.")
-                return False
+    result = remove_external_noise_array(img)
+    if result is not img:
+        cv2.imwrite(image_path, result)
+    return True
 
-            ymin, ymax = np.where(rows)[0][[0, -1]]
-            xmin, xmax = np.where(cols)[0][[0, -1]]
 
-            cropped = img.crop((xmin, ymin, xmax + 1, ymax + 1))
-            cropped.save(image_path)
-            logger.info(f"Imagem recortada. Novo tamanho: {cropped.size}")
-            return True
+def trim_to_content(image_path: str, threshold: int = 15) -> bool:
+    try:
+        cropped = trim_to_content_array(load_rgba(image_path), threshold)
+        if cropped is None:
+            return False
+        save_rgba(cropped, image_path)
+        return True
 
     except Exception as e:
         logger.error(f"Falha ao recortar imagem: {e}")
@@ -0,0 +1,216 @@
+import logging
+import os
+import threading
+import time
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+def available_memory_bytes() -> int | None:
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        logger.warning("Nao foi possivel determinar a memoria disponivel.")
+        return None
+
+
+# Modelo de memoria de pico de um job, em bytes por pixel. Os valores sao aproximados e devem
+# ser calibrados pelo log "estimativa x crescimento do RSS" do src/core/admission.py.
+# Entrada decodificada, mascara, copias RGBA da limpeza e o float32 do alpha matting.
+BASE_BYTES_PER_PIXEL: int = 24
+# O RealESRGANer monta a saida inteira na escala do modelo (4x no x4plus, 2x no x2plus) em
+# float32 RGB antes de reduzir para `outscale`; depois vem o resultado RGBA uint8 e o alfa
+# redimensionado.
+UPSCALE_MODEL_SCALE: int = 4
+UPSCALE_FLOAT_RGB_BYTES: int = 3 * 4
+UPSCALE_OUTPUT_BYTES_PER_PIXEL: int = 4 + 1
+# Ativacoes do RRDBNet por pixel do bloco: 64 canais float32 no tronco denso e nas duas
+# ampliacoes de 2x, onde o bloco ja esta 16x maior.
+UPSCALE_TILE_BYTES_PER_PIXEL: int = 10 * 1024
+UPSCALE_TILE_PAD: int = 10
+# Cada processo extra do upscale em blocos paralelos carrega o proprio torch e o modelo.
+UPSCALE_PROCESS_BYTES: int = 700 * 1024**2
+# Sombra e fundo trabalham sobre a imagem final: algumas copias RGBA.
+POST_BYTES_PER_PIXEL: int = 12
+# Animacoes sao decodificadas em fluxo; so uma janela de quadros fica em memoria ao mesmo tempo.
+ANIMATION_WINDOW_FRAMES: int = 16
+
+
+def upscale_image_bytes(width: int, height: int, upscale_factor: int, model_scale: int = UPSCALE_MODEL_SCALE) -> int:
+    # Parte do upscale que depende da imagem inteira, qualquer que seja o bloco.
+    pixels: int = width * height
+    return (
+        pixels * model_scale**2 * UPSCALE_FLOAT_RGB_BYTES + pixels * upscale_factor**2 * UPSCALE_OUTPUT_BYTES_PER_PIXEL
+    )
+
+
+def upscale_tile_bytes(
+    tile_size: int, width: int, height: int, bytes_per_pixel: int = UPSCALE_TILE_BYTES_PER_PIXEL
+) -> int:
+    # Bloco 0 desliga a divisao: a imagem inteira passa pela rede de uma vez.
+    tile_w: int = min(tile_size, width) if tile_size > 0 else width
+    tile_h: int = min(tile_size, height) if tile_size > 0 else height
+    return (tile_w + 2 * UPSCALE_TILE_PAD) * (tile_h + 2 * UPSCALE_TILE_PAD) * bytes_per_pixel
+
+
+def estimate_peak_bytes(
+    width: int,
+    height: int,
+    upscale_factor: int = 0,
+    tile_size: int = 0,
+    frames: int = 1,
+    inference_bytes: int = 0,
+    model_scale: int = UPSCALE_MODEL_SCALE,
+    tile_bytes_per_pixel: int = UPSCALE_TILE_BYTES_PER_PIXEL,
+    upscale_processes: int = 1,
+) -> int:
+    pixels: int = width * height
+    out_pixels: int = pixels * max(1, upscale_factor) ** 2
+    per_frame: int = pixels * BASE_BYTES_PER_PIXEL + out_pixels * POST_BYTES_PER_PIXEL
+    tile_bytes: int = 0
+    if upscale_factor > 0:
+        per_frame += upscale_image_bytes(width, height, upscale_factor, model_scale)
+        # Com N processos, N blocos ficam na rede ao mesmo tempo.
+        processes: int = max(1, upscale_processes)
+        tile_bytes = upscale_tile_bytes(tile_size, width, height, tile_bytes_per_pixel) * processes
+        tile_bytes += (processes - 1) * UPSCALE_PROCESS_BYTES
+    window: int = max(1, min(frames, ANIMATION_WINDOW_FRAMES))
+    return per_frame * window + tile_bytes + inference_bytes
+
+
+class MemoryBudget:
+    # Reserva de memoria entre jobs simultaneos. Um job so entra se couber no que sobra do
+    # limite; um job maior que o limite inteiro ainda roda, mas sozinho, para nao travar a fila.
+    def __init__(self, limit_bytes: int) -> None:
+        self.limit_bytes: int = limit_bytes
+        self.used_bytes: int = 0
+        self._condition: threading.Condition = threading.Condition()
+
+    def _fits(self, size: int) -> bool:
+        return self.used_bytes == 0 or self.used_bytes + size <= self.limit_bytes
+
+    def try_reserve(self, size: int) -> bool:
+        with self._condition:
+            if not self._fits(size):
+                return False
+            self.used_bytes += size
+            return True
+
+    def reserve(self, size: int) -> None:
+        with self._condition:
+            self._condition.wait_for(lambda: self._fits(size))
+            self.used_bytes += size
+
+    def release(self, size: int) -> None:
+        with self._condition:
+            self.used_bytes = max(0, self.used_bytes - size)
+            self._condition.notify_all()
+
+
+def _proc_children() -> dict[int, list[int]]:
+    children: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # O nome do processo pode ter espacos; o ppid vem logo apos o ")" final.
+                ppid: int = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def process_tree_rss_bytes(pid: int | None = None) -> int | None:
+    # RSS do processo e de todos os descendentes (os workers sao subprocessos).
+    root: int = pid or os.getpid()
+    try:
+        children: dict[int, list[int]] = _proc_children()
+    except OSError:
+        return None
+    page_size: int = os.sysconf("SC_PAGE_SIZE")
+    total: int = 0
+    stack: list[int] = [root]
+    while stack:
+        current: int = stack.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+        stack.extend(children.get(current, []))
+    return total
+
+
+class RssWindow:
+    # Janela de medicao de um job: RSS da arvore na abertura e maior valor visto depois. O
+    # crescimento (pico - base) desconta o que ja estava carregado, como pools de workers quentes.
+    def __init__(self, baseline: int) -> None:
+        self.baseline: int = baseline
+        self.peak_bytes: int = baseline
+        # Maior numero de janelas abertas ao mesmo tempo: com jobs simultaneos, o crescimento
+        # inclui o dos vizinhos.
+        self.concurrent: int = 1
+
+    @property
+    def growth_bytes(self) -> int:
+        return max(0, self.peak_bytes - self.baseline)
+
+
+class RssSampler:
+    # Uma thread por processo amostra o RSS da arvore enquanto houver janelas abertas, qualquer
+    # que seja o numero de jobs; sem janelas, a thread termina.
+    def __init__(self, interval: float = 0.25) -> None:
+        self.interval: float = interval
+        self._windows: list[RssWindow] = []
+        self._lock: threading.Lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def _sample(self) -> None:
+        rss: int | None = process_tree_rss_bytes()
+        if rss is None:
+            return
+        with self._lock:
+            for window in self._windows:
+                window.peak_bytes = max(window.peak_bytes, rss)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._windows:
+                    self._thread = None
+                    return
+            self._sample()
+
+    def open(self) -> RssWindow | None:
+        baseline: int | None = process_tree_rss_bytes()
+        if baseline is None:
+            return None
+        window = RssWindow(baseline)
+        with self._lock:
+            self._windows.append(window)
+            for other in self._windows:
+                other.concurrent = max(other.concurrent, len(self._windows))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="fogstripper-rss", daemon=True)
+                self._thread.start()
+        return window
+
+    def close(self, window: RssWindow | None) -> int | None:
+        if window is None:
+            return None
+        self._sample()
+        with self._lock:
+            if window in self._windows:
+                self._windows.remove(window)
+        return window.growth_bytes
@@ -0,0 +1,55 @@
+import os
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+from numpy.typing import NDArray
+
+# Backend do upscale sem torch: a rede exportada pelo worker_upscale.py --export-onnx roda no
+# onnxruntime, que o projeto ja usa no rembg. A interface imita o RealESRGANer (scale, tile_size,
+# enhance) para que os blocos e o recorte pelo alfa de tiling.py sirvam aos dois backends.
+
+
+def onnx_model_path(model: str, models_dir: str) -> str:
+    return os.path.join(os.path.expanduser(models_dir), f"{model}.onnx")
+
+
+def session_options() -> ort.SessionOptions:
+    # Mesma regra do new_session do rembg: OMP_NUM_THREADS (a fatia de nucleos que o WorkerPool
+    # da a cada worker) limita as threads das duas filas do onnxruntime.
+    options: ort.SessionOptions = ort.SessionOptions()
+    if "OMP_NUM_THREADS" in os.environ:
+        options.inter_op_num_threads = int(os.environ["OMP_NUM_THREADS"])
+        options.intra_op_num_threads = int(os.environ["OMP_NUM_THREADS"])
+    return options
+
+
+class OnnxUpsampler:
+    def __init__(self, model_path: str, scale: int) -> None:
+        self.scale: int = scale
+        self.tile_size: int = 0
+        self.session: ort.InferenceSession = ort.InferenceSession(
+            model_path, sess_options=session_options(), providers=ort.get_available_providers()
+        )
+        self.input_name: str = self.session.get_inputs()[0].name
+
+    def enhance(self, img: NDArray[np.uint8], outscale: int | None = None) -> tuple[NDArray[np.uint8], str]:
+        # Replica o RealESRGANer.enhance para RGB uint8, inclusive a troca de canais: ele espera
+        # BGR e inverte a ordem antes e depois da rede, entao a paridade com o torch depende disso.
+        height, width = img.shape[:2]
+        x: NDArray[np.float32] = (img.astype(np.float32) / 255.0)[:, :, ::-1]
+        x = np.ascontiguousarray(np.transpose(x, (2, 0, 1))[None])
+        # O RRDBNet x2 usa pixel_unshuffle: altura e largura precisam ser pares (x1 usaria 4).
+        mod: int = {1: 4, 2: 2}.get(self.scale, 0)
+        pad_h: int = (mod - height % mod) % mod if mod else 0
+        pad_w: int = (mod - width % mod) % mod if mod else 0
+        if pad_h or pad_w:
+            x = np.pad(x, ((0, 0), (0, 0), (0, pad_h), (0, pad_w)), mode="reflect")
+        output: NDArray[np.float32] = self.session.run(None, {self.input_name: x})[0][0]
+        output = output[:, : height * self.scale, : width * self.scale]
+        result: NDArray[np.uint8] = (
+            (np.transpose(np.clip(output, 0, 1)[::-1], (1, 2, 0)) * 255.0).round().astype(np.uint8)
+        )
+        if outscale is not None and outscale != self.scale:
+            result = cv2.resize(result, (width * outscale, height * outscale), interpolation=cv2.INTER_LANCZOS4)
+        return result, "RGB"
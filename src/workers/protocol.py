@@ -0,0 +1,69 @@
+import json
+import os
+import select
+import sys
+import traceback
+from collections.abc import Callable
+from typing import Any, TextIO
+
+Handler = Callable[[dict[str, Any]], dict[str, Any]]
+
+
+def _open_protocol_stream() -> TextIO:
+    # O canal de respostas e uma copia do stdout original; o stdout do processo
+    # passa a apontar para o stderr para que prints de bibliotecas nao corrompam o protocolo.
+    stream: TextIO = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    return stream
+
+
+def _write(stream: TextIO, payload: dict[str, Any]) -> None:
+    stream.write(json.dumps(payload) + "\n")
+    stream.flush()
+
+
+def serve(handlers: dict[str, Handler], idle_timeout: float = 0) -> None:
+    out: TextIO = _open_protocol_stream()
+    _write(out, {"id": None, "ok": True, "ready": True})
+
+    while True:
+        if idle_timeout > 0:
+            readable, _, _ = select.select([sys.stdin], [], [], idle_timeout)
+            if not readable:
+                sys.stderr.write(f"Worker ocioso por {idle_timeout}s, encerrando.\n")
+                return
+
+        line: str = sys.stdin.readline()
+        if not line:
+            return
+        if not line.strip():
+            continue
+
+        try:
+            request: dict[str, Any] = json.loads(line)
+        except json.JSONDecodeError as e:
+            _write(out, {"id": None, "ok": False, "error": f"Requisicao invalida: {e}"})
+            continue
+
+        request_id = request.get("id")
+        op: str = request.get("op", "")
+
+        if op == "shutdown":
+            _write(out, {"id": request_id, "ok": True})
+            return
+        if op == "ping":
+            _write(out, {"id": request_id, "ok": True})
+            continue
+
+        handler: Handler | None = handlers.get(op)
+        if handler is None:
+            _write(out, {"id": request_id, "ok": False, "error": f"Operacao desconhecida: {op}"})
+            continue
+
+        try:
+            result: dict[str, Any] = handler(request) or {}
+            _write(out, {"id": request_id, "ok": True, **result})
+        except Exception as e:
+            sys.stderr.write(traceback.format_exc())
+            _write(out, {"id": request_id, "ok": False, "error": str(e)})
@@ -0,0 +1,151 @@
+import math
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+from numpy.typing import NDArray
+
+# Divisao em blocos para o upscale, sem torch: roda nos workers de upscale (torch e ONNX) e nos testes. Cada bloco
+# vai para a rede com `pad` pixels de contexto de cada lado, e so o miolo volta para a saida,
+# entao as emendas ficam iguais as do tile_process do RealESRGANer.
+
+UpscaleFn = Callable[[NDArray[np.uint8]], NDArray[np.uint8]]
+# Aplica a rede a uma lista de blocos e devolve os resultados na mesma ordem (map, Pool.imap).
+PatchMapper = Callable[[list[NDArray[np.uint8]]], Iterable[NDArray[np.uint8]]]
+
+
+@dataclass(frozen=True)
+class Tile:
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+    px0: int
+    py0: int
+    px1: int
+    py1: int
+
+
+def alpha_bbox(alpha: NDArray[np.uint8], margin: int = 0) -> tuple[int, int, int, int] | None:
+    # (x0, y0, x1, y1) exclusivo dos pixels com alfa > 0, ampliado por `margin` e limitado a imagem.
+    rows: NDArray[np.intp] = np.flatnonzero(alpha.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols: NDArray[np.intp] = np.flatnonzero(alpha.any(axis=0))
+    height, width = alpha.shape[:2]
+    return (
+        max(0, int(cols[0]) - margin),
+        max(0, int(rows[0]) - margin),
+        min(width, int(cols[-1]) + 1 + margin),
+        min(height, int(rows[-1]) + 1 + margin),
+    )
+
+
+def plan_tiles(width: int, height: int, tile: int, pad: int) -> list[Tile]:
+    # Bloco 0 (ou maior que a imagem) vira um unico bloco sem contexto extra.
+    tile_w: int = tile if 0 < tile < width else width
+    tile_h: int = tile if 0 < tile < height else height
+    tiles: list[Tile] = []
+    for y0 in range(0, height, tile_h):
+        for x0 in range(0, width, tile_w):
+            x1, y1 = min(x0 + tile_w, width), min(y0 + tile_h, height)
+            tiles.append(
+                Tile(x0, y0, x1, y1, max(0, x0 - pad), max(0, y0 - pad), min(width, x1 + pad), min(height, y1 + pad))
+            )
+    return tiles
+
+
+def split_tile(width: int, height: int, parts: int) -> int:
+    # Maior bloco quadrado que divide a imagem em pelo menos `parts` pedacos, para repartir um
+    # upscale sem bloco (tile 0) entre varios processos.
+    side: int = max(1, math.ceil(math.sqrt(width * height / max(1, parts))))
+    while side > 1 and math.ceil(width / side) * math.ceil(height / side) < parts:
+        side -= 1
+    return side
+
+
+def is_visible(tile: Tile, alpha: NDArray[np.uint8]) -> bool:
+    # O contexto conta: um bloco vazio vizinho de conteudo ainda pode receber alfa pelo
+    # redimensionamento do canal alfa, entao so e pulado se o bloco com padding estiver vazio.
+    return bool(alpha[tile.py0 : tile.py1, tile.px0 : tile.px1].any())
+
+
+def upscale_tiles(
+    rgb: NDArray[np.uint8],
+    alpha: NDArray[np.uint8] | None,
+    scale: int,
+    tile: int,
+    pad: int,
+    upscale: UpscaleFn | None = None,
+    map_patches: PatchMapper | None = None,
+) -> tuple[NDArray[np.uint8], int, int]:
+    # Devolve a imagem ampliada `scale` vezes, o total de blocos e quantos foram pulados por
+    # serem totalmente transparentes (ficam pretos; o alfa ampliado os mantem invisiveis).
+    # Com `map_patches`, os blocos visiveis vao todos de uma vez, e quem mapeia decide se roda
+    # em sequencia ou em varios processos; a montagem e a mesma nos dois casos.
+    if map_patches is None:
+        if upscale is None:
+            raise ValueError("upscale ou map_patches e obrigatorio.")
+        map_patches = lambda patches: map(upscale, patches)  # noqa: E731
+    height, width = rgb.shape[:2]
+    output: NDArray[np.uint8] = np.zeros((height * scale, width * scale, 3), dtype=np.uint8)
+    tiles: list[Tile] = plan_tiles(width, height, tile, pad)
+    visible: list[Tile] = [t for t in tiles if alpha is None or is_visible(t, alpha)]
+    patches: list[NDArray[np.uint8]] = [rgb[t.py0 : t.py1, t.px0 : t.px1] for t in visible]
+    for t, patch in zip(visible, map_patches(patches), strict=True):
+        oy, ox = (t.y0 - t.py0) * scale, (t.x0 - t.px0) * scale
+        output[t.y0 * scale : t.y1 * scale, t.x0 * scale : t.x1 * scale] = patch[
+            oy : oy + (t.y1 - t.y0) * scale, ox : ox + (t.x1 - t.x0) * scale
+        ]
+    return output, len(tiles), len(tiles) - len(visible)
+
+
+def upscale_content(
+    rgb: NDArray[np.uint8],
+    alpha: NDArray[np.uint8] | None,
+    scale: int,
+    outscale: int,
+    tile: int,
+    pad: int,
+    upscale: UpscaleFn | None = None,
+    map_patches: PatchMapper | None = None,
+    min_tiles: int = 1,
+) -> tuple[NDArray[np.uint8], tuple[int, int, int, int] | None, int, int]:
+    # Depois da remocao de fundo quase todo o quadro e transparente: a rede so roda no retangulo
+    # com alfa > 0 (mais `pad` de contexto, que tambem cobre o vazamento do LANCZOS no alfa) e,
+    # dentro dele, nos blocos com algum pixel visivel. O resto do quadro ampliado fica preto sob
+    # alfa 0. Sem `alpha`, o quadro inteiro vai para a rede. Com bloco 0 e `min_tiles` > 1, o
+    # retangulo e dividido para repartir o trabalho entre processos.
+    # Devolve o quadro ampliado `outscale` vezes, o retangulo processado e o total/pulados de blocos.
+    height, width = rgb.shape[:2]
+    canvas: NDArray[np.uint8] = np.zeros((height * outscale, width * outscale, 3), dtype=np.uint8)
+    box: tuple[int, int, int, int] | None = (0, 0, width, height) if alpha is None else alpha_bbox(alpha, margin=pad)
+    if box is None:
+        return canvas, None, 0, 0
+    x0, y0, x1, y1 = box
+    if tile <= 0 and min_tiles > 1:
+        tile = split_tile(x1 - x0, y1 - y0, min_tiles)
+    upscaled, total, skipped = upscale_tiles(
+        rgb[y0:y1, x0:x1],
+        None if alpha is None else alpha[y0:y1, x0:x1],
+        scale,
+        tile,
+        pad,
+        upscale,
+        map_patches,
+    )
+    if outscale != scale:
+        # Mesma reducao do RealESRGANer.enhance quando `outscale` difere da escala da rede.
+        upscaled = cv2.resize(upscaled, ((x1 - x0) * outscale, (y1 - y0) * outscale), interpolation=cv2.INTER_LANCZOS4)
+    canvas[y0 * outscale : y1 * outscale, x0 * outscale : x1 * outscale] = upscaled
+    return canvas, box, total, skipped
+
+
+def content_summary(width: int, height: int, box: tuple[int, int, int, int] | None, total: int, skipped: int) -> str:
+    if box is None:
+        return "Imagem totalmente transparente; upscale da rede ignorado."
+    x0, y0, x1, y1 = box
+    return (
+        f"Upscale do conteudo {x1 - x0}x{y1 - y0} de {width}x{height}; {skipped}/{total} blocos transparentes pulados."
+    )
@@ -0,0 +1,66 @@
+import os
+from dataclasses import dataclass
+
+# Registro dos modelos de upscale, sem torch: o worker monta a rede a partir daqui e o nucleo
+# usa a escala nativa para a estimativa de memoria e a chave do cache de estagios.
+
+RELEASES: str = "https://github.com/xinntao/Real-ESRGAN/releases/download"
+
+
+@dataclass(frozen=True)
+class UpscaleModel:
+    name: str
+    arch: str  # "rrdb" (RRDBNet) ou "srvgg" (SRVGGNetCompact)
+    scale: int
+    url: str
+    # Blocos RRDB ou camadas conv do SRVGG.
+    depth: int
+    # Ativacoes por pixel de entrada do bloco, para a estimativa de memoria.
+    tile_bytes_per_pixel: int
+
+    @property
+    def filename(self) -> str:
+        return os.path.basename(self.url)
+
+
+UPSCALE_MODELS: dict[str, UpscaleModel] = {
+    model.name: model
+    for model in (
+        UpscaleModel("RealESRGAN_x4plus", "rrdb", 4, f"{RELEASES}/v0.1.0/RealESRGAN_x4plus.pth", 23, 10 * 1024),
+        # O x2plus roda o mesmo tronco sobre a entrada reduzida por pixel_unshuffle: cerca de um
+        # quarto das ativacoes do x4plus.
+        UpscaleModel("RealESRGAN_x2plus", "rrdb", 2, f"{RELEASES}/v0.2.1/RealESRGAN_x2plus.pth", 23, 3 * 1024),
+        UpscaleModel("realesr-general-x4v3", "srvgg", 4, f"{RELEASES}/v0.2.5.0/realesr-general-x4v3.pth", 32, 2 * 1024),
+    )
+}
+DEFAULT_UPSCALE_MODEL: str = "RealESRGAN_x4plus"
+DEFAULT_MODELS_DIR: str = os.path.join("~", ".local", "share", "fogstripper", "models", "upscale")
+
+# "quality" usa o RRDBNet de escala nativa quando existe (nao ha x3: 3x amplia 4x e reduz);
+# "fast" usa a rede compacta em qualquer fator.
+PRESETS: dict[str, dict[int, str]] = {
+    "quality": {2: "RealESRGAN_x2plus", 3: "RealESRGAN_x4plus", 4: "RealESRGAN_x4plus"},
+    "fast": {2: "realesr-general-x4v3", 3: "realesr-general-x4v3", 4: "realesr-general-x4v3"},
+}
+AUTO_PRESET: str = "auto"
+
+
+def select_model(factor: int, choice: str = AUTO_PRESET) -> UpscaleModel:
+    # `choice` e "auto" (= "quality"), um preset ou o nome de um modelo do registro.
+    if choice in UPSCALE_MODELS:
+        return UPSCALE_MODELS[choice]
+    preset: dict[int, str] = PRESETS["quality" if choice == AUTO_PRESET else choice]
+    return UPSCALE_MODELS[preset.get(factor, DEFAULT_UPSCALE_MODEL)]
+
+
+def model_choices() -> list[str]:
+    return [AUTO_PRESET, *PRESETS, *UPSCALE_MODELS]
+
+
+def model_source(model: UpscaleModel, models_dir: str | None = None) -> str:
+    # Pesos ja baixados na pasta local tem prioridade; senao o RealESRGANer baixa da URL.
+    if models_dir:
+        local: str = os.path.join(os.path.expanduser(models_dir), model.filename)
+        if os.path.isfile(local):
+            return local
+    return model.url
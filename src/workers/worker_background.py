@@ -5,6 +5,45 @@ from argparse import Namespace
 from PIL import Image
 
 
+def apply_background(
+    foreground: Image.Image,
+    bg_type: str,
+    bg_data: str,
+    resize_mode: str = "fit-bg-to-fg",
+) -> Image.Image:
+    foreground = foreground.convert("RGBA")
+
+    if bg_type == "color":
+        final_canvas: Image.Image = Image.new("RGBA", foreground.size, bg_data)
+
+    elif bg_type == "image":
+        with Image.open(bg_data) as bg_img:
+            background: Image.Image = bg_img.convert("RGBA")
+
+        if resize_mode == "fit-bg-to-fg":
+            final_canvas = background.resize(foreground.size, Image.Resampling.LANCZOS)
+        else:
+            final_canvas = Image.new("RGBA", background.size, (0, 0, 0, 0))
+            final_canvas.paste(background, (0, 0))
+
+    else:
+        raise ValueError(f"Tipo de fundo desconhecido: {bg_type}")
+
+    if bg_type == "image" and resize_mode == "fit-fg-to-bg":
+        bg_w: int
+        bg_h: int
+        bg_w, bg_h = final_canvas.size
+        fg_w: int
+        fg_h: int
+        fg_w, fg_h = foreground.size
+        offset: tuple[int, int] = ((bg_w - fg_w) // 2, (bg_h - fg_h) // 2)
+        final_canvas.paste(foreground, offset, foreground)
+    else:
+        final_canvas.paste(foreground, (0, 0), foreground)
+
+    return final_canvas
+
+
 def main() -> None:
     parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Aplica um fundo a uma imagem.")
     parser.add_argument("--input", required=True, help="Caminho para a imagem de entrada (com fundo transparente).")
@@ -25,33 +64,8 @@ def main() -> None:
     args: Namespace = parser.parse_args()
 
     try:
-        foreground: Image.Image = Image.open(args.input).convert("RGBA")
-
-        if args.bg_type == "color":
-            background: Image.Image = Image.new("RGBA", foreground.size, args.bg_data)
-            final_canvas: Image.Image = background
-
-        elif args.bg_type == "image":
-            background = Image.open(args.bg_data).convert("RGBA")
-
-            if args.resize_mode == "fit-bg-to-fg":
-                resized_bg: Image.Image = background.resize(foreground.size, Image.Resampling.LANCZOS)
-                final_canvas = resized_bg
-            else:
-                final_canvas = Image.new("RGBA", background.size, (0, 0, 0, 0))
-                final_canvas.paste(background, (0, 0))
-
-        if args.bg_type == "image" and args.resize_mode == "fit-fg-to-bg":
-            bg_w: int
-            bg_h: int
-            bg_w, bg_h = final_canvas.size
-            fg_w: int
-            fg_h: int
-            fg_w, fg_h = foreground.size
-            offset: tuple[int, int] = ((bg_w - fg_w) // 2, (bg_h - fg_h) // 2)
-            final_canvas.paste(foreground, offset, foreground)
-        else:
-            final_canvas.paste(foreground, (0, 0), foreground)
+        with Image.open(args.input) as img:
+            final_canvas: Image.Image = apply_background(img, args.bg_type, args.bg_data, args.resize_mode)
 
         final_canvas.save(args.output)
         print(f"Worker de fundo concluiu. Imagem salva em: {args.output}")
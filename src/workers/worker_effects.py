@@ -5,6 +5,36 @@ from argparse import Namespace
 from PIL import Image, ImageFilter
 
 
+def apply_shadow(
+    original_img: Image.Image,
+    blur_radius: int = 15,
+    offset_x: int = 10,
+    offset_y: int = 10,
+    opacity: int = 180,
+) -> Image.Image:
+    original_img = original_img.convert("RGBA")
+    shadow_color: tuple[int, int, int, int] = (0, 0, 0, max(0, min(255, opacity)))
+
+    alpha_mask: Image.Image = original_img.getchannel("A")
+
+    solid_shadow: Image.Image = Image.new("RGBA", original_img.size, color=shadow_color)
+    solid_shadow.putalpha(alpha_mask)
+
+    blurred_shadow: Image.Image = solid_shadow.filter(ImageFilter.GaussianBlur(radius=blur_radius))
+
+    new_width: int = original_img.width + abs(offset_x) + blur_radius * 2
+    new_height: int = original_img.height + abs(offset_y) + blur_radius * 2
+
+    final_canvas: Image.Image = Image.new("RGBA", (new_width, new_height), (0, 0, 0, 0))
+
+    shadow_paste_pos: tuple[int, int] = (blur_radius + offset_x, blur_radius + offset_y)
+    image_paste_pos: tuple[int, int] = (blur_radius, blur_radius)
+
+    final_canvas.paste(blurred_shadow, shadow_paste_pos, blurred_shadow)
+    final_canvas.paste(original_img, image_paste_pos, original_img)
+    return final_canvas
+
+
 def main() -> None:
     parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Aplica um efeito de sombra a uma imagem.")
     parser.add_argument("--input", required=True, help="Caminho para a imagem de entrada (com fundo transparente).")
@@ -17,30 +47,8 @@ def main() -> None:
     args: Namespace = parser.parse_args()
 
     try:
-        blur_radius: int = args.blur_radius
-        offset_x: int = args.offset_x
-        offset_y: int = args.offset_y
-        shadow_color: tuple[int, int, int, int] = (0, 0, 0, max(0, min(255, args.opacity)))
-
-        original_img: Image.Image = Image.open(args.input).convert("RGBA")
-
-        alpha_mask: Image.Image = original_img.getchannel("A")
-
-        solid_shadow: Image.Image = Image.new("RGBA", original_img.size, color=shadow_color)
-        solid_shadow.putalpha(alpha_mask)
-
-        blurred_shadow: Image.Image = solid_shadow.filter(ImageFilter.GaussianBlur(radius=blur_radius))
-
-        new_width: int = original_img.width + abs(offset_x) + blur_radius * 2
-        new_height: int = original_img.height + abs(offset_y) + blur_radius * 2
-
-        final_canvas: Image.Image = Image.new("RGBA", (new_width, new_height), (0, 0, 0, 0))
-
-        shadow_paste_pos: tuple[int, int] = (blur_radius + offset_x, blur_radius + offset_y)
-        image_paste_pos: tuple[int, int] = (blur_radius, blur_radius)
-
-        final_canvas.paste(blurred_shadow, shadow_paste_pos, blurred_shadow)
-        final_canvas.paste(original_img, image_paste_pos, original_img)
+        with Image.open(args.input) as img:
+            final_canvas: Image.Image = apply_shadow(img, args.blur_radius, args.offset_x, args.offset_y, args.opacity)
 
         final_canvas.save(args.output)
         print(f"Worker de efeitos concluiu. Sombra aplicada e salva em: {args.output}")
@@ -1,7 +1,9 @@
 import argparse
 import os
+import sys
 from argparse import Namespace
 from pathlib import Path
+from typing import Any
 
 _MODELS_DIR = Path(
     os.environ.get(
@@ -12,33 +14,140 @@ _MODELS_DIR = Path(
 os.environ["U2NET_HOME"] = str(_MODELS_DIR)
 _MODELS_DIR.mkdir(parents=True, exist_ok=True)
 
+import numpy as np
 from PIL import Image
+from protocol import serve
 from rembg import new_session, remove
+from rembg.bg import alpha_matting_cutout, fix_image_orientation, naive_cutout
+
+_SESSIONS: dict[str, Any] = {}
+
+# Normalizacao de entrada (media, desvio, tamanho) dos modelos cujo ONNX aceita lote dinamico.
+BATCHABLE_MODELS: dict[str, tuple[tuple[float, float, float], tuple[float, float, float], tuple[int, int]]] = {
+    "u2net": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "u2netp": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "isnet-general-use": ((0.485, 0.456, 0.406), (1.0, 1.0, 1.0), (1024, 1024)),
+}
+_UNBATCHABLE: set[str] = set()
+
+
+def get_session(model: str) -> Any:
+    if model not in _SESSIONS:
+        _SESSIONS[model] = new_session(model)
+    return _SESSIONS[model]
+
+
+def _matting_params(potencia: int) -> tuple[int, int]:
+    erode_size: int = 5 + int((potencia / 100) * 35)
+    bg_threshold: int = 15 - int((potencia / 100) * 20)
+    return erode_size, bg_threshold
+
+
+def remove_background(input_path: str, output_path: str, model: str, potencia: int) -> None:
+    erode_size, bg_threshold = _matting_params(potencia)
+
+    with Image.open(input_path) as img:
+        output_img = remove(
+            img,
+            session=get_session(model),
+            alpha_matting=True,
+            alpha_matting_foreground_threshold=240,
+            alpha_matting_background_threshold=bg_threshold,
+            alpha_matting_erode_size=erode_size,
+        )
+        output_img.save(output_path, compress_level=1)
+
+
+def _mask_from_prediction(pred: np.ndarray, size: tuple[int, int]) -> Image.Image:
+    ma = np.max(pred)
+    mi = np.min(pred)
+    pred = (pred - mi) / (ma - mi)
+    mask = Image.fromarray((pred * 255).astype("uint8"), mode="L")
+    return mask.resize(size, Image.Resampling.LANCZOS)
+
+
+def predict_masks(model: str, images: list[Image.Image]) -> list[Image.Image]:
+    session = get_session(model)
+    if len(images) == 1 or model not in BATCHABLE_MODELS or model in _UNBATCHABLE:
+        return [session.predict(img)[0] for img in images]
+
+    mean, std, size = BATCHABLE_MODELS[model]
+    input_name: str = session.inner_session.get_inputs()[0].name
+    batch: np.ndarray = np.concatenate([session.normalize(img, mean, std, size)[input_name] for img in images])
+    try:
+        preds: np.ndarray = session.inner_session.run(None, {input_name: batch})[0][:, 0, :, :]
+    except Exception as e:
+        sys.stderr.write(f"Modelo {model} nao aceitou lote ({e}); seguindo quadro a quadro.\n")
+        _UNBATCHABLE.add(model)
+        return [session.predict(img)[0] for img in images]
+
+    # Normalizacao min-max por imagem, como o rembg faz com lote unitario.
+    return [_mask_from_prediction(pred, img.size) for pred, img in zip(preds, images, strict=True)]
+
+
+def remove_background_batch(inputs: list[str], outputs: list[str], model: str, potencia: int) -> None:
+    erode_size, bg_threshold = _matting_params(potencia)
+    images: list[Image.Image] = []
+    for path in inputs:
+        with Image.open(path) as img:
+            images.append(fix_image_orientation(img).copy())
+
+    for img, mask, output_path in zip(images, predict_masks(model, images), outputs, strict=True):
+        try:
+            cutout = alpha_matting_cutout(img, mask, 240, bg_threshold, erode_size)
+        except ValueError:
+            cutout = naive_cutout(img, mask)
+        cutout.save(output_path, compress_level=1)
+
+
+def _handle_remove_batch(request: dict[str, Any]) -> dict[str, Any]:
+    remove_background_batch(
+        request["inputs"],
+        request["outputs"],
+        request.get("model", "u2net"),
+        int(request.get("potencia", 75)),
+    )
+    return {"outputs": request["outputs"]}
+
+
+def _handle_remove(request: dict[str, Any]) -> dict[str, Any]:
+    remove_background(
+        request["input"],
+        request["output"],
+        request.get("model", "u2net"),
+        int(request.get("potencia", 75)),
+    )
+    return {"output": request["output"]}
+
+
+def _handle_warm(request: dict[str, Any]) -> dict[str, Any]:
+    # Carrega a sessao do modelo antes do primeiro arquivo, para o modo continuo.
+    get_session(request.get("model", "u2net"))
+    return {}
 
 
 def main() -> None:
     parser: argparse.ArgumentParser = argparse.ArgumentParser()
-    parser.add_argument("--input", required=True)
-    parser.add_argument("--output", required=True)
+    parser.add_argument("--input")
+    parser.add_argument("--output")
     parser.add_argument("--model", default="u2net")
     parser.add_argument("--potencia", type=int, default=75)
+    parser.add_argument("--serve", action="store_true", help="Mantem o worker residente lendo jobs JSON do stdin.")
+    parser.add_argument("--idle-timeout", type=float, default=0, help="Encerra o modo --serve apos N segundos ocioso.")
     args: Namespace = parser.parse_args()
 
+    if args.serve:
+        serve(
+            {"remove": _handle_remove, "remove_batch": _handle_remove_batch, "warm": _handle_warm},
+            idle_timeout=args.idle_timeout,
+        )
+        return
+
+    if not args.input or not args.output:
+        parser.error("--input e --output sao obrigatorios fora do modo --serve.")
+
     try:
-        erode_size: int = 5 + int((args.potencia / 100) * 35)
-        bg_threshold: int = 15 - int((args.potencia / 100) * 20)
-
-        session = new_session(args.model)
-        with Image.open(args.input) as img:
-            output_img = remove(
-                img,
-                session=session,
-                alpha_matting=True,
-                alpha_matting_foreground_threshold=240,
-                alpha_matting_background_threshold=bg_threshold,
-                alpha_matting_erode_size=erode_size,
-            )
-            output_img.save(args.output)
+        remove_background(args.input, args.output, args.model, args.potencia)
         print("Rembg worker concluído.")
     except Exception as e:
         print(f"Erro no rembg worker: {e}")
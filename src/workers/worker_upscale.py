@@ -1,8 +1,14 @@
 import argparse
+import json
+import multiprocessing
+import os
 import sys
+import time
 import traceback
 import types
 from argparse import Namespace
+from multiprocessing.pool import Pool
+from typing import Any
 
 import numpy as np
 import torch
@@ -19,48 +25,318 @@ except ModuleNotFoundError:
 from basicsr.archs.rrdbnet_arch import RRDBNet
 from numpy.typing import NDArray
 from PIL import Image
+from protocol import serve
 from realesrgan import RealESRGANer
+from realesrgan.archs.srvgg_arch import SRVGGNetCompact
+from tiling import content_summary, upscale_content
+from upscale_models import DEFAULT_MODELS_DIR, DEFAULT_UPSCALE_MODEL, UPSCALE_MODELS, UpscaleModel, model_source
 
+TILE_PAD: int = 10
+# Diferenca maxima por canal (0-255) aceita entre o ONNX exportado e o torch.
+ONNX_PARITY_TOLERANCE: int = 2
 
-def main() -> None:
-    parser: argparse.ArgumentParser = argparse.ArgumentParser()
-    parser.add_argument("--input", required=True)
-    parser.add_argument("--output", required=True)
-    parser.add_argument("--tile", type=int, default=512)
-    parser.add_argument("--outscale", type=int, default=4, help="Fator de escala final da imagem.")
-    args: Namespace = parser.parse_args()
+# Um upsampler por modelo: no modo --serve, trocar de fator nao recarrega o que ja esta em memoria.
+_UPSAMPLERS: dict[str, RealESRGANer] = {}
 
-    try:
-        model: RRDBNet = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32, scale=4)
-        model_path: str = "https://github.com/xinntao/Real-ESRGAN/releases/download/v0.1.0/RealESRGAN_x4plus.pth"
 
-        upsampler: RealESRGANer = RealESRGANer(
-            scale=4,
-            model_path=model_path,
+def build_network(spec: UpscaleModel) -> torch.nn.Module:
+    if spec.arch == "srvgg":
+        return SRVGGNetCompact(
+            num_in_ch=3, num_out_ch=3, num_feat=64, num_conv=spec.depth, upscale=spec.scale, act_type="prelu"
+        )
+    return RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=spec.depth, num_grow_ch=32, scale=spec.scale)
+
+
+def get_upsampler(tile: int, model: str = DEFAULT_UPSCALE_MODEL, models_dir: str | None = None) -> RealESRGANer:
+    upsampler: RealESRGANer | None = _UPSAMPLERS.get(model)
+    if upsampler is None:
+        spec: UpscaleModel = UPSCALE_MODELS[model]
+        upsampler = _UPSAMPLERS[model] = RealESRGANer(
+            scale=spec.scale,
+            model_path=model_source(spec, models_dir),
             dni_weight=None,
-            model=model,
-            tile=args.tile,
-            tile_pad=10,
+            model=build_network(spec),
+            tile=tile,
+            tile_pad=TILE_PAD,
             pre_pad=0,
             half=torch.cuda.is_available(),
             gpu_id=None,
         )
+    upsampler.tile_size = tile
+    return upsampler
+
+
+# Engine de blocos em varios processos, so em CPU: o RealESRGANer processa os blocos um a um e
+# as threads do torch escalam mal no RRDBNet com blocos pequenos. Cada processo carrega o proprio
+# modelo e fica com uma fatia fixa dos nucleos; o pool sobrevive entre requisicoes do --serve.
+_TILE_POOL: tuple[tuple[str, str | None, int], Pool] | None = None
+_TILE_MODEL: str = DEFAULT_UPSCALE_MODEL
+_TILE_MODELS_DIR: str | None = None
+
+
+def _init_tile_process(model: str, models_dir: str | None, threads: int) -> None:
+    global _TILE_MODEL, _TILE_MODELS_DIR
+    torch.set_num_threads(threads)
+    _TILE_MODEL, _TILE_MODELS_DIR = model, models_dir
+    get_upsampler(0, model, models_dir)
+
+
+def _upscale_patch(patch: NDArray[np.uint8]) -> NDArray[np.uint8]:
+    # Os blocos sao montados fora; o enhance processa cada um inteiro, sem re-dividir.
+    upsampler: RealESRGANer = get_upsampler(0, _TILE_MODEL, _TILE_MODELS_DIR)
+    output, _ = upsampler.enhance(patch, outscale=upsampler.scale)
+    return output
+
+
+def get_tile_pool(processes: int, model: str, models_dir: str | None) -> Pool | None:
+    global _TILE_POOL
+    if processes <= 1 or torch.cuda.is_available():
+        return None
+    key: tuple[str, str | None, int] = (model, models_dir, processes)
+    if _TILE_POOL is not None:
+        if _TILE_POOL[0] == key:
+            return _TILE_POOL[1]
+        _TILE_POOL[1].terminate()
+    # Com o pool, a rede so roda nos filhos; uma copia ja carregada aqui (de um job com
+    # processes=1 no --serve) e liberada.
+    _UPSAMPLERS.pop(model, None)
+    threads: int = max(1, (os.cpu_count() or 1) // processes)
+    print(f"Iniciando {processes} processos de upscale com {threads} threads cada.", file=sys.stderr)
+    # "spawn": o torch do processo principal ja tem threads rodando, e fork com elas pode travar.
+    pool: Pool = multiprocessing.get_context("spawn").Pool(
+        processes, initializer=_init_tile_process, initargs=(model, models_dir, threads)
+    )
+    _TILE_POOL = (key, pool)
+    return pool
+
+
+def upscale_visible(
+    scale: int,
+    rgb: NDArray[np.uint8],
+    alpha: NDArray[np.uint8] | None,
+    tile: int,
+    outscale: int,
+    pool: Pool | None = None,
+    processes: int = 1,
+) -> NDArray[np.uint8]:
+    # Recorte pelo alfa e blocos em src/workers/tiling.py; aqui so se escolhe quem roda a rede.
+    # Sem pool, _upscale_patch carrega o upsampler neste processo na primeira chamada.
+    if pool is not None:
+        canvas, box, total, skipped = upscale_content(
+            rgb,
+            alpha,
+            scale,
+            outscale,
+            tile,
+            TILE_PAD,
+            map_patches=lambda patches: pool.imap(_upscale_patch, patches),
+            min_tiles=2 * processes,
+        )
+    else:
+        canvas, box, total, skipped = upscale_content(rgb, alpha, scale, outscale, tile, TILE_PAD, _upscale_patch)
+    print(content_summary(rgb.shape[1], rgb.shape[0], box, total, skipped), file=sys.stderr)
+    return canvas
+
+
+def upscale_image(
+    input_path: str,
+    output_path: str,
+    tile: int,
+    outscale: int,
+    full_frame: bool = False,
+    model: str = DEFAULT_UPSCALE_MODEL,
+    models_dir: str | None = None,
+    processes: int = 1,
+) -> None:
+    global _TILE_MODEL, _TILE_MODELS_DIR
+    _TILE_MODEL, _TILE_MODELS_DIR = model, models_dir
+    # Com o pool, so os filhos carregam o modelo: o processo principal apenas monta os blocos.
+    pool: Pool | None = get_tile_pool(processes, model, models_dir)
+
+    with Image.open(input_path) as img:
+        img = img.convert("RGBA")
+        rgb_img: Image.Image = img.convert("RGB")
+        alpha: Image.Image = img.split()[-1]
+
+        rgb_np: NDArray[np.uint8] = np.array(rgb_img, dtype=np.uint8)
+
+        upscaled_rgb_np: NDArray[np.uint8]
+        if full_frame and pool is None:
+            upscaled_rgb_np, _ = get_upsampler(tile, model, models_dir).enhance(rgb_np, outscale=outscale)
+        else:
+            alpha_np: NDArray[np.uint8] | None = None if full_frame else np.array(alpha, dtype=np.uint8)
+            scale: int = UPSCALE_MODELS[model].scale
+            upscaled_rgb_np = upscale_visible(scale, rgb_np, alpha_np, tile, outscale, pool, processes)
 
-        with Image.open(args.input) as img:
-            img = img.convert("RGBA")
-            rgb_img: Image.Image = img.convert("RGB")
-            alpha: Image.Image = img.split()[-1]
+        output_img_rgb: Image.Image = Image.fromarray(upscaled_rgb_np)
+        alpha_resized: Image.Image = alpha.resize(output_img_rgb.size, Image.Resampling.LANCZOS)
+        output_img_rgb.putalpha(alpha_resized)
 
-            rgb_np: NDArray[np.uint8] = np.array(rgb_img, dtype=np.uint8)
+        output_img_rgb.save(output_path, compress_level=1)
 
-            upscaled_rgb_np: NDArray[np.uint8]
-            upscaled_rgb_np, _ = upsampler.enhance(rgb_np, outscale=args.outscale)
 
-            output_img_rgb: Image.Image = Image.fromarray(upscaled_rgb_np)
-            alpha_resized: Image.Image = alpha.resize(output_img_rgb.size, Image.Resampling.LANCZOS)
-            output_img_rgb.putalpha(alpha_resized)
+def _rss_status(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) * 1024
+    return 0
 
-            output_img_rgb.save(args.output)
+
+def synthetic_image(width: int, height: int) -> NDArray[np.uint8]:
+    # Gradiente com ruido para nao ser trivial, com semente fixa para repetir entre maquinas.
+    rng: np.random.Generator = np.random.default_rng(0)
+    ramp: NDArray[np.float64] = np.linspace(0, 255, width)[None, :, None] * np.ones((height, 1, 3))
+    noise: NDArray[np.float64] = rng.normal(0, 24, (height, width, 3))
+    return np.clip(ramp + noise, 0, 255).astype(np.uint8)
+
+
+def calibrate_tile(
+    tile: int, width: int, height: int, model: str = DEFAULT_UPSCALE_MODEL, models_dir: str | None = None
+) -> dict[str, Any]:
+    # Uma medicao por processo: mede o tempo do enhance em uma imagem sintetica e o pico de
+    # memoria acima do que o modelo carregado ja ocupa. Amplia na escala nativa do modelo.
+    upsampler: RealESRGANer = get_upsampler(tile, model, models_dir)
+    scale: int = UPSCALE_MODELS[model].scale
+    image: NDArray[np.uint8] = synthetic_image(width, height)
+    upsampler.enhance(image[:32, :32], outscale=scale)
+    try:
+        # "5" zera o VmHWM (pico de RSS) do processo; sem isso o pico do carregamento entraria na conta.
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    baseline: int = _rss_status("VmRSS")
+    start: float = time.perf_counter()
+    upsampler.enhance(image, outscale=scale)
+    seconds: float = time.perf_counter() - start
+    return {
+        "model": model,
+        "tile": tile,
+        "width": width,
+        "height": height,
+        "seconds": round(seconds, 4),
+        "peak_bytes": max(0, _rss_status("VmHWM") - baseline),
+    }
+
+
+def export_onnx(
+    model: str, models_dir: str, images: list[str], tolerance: int = ONNX_PARITY_TOLERANCE
+) -> dict[str, Any]:
+    # Exporta a rede em float32 na CPU, com altura e largura dinamicas, e compara o enhance do
+    # onnxruntime com o do torch nas imagens de teste. Sem paridade o arquivo e apagado, para o
+    # backend ONNX nunca usar uma exportacao ruim. O onnxruntime so e importado aqui: o worker
+    # torch nao depende dele para ampliar.
+    from onnx_upscale import OnnxUpsampler, onnx_model_path
+
+    spec: UpscaleModel = UPSCALE_MODELS[model]
+    reference: RealESRGANer = RealESRGANer(
+        scale=spec.scale,
+        model_path=model_source(spec, models_dir),
+        dni_weight=None,
+        model=build_network(spec),
+        tile=0,
+        tile_pad=TILE_PAD,
+        pre_pad=0,
+        half=False,
+        device=torch.device("cpu"),
+    )
+    path: str = onnx_model_path(model, models_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    torch.onnx.export(
+        reference.model,
+        torch.rand(1, 3, 64, 64),
+        path,
+        input_names=["input"],
+        output_names=["output"],
+        dynamic_axes={"input": {2: "height", 3: "width"}, "output": {2: "height", 3: "width"}},
+        opset_version=17,
+    )
+    upsampler: OnnxUpsampler = OnnxUpsampler(path, spec.scale)
+    # Um tamanho impar cobre o padding do x2plus.
+    samples: list[tuple[str, NDArray[np.uint8]]] = [("sintetica 96x64", synthetic_image(96, 64))]
+    samples.append(("sintetica 75x51", synthetic_image(75, 51)))
+    for image_path in images:
+        with Image.open(image_path) as img:
+            samples.append((image_path, np.array(img.convert("RGB"), dtype=np.uint8)))
+    results: list[dict[str, Any]] = []
+    for name, image in samples:
+        expected, _ = reference.enhance(image, outscale=spec.scale)
+        actual, _ = upsampler.enhance(image, outscale=spec.scale)
+        diff: NDArray[np.int16] = np.abs(expected.astype(np.int16) - actual.astype(np.int16))
+        results.append({"image": name, "max_abs_diff": int(diff.max()), "mean_abs_diff": round(float(diff.mean()), 4)})
+    ok: bool = all(r["max_abs_diff"] <= tolerance for r in results)
+    if not ok:
+        os.remove(path)
+    return {"model": model, "path": path, "ok": ok, "tolerance": tolerance, "results": results}
+
+
+def _handle_upscale(request: dict[str, Any]) -> dict[str, Any]:
+    upscale_image(
+        request["input"],
+        request["output"],
+        int(request.get("tile", 512)),
+        int(request.get("outscale", 4)),
+        bool(request.get("full_frame", False)),
+        request.get("model") or DEFAULT_UPSCALE_MODEL,
+        request.get("models_dir"),
+        int(request.get("processes", 1)),
+    )
+    return {"output": request["output"]}
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    parser.add_argument("--input")
+    parser.add_argument("--output")
+    parser.add_argument("--tile", type=int, default=512)
+    parser.add_argument("--outscale", type=int, default=4, help="Fator de escala final da imagem.")
+    parser.add_argument("--model", default=DEFAULT_UPSCALE_MODEL, choices=list(UPSCALE_MODELS))
+    parser.add_argument("--models-dir", help="Pasta com pesos .pth ja baixados.")
+    parser.add_argument("--processes", type=int, default=1, help="Processos que dividem os blocos (so CPU).")
+    parser.add_argument(
+        "--full-frame", action="store_true", help="Roda a rede no quadro inteiro, inclusive nas areas transparentes."
+    )
+    parser.add_argument("--serve", action="store_true", help="Mantem o modelo carregado lendo jobs JSON do stdin.")
+    parser.add_argument("--idle-timeout", type=float, default=0, help="Encerra o modo --serve apos N segundos ocioso.")
+    parser.add_argument("--calibrate", metavar="LxA", help="Mede --tile em uma imagem sintetica e imprime JSON.")
+    parser.add_argument("--export-onnx", action="store_true", help="Exporta --model para ONNX e confere a paridade.")
+    parser.add_argument("--parity-images", nargs="*", default=[], help="Imagens extras para a conferencia.")
+    parser.add_argument("--tolerance", type=int, default=ONNX_PARITY_TOLERANCE)
+    args: Namespace = parser.parse_args()
+
+    if args.calibrate:
+        width, height = (int(v) for v in args.calibrate.lower().split("x"))
+        print(json.dumps(calibrate_tile(args.tile, width, height, args.model, args.models_dir)))
+        return
+
+    if args.export_onnx:
+        report: dict[str, Any] = export_onnx(
+            args.model, args.models_dir or os.path.expanduser(DEFAULT_MODELS_DIR), args.parity_images, args.tolerance
+        )
+        print(json.dumps(report))
+        if not report["ok"]:
+            sys.exit(1)
+        return
+
+    if args.serve:
+        serve({"upscale": _handle_upscale}, idle_timeout=args.idle_timeout)
+        return
+
+    if not args.input or not args.output:
+        parser.error("--input e --output sao obrigatorios fora do modo --serve.")
+
+    try:
+        upscale_image(
+            args.input,
+            args.output,
+            args.tile,
+            args.outscale,
+            args.full_frame,
+            args.model,
+            args.models_dir,
+            args.processes,
+        )
         print(f"Upscale worker concluído para a escala {args.outscale}x.")
     except Exception:
         detailed_error: str = traceback.format_exc()
@@ -0,0 +1,135 @@
+import argparse
+import os
+import sys
+import traceback
+from argparse import Namespace
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+from onnx_upscale import OnnxUpsampler, onnx_model_path
+from PIL import Image
+from protocol import serve
+from tiling import content_summary, upscale_content
+from upscale_models import DEFAULT_MODELS_DIR, DEFAULT_UPSCALE_MODEL, UPSCALE_MODELS, UpscaleModel
+
+# Mesmo protocolo e opcoes do worker_upscale.py, sem torch/basicsr/realesrgan: sobe rapido e
+# ocupa bem menos memoria. A rede vem do ONNX exportado por worker_upscale.py --export-onnx.
+# Nao ha pool de processos: o onnxruntime ja paraleliza cada bloco com as proprias threads, e um
+# `processes` maior que 1 e avisado no stderr e tratado como 1.
+
+TILE_PAD: int = 10
+
+_UPSAMPLERS: dict[str, OnnxUpsampler] = {}
+
+
+def get_upsampler(model: str, models_dir: str | None) -> OnnxUpsampler:
+    upsampler: OnnxUpsampler | None = _UPSAMPLERS.get(model)
+    if upsampler is None:
+        spec: UpscaleModel = UPSCALE_MODELS[model]
+        path: str = onnx_model_path(model, models_dir or DEFAULT_MODELS_DIR)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(
+                f"Modelo ONNX {path} nao encontrado; rode fogstripper-cli --export-onnx-upscale {model}."
+            )
+        upsampler = _UPSAMPLERS[model] = OnnxUpsampler(path, spec.scale)
+    return upsampler
+
+
+def upscale_image(
+    input_path: str,
+    output_path: str,
+    tile: int,
+    outscale: int,
+    full_frame: bool = False,
+    model: str = DEFAULT_UPSCALE_MODEL,
+    models_dir: str | None = None,
+    processes: int = 1,
+) -> None:
+    if processes > 1:
+        print(
+            f"processes={processes} ignorado no backend ONNX: os blocos usam as threads do onnxruntime.",
+            file=sys.stderr,
+        )
+    upsampler: OnnxUpsampler = get_upsampler(model, models_dir)
+
+    with Image.open(input_path) as img:
+        img = img.convert("RGBA")
+        rgb_np: NDArray[np.uint8] = np.array(img.convert("RGB"), dtype=np.uint8)
+        alpha: Image.Image = img.split()[-1]
+
+        def run(patch: NDArray[np.uint8]) -> NDArray[np.uint8]:
+            return upsampler.enhance(patch, outscale=upsampler.scale)[0]
+
+        alpha_np: NDArray[np.uint8] | None = None if full_frame else np.array(alpha, dtype=np.uint8)
+        upscaled_rgb_np, box, total, skipped = upscale_content(
+            rgb_np, alpha_np, upsampler.scale, outscale, tile, TILE_PAD, run
+        )
+        print(content_summary(rgb_np.shape[1], rgb_np.shape[0], box, total, skipped), file=sys.stderr)
+
+        output_img_rgb: Image.Image = Image.fromarray(upscaled_rgb_np)
+        alpha_resized: Image.Image = alpha.resize(output_img_rgb.size, Image.Resampling.LANCZOS)
+        output_img_rgb.putalpha(alpha_resized)
+
+        output_img_rgb.save(output_path, compress_level=1)
+
+
+def _handle_upscale(request: dict[str, Any]) -> dict[str, Any]:
+    upscale_image(
+        request["input"],
+        request["output"],
+        int(request.get("tile", 512)),
+        int(request.get("outscale", 4)),
+        bool(request.get("full_frame", False)),
+        request.get("model") or DEFAULT_UPSCALE_MODEL,
+        request.get("models_dir"),
+        int(request.get("processes", 1)),
+    )
+    return {"output": request["output"]}
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    parser.add_argument("--input")
+    parser.add_argument("--output")
+    parser.add_argument("--tile", type=int, default=512)
+    parser.add_argument("--outscale", type=int, default=4, help="Fator de escala final da imagem.")
+    parser.add_argument("--model", default=DEFAULT_UPSCALE_MODEL, choices=list(UPSCALE_MODELS))
+    parser.add_argument("--models-dir", help="Pasta com os modelos .onnx exportados.")
+    parser.add_argument("--processes", type=int, default=1, help="Sem efeito no ONNX; acima de 1 e avisado.")
+    parser.add_argument(
+        "--full-frame", action="store_true", help="Roda a rede no quadro inteiro, inclusive nas areas transparentes."
+    )
+    parser.add_argument("--serve", action="store_true", help="Mantem o modelo carregado lendo jobs JSON do stdin.")
+    parser.add_argument("--idle-timeout", type=float, default=0, help="Encerra o modo --serve apos N segundos ocioso.")
+    args: Namespace = parser.parse_args()
+
+    if args.serve:
+        serve({"upscale": _handle_upscale}, idle_timeout=args.idle_timeout)
+        return
+
+    if not args.input or not args.output:
+        parser.error("--input e --output sao obrigatorios fora do modo --serve.")
+
+    try:
+        upscale_image(
+            args.input,
+            args.output,
+            args.tile,
+            args.outscale,
+            args.full_frame,
+            args.model,
+            args.models_dir,
+            args.processes,
+        )
+        print(f"Upscale worker (ONNX) concluido para a escala {args.outscale}x.")
+    except Exception:
+        detailed_error: str = traceback.format_exc()
+        sys.stderr.write("--- ERRO UPSCALE WORKER ---\n")
+        sys.stderr.write(detailed_error)
+        sys.stderr.write("--- FIM DO ERRO ---\n")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@
 
 APP_DIR="$HOME/.local/share/fogstripper"
 DESKTOP_FILE="$HOME/.local/share/applications/fogstripper.desktop"
+CLI_FILE="$HOME/.local/bin/fogstripper-cli"
+SERVER_FILE="$HOME/.local/bin/fogstripper-server"
 ICON_DIR_BASE="$HOME/.local/share/icons/hicolor"
 
 echo "============================================================"
@@ -21,6 +23,16 @@ if [ -f "$DESKTOP_FILE" ]; then
     rm "$DESKTOP_FILE"
 fi
 
+if [ -f "$CLI_FILE" ]; then
+    echo ">> Removendo fogstripper-cli..."
+    rm "$CLI_FILE"
+fi
+
+if [ -f "$SERVER_FILE" ]; then
+    echo ">> Removendo fogstripper-server..."
+    rm "$SERVER_FILE"
+fi
+
 echo ">> Removendo icones..."
 for size in 16 32 64 128; do
     rm -f "$ICON_DIR_BASE/${size}x${size}/apps/fogstripper.png"